@@ -0,0 +1,80 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compares the chart data cache serializers on synthetic dataframes
+
+    python scripts/benchmark_chart_data_cache.py --rows 10000 --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from superset.utils.cache_serialization import ArrowSerializer, PickleSerializer
+
+
+def make_df(rows: int) -> pd.DataFrame:
+    rng = np.random.RandomState(0)
+    return pd.DataFrame(
+        {
+            "__timestamp": pd.date_range("2019-01-01", periods=rows, freq="min"),
+            "country": rng.choice(["US", "FR", "BR", "IN", "CN"], rows),
+            "gender": rng.choice(["boy", "girl"], rows),
+            "sum__num": rng.randint(0, 10 ** 6, rows),
+            "avg__num": rng.rand(rows),
+        }
+    )
+
+
+def bench(serializer, value, repeat: int):
+    dumps, loads = [], []
+    blob = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        blob = serializer.dumps(value)
+        dumps.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        serializer.loads(blob)
+        loads.append(time.perf_counter() - start)
+    return min(dumps), min(loads), len(blob)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, action="append")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    serializers = [
+        ("pickle", PickleSerializer()),
+        ("arrow", ArrowSerializer()),
+        ("arrow+lz4", ArrowSerializer("lz4")),
+        ("arrow+zstd", ArrowSerializer("zstd")),
+    ]
+    print(f"{'rows':>10} {'format':>12} {'dumps (s)':>10} {'loads (s)':>10} {'MB':>9}")
+    for rows in args.rows or [10 ** 4, 10 ** 6, 10 ** 7]:
+        value = {"dttm": "2019-01-01T00:00:00", "df": make_df(rows), "query": "..."}
+        for name, serializer in serializers:
+            dumps, loads, size = bench(serializer, value, args.repeat)
+            print(
+                f"{rows:>10} {name:>12} {dumps:>10.4f} {loads:>10.4f} "
+                f"{size / 2 ** 20:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Measures the compiled query cache of tables on a wide table
+
+    python scripts/benchmark_compiled_query_cache.py --columns 300 --metrics 50
+"""
+import argparse
+import time
+from datetime import datetime
+
+from superset.app import create_app
+from superset.utils.local_cache import LocalCache
+
+
+def make_table(columns: int, metrics: int):
+    # pylint: disable=import-outside-toplevel
+    from superset.connectors.sqla.models import SqlaTable, SqlMetric, TableColumn
+    from superset.models.core import Database
+
+    table = SqlaTable(
+        id=1,
+        table_name="wide_table",
+        database=Database(database_name="benchmark", sqlalchemy_uri="sqlite://"),
+        changed_on=datetime(2020, 1, 1),
+    )
+    table.columns = [TableColumn(column_name="ds", type="DATETIME", is_dttm=True)]
+    table.columns += [
+        TableColumn(
+            column_name=f"col_{i}",
+            type="VARCHAR(255)" if i % 2 else "BIGINT",
+            expression=f"UPPER(col_{i})" if i % 10 == 0 else None,
+            groupby=True,
+            filterable=True,
+        )
+        for i in range(columns)
+    ]
+    table.metrics = [
+        SqlMetric(metric_name=f"metric_{i}", expression=f"SUM(col_{2 * i})")
+        for i in range(metrics)
+    ]
+    return table
+
+
+def make_query_obj(metrics: int) -> dict:
+    return {
+        "granularity": "ds",
+        "from_dttm": datetime(2019, 1, 1),
+        "to_dttm": datetime(2020, 1, 1),
+        "groupby": [f"col_{i}" for i in range(1, 20, 2)],
+        "metrics": [f"metric_{i}" for i in range(min(metrics, 20))],
+        "is_timeseries": True,
+        "timeseries_limit": 0,
+        "row_limit": 10000,
+        "filter": [
+            {"col": f"col_{i}", "op": "in", "val": ["a", "b", "c"]}
+            for i in range(1, 20, 4)
+        ],
+        "extras": {"time_grain_sqla": "P1D", "where": "col_0 > 0"},
+    }
+
+
+def bench(func, query_obj: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(query_obj)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, default=300)
+    parser.add_argument("--metrics", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        # pylint: disable=import-outside-toplevel,protected-access
+        from superset.extensions import cache_manager
+
+        table = make_table(args.columns, args.metrics)
+        query_obj = make_query_obj(args.metrics)
+
+        cache_manager._compiled_query_cache = LocalCache(0)
+        uncached = bench(table.get_query_str_extended, query_obj, args.repeat)
+        cache_manager._compiled_query_cache = LocalCache(16 * 1024 * 1024)
+        table.get_query_str_extended(query_obj)
+        cached = bench(table.get_query_str_extended, query_obj, args.repeat)
+        key = bench(table.get_compiled_query_cache_key, query_obj, args.repeat)
+
+    print(f"{'':>12} {'ms':>9}")
+    print(f"{'uncached':>12} {uncached * 1000:>9.2f}")
+    print(f"{'cached':>12} {cached * 1000:>9.2f}")
+    print(f"{'cache key':>12} {key * 1000:>9.2f}")
+    print(f"speedup: {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
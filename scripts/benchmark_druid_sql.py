@@ -0,0 +1,196 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compares the native and Druid SQL paths of Druid datasources on a timeseries
+limited to its top series, against a local mock broker
+
+    python scripts/benchmark_druid_sql.py --days 365 --series 100
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from superset.app import create_app
+
+START = datetime(2019, 1, 1)
+COUNTRIES = ["US", "FR", "BR", "IN", "CN", "DE", "JP", "MX", "NG", "GB"]
+
+
+def make_rows(days: int, series: int):
+    """The rows of the limited timeseries, with their pre-query"""
+    keys = [
+        (COUNTRIES[i % len(COUNTRIES)], f"device_{i // len(COUNTRIES)}")
+        for i in range(series)
+    ]
+    top = [
+        (country, device, 1000 * (series - i))
+        for i, (country, device) in enumerate(keys)
+    ]
+    rows = [
+        ((START + timedelta(days=day)).isoformat() + ".000Z", country, device, day + i)
+        for day in range(days)
+        for i, (country, device) in enumerate(keys)
+    ]
+    return top, rows
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(top, rows):
+    start = START.isoformat() + ".000Z"
+    pre_query = json.dumps(
+        [
+            {
+                "version": "v1",
+                "timestamp": start,
+                "event": {"country": c, "device": d, "sum__clicks": v},
+            }
+            for c, d, v in top
+        ]
+    ).encode()
+    native = json.dumps(
+        [
+            {
+                "version": "v1",
+                "timestamp": ts,
+                "event": {"country": c, "device": d, "sum__clicks": v},
+            }
+            for ts, c, d, v in rows
+        ]
+    ).encode()
+    lines = [["__timestamp", "country", "device", "sum__clicks"]] + [
+        list(row) for row in rows
+    ]
+
+    class MockBroker(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+        def send_body(self, body: bytes) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            self.send_body(json.dumps({"version": "0.18.0"}).encode())
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if not self.path.rstrip("/").endswith("/sql"):
+                self.send_body(pre_query if query["granularity"] == "all" else native)
+                return
+            # stream the results a row at a time, as a broker does
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(lines), 1000):
+                chunk = "".join(json.dumps(line) + "\n" for line in lines[i : i + 1000])
+                chunk = chunk.encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"1\r\n\n\r\n0\r\n\r\n")
+
+    return MockBroker
+
+
+def make_datasource(port: int, use_sql: bool):
+    # pylint: disable=import-outside-toplevel
+    from superset.connectors.druid.models import (
+        DruidCluster,
+        DruidColumn,
+        DruidDatasource,
+        DruidMetric,
+    )
+
+    cluster = DruidCluster(
+        cluster_name="benchmark",
+        broker_host="localhost",
+        broker_port=port,
+        broker_endpoint="druid/v2",
+        use_sql=use_sql,
+    )
+    return DruidDatasource(
+        datasource_name="clicks",
+        cluster=cluster,
+        columns=[DruidColumn(column_name="country"), DruidColumn(column_name="device")],
+        metrics=[
+            DruidMetric(
+                metric_name="sum__clicks",
+                metric_type="longSum",
+                json=json.dumps(
+                    {"type": "longSum", "name": "sum__clicks", "fieldName": "clicks"}
+                ),
+            )
+        ],
+    )
+
+
+def bench(datasource, query_obj: dict, repeat: int):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(datasource.query(dict(query_obj)).df)
+        timings.append(time.perf_counter() - start)
+    return rows, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--series", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    top, rows = make_rows(args.days, args.series)
+    server = ThreadingHTTPServer(("localhost", 0), make_handler(top, rows))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    query_obj = {
+        "groupby": ["country", "device"],
+        "metrics": ["sum__clicks"],
+        "granularity": "one day",
+        "from_dttm": START,
+        "to_dttm": START + timedelta(days=args.days),
+        "filter": [],
+        "is_timeseries": True,
+        "timeseries_limit": args.series,
+        "row_limit": len(rows),
+        "extras": {},
+    }
+    app = create_app()
+    print(f"{'path':>8} {'rows':>9} {'ms':>9}")
+    with app.app_context():
+        for name, use_sql in [("native", False), ("sql", True)]:
+            datasource = make_datasource(port, use_sql)
+            count, duration = bench(datasource, query_obj, args.repeat)
+            print(f"{name:>8} {count:>9} {duration * 1000:>9.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
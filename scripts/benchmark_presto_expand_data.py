@@ -0,0 +1,144 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compares the expansion of nested Presto data with the legacy implementation
+
+    python scripts/benchmark_presto_expand_data.py --rows 20000 --length 5
+"""
+import argparse
+import copy
+import random
+import time
+from collections import defaultdict, deque
+from typing import Dict, List
+from unittest.mock import patch
+
+from superset.db_engine_specs.presto import get_children, PrestoEngineSpec
+
+COLUMNS = [
+    {"name": "id", "type": "BIGINT"},
+    {"name": "tags", "type": "ARRAY(VARCHAR)"},
+    {"name": "scores", "type": "ARRAY(BIGINT)"},
+    {
+        "name": "events",
+        "type": "ARRAY(ROW(kind VARCHAR, props ROW(a BIGINT, b VARCHAR), "
+        "ids ARRAY(BIGINT)))",
+    },
+    {"name": "matrix", "type": "ARRAY(ARRAY(BIGINT))"},
+]
+
+
+def make_data(rows: int, length: int) -> List[dict]:
+    rng = random.Random(0)
+
+    def array(make_value):
+        return [make_value() for _ in range(rng.randint(0, length))]
+
+    return [
+        {
+            "id": i,
+            "tags": array(lambda: rng.choice("abcdef")),
+            "scores": array(lambda: rng.randint(0, 100)),
+            "events": array(
+                lambda: [
+                    rng.choice(["click", "view"]),
+                    [rng.randint(0, 10), rng.choice("xyz")],
+                    array(lambda: rng.randint(0, 1000)),
+                ]
+            ),
+            "matrix": array(lambda: array(lambda: rng.randint(0, 9))),
+        }
+        for i in range(rows)
+    ]
+
+
+def legacy_expand_data(columns: List[dict], data: List[dict]):
+    """The implementation inserting unnested rows that `expand_data` used to have"""
+    to_process = deque((column, 0) for column in columns)
+    all_columns: List[dict] = []
+    expanded_columns = []
+    current_array_level = None
+    while to_process:
+        column, level = to_process.popleft()
+        if column["name"] not in [column["name"] for column in all_columns]:
+            all_columns.append(column)
+        if level != current_array_level:
+            unnested_rows: Dict[int, int] = defaultdict(int)
+            current_array_level = level
+        name = column["name"]
+        if column["type"].startswith("ARRAY("):
+            to_process.append((get_children(column)[0], level + 1))
+            i = 0
+            while i < len(data):
+                row = data[i]
+                values = row.get(name)
+                if values:
+                    extra_rows = len(values) - 1
+                    current_unnested_rows = unnested_rows[i]
+                    missing = extra_rows - current_unnested_rows
+                    for _ in range(missing):
+                        data.insert(i + current_unnested_rows + 1, {})
+                        unnested_rows[i] += 1
+                    for j, value in enumerate(values):
+                        data[i + j][name] = value
+                    i += unnested_rows[i]
+                i += 1
+        if column["type"].startswith("ROW("):
+            expanded = get_children(column)
+            to_process.extendleft((column, level) for column in expanded)
+            expanded_columns.extend(expanded)
+            for row in data:
+                for value, col in zip(row.get(name) or [], expanded):
+                    row[col["name"]] = value
+    data = [{k["name"]: row.get(k["name"], "") for k in all_columns} for row in data]
+    return all_columns, data, expanded_columns
+
+
+def bench(func, data: List[dict], repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        rows = copy.deepcopy(data)
+        start = time.perf_counter()
+        result = func(COLUMNS, rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--length", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_data(args.rows, args.length)
+    implementations = [
+        ("legacy", legacy_expand_data),
+        ("current", PrestoEngineSpec.expand_data),
+    ]
+    results = []
+    print(f"{'implementation':>15} {'time (s)':>10} {'rows':>9}")
+    with patch("superset.db_engine_specs.presto.is_feature_enabled", return_value=True):
+        for name, func in implementations:
+            duration, result = bench(func, data, args.repeat)
+            results.append(result)
+            print(f"{name:>15} {duration:>10.4f} {len(result[1]):>9}")
+    assert results[0] == results[1], "the implementations have different outputs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compares the compression codecs of the results backend on SQL Lab results
+
+    python scripts/benchmark_results_compression.py --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import simplejson as json
+
+from superset.utils import arrow_ipc, compression
+from superset.utils.core import json_iso_dttm_ser
+
+CODECS = [
+    ("none", None),
+    ("zlib", 1),
+    ("zlib", None),
+    ("zlib", 9),
+    ("lz4", None),
+    ("zstd", 1),
+    ("zstd", None),
+    ("zstd", 9),
+]
+
+
+def make_df(rows: int) -> pd.DataFrame:
+    """Results looking like a typical SQL Lab query on a fact table"""
+    rng = np.random.RandomState(0)
+    return pd.DataFrame(
+        {
+            "ds": pd.date_range("2019-01-01", periods=rows, freq="min"),
+            "country": rng.choice(["US", "FR", "BR", "IN", "CN", "DE"], rows),
+            "user_name": [f"user_{i}" for i in rng.randint(0, rows // 10, rows)],
+            "clicks": rng.poisson(3, rows),
+            "revenue": rng.lognormal(2, 1, rows).round(2),
+            "ratio": rng.rand(rows),
+        }
+    )
+
+
+def bench(codec, data: bytes, repeat: int):
+    compress, decompress = [], []
+    blob = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        blob = compression.compress(data, codec)
+        compress.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        compression.decompress(blob, decode=False)
+        decompress.append(time.perf_counter() - start)
+    return len(blob), min(compress), min(decompress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_df(args.rows)
+    payloads = [
+        ("json", df.to_dict("records")),
+        ("arrow", arrow_ipc.serialize_dataframe(df)),
+    ]
+    header = (
+        f"{'payload':>8} {'codec':>6} {'level':>6} {'MB':>8} {'ratio':>7} "
+        f"{'comp MB/s':>10} {'decomp MB/s':>12}"
+    )
+    print(header)
+    for payload_name, payload in payloads:
+        if payload_name == "json":
+            data = json.dumps(
+                {"data": payload}, default=json_iso_dttm_ser, ignore_nan=True
+            ).encode("utf-8")
+        else:
+            data = payload
+        megabytes = len(data) / 2 ** 20
+        for name, level in CODECS:
+            codec = compression.get_codec(name, level)
+            size, compress, decompress = bench(codec, data, args.repeat)
+            print(
+                f"{payload_name:>8} {name:>6} {str(level):>6} {megabytes:>8.2f} "
+                f"{len(data) / size:>7.2f} {megabytes / compress:>10.1f} "
+                f"{megabytes / decompress:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
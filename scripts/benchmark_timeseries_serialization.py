@@ -0,0 +1,106 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compares the time series chart serialization with the legacy implementation
+
+    python scripts/benchmark_timeseries_serialization.py --series 50 --points 5000
+"""
+import argparse
+import time
+from unittest.mock import Mock
+
+import numpy as np
+import pandas as pd
+
+from superset import viz
+
+
+def make_df(series: int, points: int) -> pd.DataFrame:
+    rng = np.random.RandomState(0)
+    index = pd.date_range("2019-01-01", periods=points, freq="min", name="__timestamp")
+    df = pd.DataFrame(
+        {("sum__num", f"serie {i}"): rng.rand(points) for i in range(series)},
+        index=index,
+    )
+    df.iloc[::10] = np.nan
+    return df
+
+
+def legacy_to_series(viz_obj, df):
+    """The row by row implementation `to_series` used to have"""
+    series = df.to_dict("series")
+    chart_data = []
+    for name in df.T.index.tolist():
+        ys = series[name]
+        if df[name].dtype.kind not in "biufc":
+            continue
+        series_title = tuple(str(title) for title in name)
+        if len(series_title) > 1 and len(viz_obj.metric_labels) == 1:
+            series_title = series_title[1:]
+        values = []
+        non_nan_cnt = 0
+        for ds in df.index:
+            if ds in ys:
+                d = {"x": ds, "y": ys[ds]}
+                if not np.isnan(ys[ds]):
+                    non_nan_cnt += 1
+            else:
+                d = {}
+            values.append(d)
+        if non_nan_cnt == 0:
+            continue
+        chart_data.append({"key": series_title, "values": values})
+    return chart_data
+
+
+def bench(func, viz_obj, df, repeat: int):
+    build, dump = [], []
+    payload = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chart_data = func(df.copy())
+        build.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        payload = viz_obj.json_dumps(chart_data)
+        dump.append(time.perf_counter() - start)
+    return min(build), min(dump), len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--series", type=int, default=50)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_df(args.series, args.points)
+    rows = viz.NVD3TimeSeriesViz(Mock(), {"metrics": ["sum__num"]})
+    columnar = viz.NVD3TimeSeriesViz(
+        Mock(), {"metrics": ["sum__num"], "series_format": "columnar"}
+    )
+    implementations = [
+        ("legacy", rows, lambda df: legacy_to_series(rows, df)),
+        ("rows", rows, rows.to_series),
+        ("columnar", columnar, columnar.to_series),
+    ]
+    print(f"{'format':>10} {'build (s)':>10} {'dumps (s)':>10} {'MB':>9}")
+    for name, viz_obj, func in implementations:
+        build, dump, size = bench(func, viz_obj, df, args.repeat)
+        print(f"{name:>10} {build:>10.4f} {dump:>10.4f} {size / 2 ** 20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,10 +32,13 @@ from superset.extensions import (
     cache_manager,
     celery_app,
     db,
+    engine_pool_manager,
     feature_flag_manager,
     jinja_context_manager,
     manifest_processor,
     migrate,
+    query_cost_guard,
+    query_progress_reporter,
     results_backend_manager,
     talisman,
 )
@@ -181,6 +184,8 @@ class SupersetAppInitializer:
     def configure_cache(self):
         cache_manager.init_app(self.flask_app)
         results_backend_manager.init_app(self.flask_app)
+        query_progress_reporter.init_app(self.flask_app, cache_manager.cache)
+        query_cost_guard.init_app(self.flask_app, cache_manager.cache)
 
     def configure_feature_flags(self):
         feature_flag_manager.init_app(self.flask_app)
@@ -257,6 +262,7 @@ class SupersetAppInitializer:
 
     def setup_db(self):
         db.init_app(self.flask_app)
+        engine_pool_manager.init_app(self.flask_app)
 
         with self.flask_app.app_context():
             pessimistic_connection_handling(db.engine)
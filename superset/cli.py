@@ -170,14 +170,24 @@ def set_database_uri(database_name, uri):
     default=False,
     help="Specify using 'merge' property during operation. " "Default value is False.",
 )
-def refresh_druid(datasource, merge):
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    default=False,
+    help="Refresh the datasources whose segments didn't change since their last "
+    "refresh too. Default value is False.",
+)
+def refresh_druid(datasource, merge, force):
     """Refresh druid datasources"""
     session = db.session()
     from superset.connectors.druid.models import DruidCluster
 
     for cluster in session.query(DruidCluster).all():
         try:
-            cluster.refresh_datasources(datasource_name=datasource, merge_flag=merge)
+            cluster.refresh_datasources(
+                datasource_name=datasource, merge_flag=merge, force=force
+            )
         except Exception as e:  # pylint: disable=broad-except
             print("Error while processing cluster '{}'\n{}".format(cluster, str(e)))
             logging.exception(e)
@@ -15,14 +15,13 @@
 # specific language governing permissions and limitations
 # under the License.
 import logging
-import pickle as pkl
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
-from superset import app, cache, db
+from superset import app, cache, cache_manager, db
 from superset.connectors.base.models import BaseDatasource
 from superset.connectors.connector_registry import ConnectorRegistry
 from superset.stats_logger import BaseStatsLogger
@@ -160,6 +159,19 @@ class QueryContext:
             return self.datasource.database.cache_timeout
         return config["CACHE_DEFAULT_TIMEOUT"]
 
+    def load_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Returns the deserialized df payload stored at ``cache_key``, if any"""
+        try:
+            cache_value = cache_manager.get_chart_data(cache_key, self.cache_timeout)
+        except Exception as e:  # pylint: disable=broad-except
+            logging.exception(e)
+            logging.error("Error reading cache: %s", utils.error_msg_from_exception(e))
+            return None
+        if cache_value is not None:
+            stats_logger.incr("loaded_from_cache")
+            logging.info("Serving from cache")
+        return cache_value
+
     def get_df_payload(  # pylint: disable=too-many-locals,too-many-statements
         self, query_obj: QueryObject, **kwargs
     ) -> Dict[str, Any]:
@@ -184,56 +196,59 @@ class QueryContext:
         query = ""
         error_message = None
         if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
-            if cache_value:
-                stats_logger.incr("loaded_from_cache")
-                try:
-                    cache_value = pkl.loads(cache_value)
+            cache_value = self.load_from_cache(cache_key)
+            if cache_value is not None:
+                df = cache_value["df"]
+                query = cache_value["query"]
+                status = utils.QueryStatus.SUCCESS
+                is_loaded = True
+
+        # concurrent requests for the same key wait for a single query
+        flight_key = cache_key if not self.force and not is_loaded else None
+        with cache_manager.single_flight.flight(flight_key) as waited:
+            if waited and cache_key:
+                cache_value = self.load_from_cache(cache_key)
+                if cache_value is not None:
                     df = cache_value["df"]
                     query = cache_value["query"]
                     status = utils.QueryStatus.SUCCESS
                     is_loaded = True
-                except Exception as e:  # pylint: disable=broad-except
-                    logging.exception(e)
-                    logging.error(
-                        "Error reading cache: %s", utils.error_msg_from_exception(e)
-                    )
-                logging.info("Serving from cache")
-
-        if query_obj and not is_loaded:
-            try:
-                query_result = self.get_query_result(query_obj)
-                status = query_result["status"]
-                query = query_result["query"]
-                error_message = query_result["error_message"]
-                df = query_result["df"]
-                if status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
-                    is_loaded = True
-            except Exception as e:  # pylint: disable=broad-except
-                logging.exception(e)
-                if not error_message:
-                    error_message = "{}".format(e)
-                status = utils.QueryStatus.FAILED
-                stacktrace = utils.get_stacktrace()
-
-            if is_loaded and cache_key and cache and status != utils.QueryStatus.FAILED:
+            if query_obj and not is_loaded:
                 try:
-                    cache_value = dict(dttm=cached_dttm, df=df, query=query)
-                    cache_binary = pkl.dumps(cache_value, protocol=pkl.HIGHEST_PROTOCOL)
-
-                    logging.info(
-                        "Caching %d chars at key %s", len(cache_binary), cache_key
-                    )
-
-                    stats_logger.incr("set_cache_key")
-                    cache.set(cache_key, cache_binary, timeout=self.cache_timeout)
+                    query_result = self.get_query_result(query_obj)
+                    status = query_result["status"]
+                    query = query_result["query"]
+                    error_message = query_result["error_message"]
+                    df = query_result["df"]
+                    if status != utils.QueryStatus.FAILED:
+                        stats_logger.incr("loaded_from_source")
+                        is_loaded = True
                 except Exception as e:  # pylint: disable=broad-except
-                    # cache.set call can fail if the backend is down or if
-                    # the key is too large or whatever other reasons
-                    logging.warning("Could not cache key %s", cache_key)
                     logging.exception(e)
-                    cache.delete(cache_key)
+                    if not error_message:
+                        error_message = "{}".format(e)
+                    status = utils.QueryStatus.FAILED
+                    stacktrace = utils.get_stacktrace()
+
+                if (
+                    is_loaded
+                    and cache_key
+                    and cache
+                    and status != utils.QueryStatus.FAILED
+                ):
+                    try:
+                        cache_value = dict(dttm=cached_dttm, df=df, query=query)
+                        stats_logger.incr("set_cache_key")
+                        size = cache_manager.set_chart_data(
+                            cache_key, cache_value, timeout=self.cache_timeout
+                        )
+                        logging.info("Cached %d chars at key %s", size, cache_key)
+                    except Exception as e:  # pylint: disable=broad-except
+                        # cache.set call can fail if the backend is down or if
+                        # the key is too large or whatever other reasons
+                        logging.warning("Could not cache key %s", cache_key)
+                        logging.exception(e)
+                        cache_manager.delete_chart_data(cache_key)
         return {
             "cache_key": cache_key,
             "cached_dttm": cache_value["dttm"] if cache_value is not None else None,
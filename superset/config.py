@@ -193,6 +193,17 @@ DRUID_ANALYSIS_TYPES = ["cardinality"]
 # connector. This feature may be removed at a future date.
 DRUID_IS_ACTIVE = False
 
+# The results of the Druid SQL queries of the clusters using Druid SQL are parsed
+# into DataFrames of this many rows as they are received, then concatenated
+DRUID_SQL_BATCH_ROWS = 10000
+
+# The number of Druid datasources whose metadata is fetched concurrently when
+# refreshing a cluster. Datasources whose time boundary, dimensions and metrics
+# didn't change since they were last refreshed are skipped, unless the refresh is
+# forced, e.g. with `superset refresh_druid --force` or
+# `/druid/refresh_datasources/?force=true`.
+DRUID_REFRESH_CONCURRENCY = 8
+
 # ----------------------------------------------------
 # AUTHENTICATION CONFIG
 # ----------------------------------------------------
@@ -304,6 +315,66 @@ CACHE_DEFAULT_TIMEOUT = 60 * 60 * 24
 CACHE_CONFIG: Dict[str, Any] = {"CACHE_TYPE": "null"}
 TABLE_NAMES_CACHE_CONFIG = {"CACHE_TYPE": "null"}
 
+# Serializer for the chart data (dataframes) stored in CACHE_CONFIG. "pickle" is
+# the legacy format, "arrow" stores the dataframes as Arrow IPC streams which
+# are cheaper to produce and load for large results. Arrow payloads can be
+# compressed with "lz4" or "zstd" through CHART_DATA_CACHE_COMPRESSION. An
+# instance of `superset.utils.cache_serialization.ChartDataCacheSerializer`
+# is also accepted. Entries written by either format remain readable, so the
+# serializer can be switched without flushing the cache.
+CHART_DATA_CACHE_SERIALIZER = "pickle"
+CHART_DATA_CACHE_COMPRESSION: Optional[str] = None
+
+# Coalesce identical chart queries: when the data for a chart cache key is
+# missing, only one request runs the query while concurrent requests for the same
+# key wait (up to CHART_DATA_SINGLE_FLIGHT_WAIT_TIMEOUT seconds) for its result to
+# land in the cache. The lock is held in the CACHE_CONFIG backend and expires
+# after CHART_DATA_SINGLE_FLIGHT_LOCK_TIMEOUT seconds.
+CHART_DATA_SINGLE_FLIGHT = False
+CHART_DATA_SINGLE_FLIGHT_LOCK_TIMEOUT = 60
+CHART_DATA_SINGLE_FLIGHT_WAIT_TIMEOUT = 30
+
+# Size in bytes of the in-process cache of the chart data payloads read from or
+# written to CACHE_CONFIG, 0 to disable it. The payloads are kept deserialized,
+# the least recently used ones being evicted first, and expire along with their
+# CACHE_CONFIG entry. As each process has its own copy, a payload refreshed by
+# another process through `force` may be served for up to its cache timeout.
+CHART_DATA_LOCAL_CACHE_MAX_BYTES = 0
+
+# Size in bytes of the in-process cache of the SQL compiled for the queries of
+# tables, 0 to disable it. Entries are keyed by the query object along with the
+# last change of the table, its columns, metrics and database, so that editing
+# them compiles the queries again. Queries of tables using Jinja templates, in
+# their SQL or in the WHERE and HAVING clauses, depend on the request and are
+# always compiled. SQL_QUERY_MUTATOR is applied after the cache.
+SQLA_COMPILED_QUERY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Incremental caching of time series charts: the data of the time series charts
+# of tables is additionally cached in chunks of TIME_SERIES_INCREMENTAL_CACHE_CHUNK
+# seconds, so that when the chart cache expires only the chunks missing from the
+# cache and the chunks less than TIME_SERIES_INCREMENTAL_CACHE_SETTLE_PERIOD
+# seconds old are queried. Settled chunks are kept for
+# TIME_SERIES_INCREMENTAL_CACHE_IMMUTABLE_TIMEOUT seconds, or until the table,
+# its columns, metrics or database are edited. Only queries with a time grain of
+# a fixed duration (up to a day), no series limit, no time shift and the
+# [start, end) time range endpoints are eligible, and data with timestamps with a
+# time zone isn't cached. Can be enabled per database with the
+# `time_series_incremental_cache` key of the database extra.
+TIME_SERIES_INCREMENTAL_CACHE = False
+TIME_SERIES_INCREMENTAL_CACHE_CHUNK = 60 * 60 * 24
+TIME_SERIES_INCREMENTAL_CACHE_SETTLE_PERIOD = 60 * 60
+TIME_SERIES_INCREMENTAL_CACHE_IMMUTABLE_TIMEOUT = 60 * 60 * 24 * 30
+
+# The batch explore endpoint (/superset/explore_json_batch/) computes the data of
+# several charts in a single request, e.g. all the charts of a dashboard. Charts
+# sharing a cache key are computed once and the others run concurrently on up to
+# EXPLORE_JSON_BATCH_MAX_WORKERS threads per request, with no more than
+# EXPLORE_JSON_BATCH_DATABASE_CONCURRENCY concurrent queries per database and
+# process. The latter can be overridden per database with the
+# `explore_json_batch_concurrency` key of the database extra.
+EXPLORE_JSON_BATCH_MAX_WORKERS = 8
+EXPLORE_JSON_BATCH_DATABASE_CONCURRENCY = 4
+
 # CORS Options
 ENABLE_CORS = False
 CORS_OPTIONS: Dict[Any, Any] = {}
@@ -324,6 +395,17 @@ ALLOWED_EXTENSIONS = {"csv", "tsv"}
 # note: index option should not be overridden
 CSV_EXPORT = {"encoding": "utf-8"}
 
+# CSV exports of charts and SQL Lab queries are streamed to the client this many
+# rows at a time instead of being built in memory as a single string. Results
+# fetched again from the database are read from the cursor in batches of this
+# size, unless the database sets a `fetch_batch_size`.
+CSV_EXPORT_CHUNK_ROWS = 10000
+
+# Gzip streamed CSV exports when the client accepts it. Flask-Compress buffers
+# the whole response before compressing it, so it should not be configured to
+# compress CSV files.
+CSV_EXPORT_GZIP = False
+
 # ---------------------------------------------------
 # Time grain configurations
 # ---------------------------------------------------
@@ -425,6 +507,29 @@ GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "")
 # in the results backend. This also becomes the limit when exporting CSVs
 SQL_MAX_ROW = 100000
 
+# When set, `Database.get_df` fetches query results in batches of this many rows
+# and converts each batch into typed columns as it goes, instead of loading the
+# whole result set as a list of tuples first. This roughly halves the peak
+# memory of large chart queries. Can be overridden per database by setting
+# `fetch_batch_size` in the database `extra` attributes.
+DB_FETCH_BATCH_SIZE: Optional[int] = None
+
+# Databases connect without a connection pool unless `connection_pool` is set in
+# their `extra` attributes, e.g. **"connection_pool": {"pool_size": 5,
+# "max_overflow": 10, "pool_recycle": 3600, "pool_pre_ping": true}**, saving the
+# connection handshake on every query. A pool is kept per effective user when
+# impersonating users, and the least recently used pools are disposed once there
+# are more than this many of them in a process. 0 means no limit.
+DB_CONNECTION_POOL_MAX_COUNT = 100
+
+# Each process caches the engines of the databases without a connection pool,
+# one per database, schema, source and effective user. At most this many
+# engines are kept, the least recently used ones are disposed first, and engines
+# are recreated after SQLA_ENGINE_CACHE_TTL seconds. Other memoized methods,
+# e.g. Slice.viz or Database.get_dialect, keep up to 1024 values each.
+SQLA_ENGINE_CACHE_MAX_SIZE = 1000
+SQLA_ENGINE_CACHE_TTL = 60 * 60 * 24
+
 # Maximum number of rows displayed in SQL Lab UI
 # Is set to avoid out of memory/localstorage issues in browsers. Does not affect
 # exported CSVs
@@ -512,6 +617,32 @@ SQLLAB_ASYNC_TIME_LIMIT_SEC = 60 * 60 * 6
 # timeout.
 SQLLAB_QUERY_COST_ESTIMATE_TIMEOUT = 10  # seconds
 
+# Check the cost of SQL Lab and chart queries, estimated by the engine before
+# they run, against budgets. Only engines supporting cost estimation, e.g. Presto
+# with its `version` set in the database extra, are checked. Budgets map the cost
+# metrics of the engine to their maximum, e.g. {"Gamma": {"cpuCost": 1e12}}; a
+# user gets the most generous budget of their roles, a role missing from the
+# budgets or a metric missing from one of them being unlimited, so every role of
+# a user needs a budget for them to be limited. The `query_cost_budget` key of
+# the database extra caps the budget of every user. Queries over budget are
+# rejected, or with the "deprioritize" action:
+# - asynchronous SQL Lab queries are sent to the QUERY_COST_GUARD_DEPRIORITIZED_QUEUE
+#   Celery queue, when set, to be served by dedicated workers of low concurrency,
+#   e.g. `celery worker -Q sql_lab_expensive --concurrency 1`
+# - other queries wait for one of QUERY_COST_GUARD_DEPRIORITIZED_CONCURRENCY slots
+#   per database and process, which only limits processes running queries in
+#   several threads, e.g. threaded web servers. Prefork Celery workers and sync
+#   gunicorn workers run one query at a time, so they are never limited.
+# Estimates are cached per normalized SQL in the cache for
+# QUERY_COST_ESTIMATE_CACHE_TIMEOUT seconds and decisions are logged as
+# `query_cost.<source>.<decision>` metrics.
+QUERY_COST_GUARD_ENABLED = False
+QUERY_COST_GUARD_ACTION = "reject"
+QUERY_COST_BUDGETS_BY_ROLE: Dict[str, Dict[str, float]] = {}
+QUERY_COST_GUARD_DEPRIORITIZED_CONCURRENCY = 1
+QUERY_COST_GUARD_DEPRIORITIZED_QUEUE: Optional[str] = None
+QUERY_COST_ESTIMATE_CACHE_TIMEOUT = 3600
+
 # An instantiated derivative of werkzeug.contrib.cache.BaseCache
 # if enabled, it can be used to store the results of long-running queries
 # in SQL Lab by using the "Run Async" button/feature
@@ -521,8 +652,53 @@ RESULTS_BACKEND = None
 # rather than JSON. This feature requires additional testing from the
 # community before it is fully adopted, so this config option is provided
 # in order to disable should breaking issues be discovered.
+# The data is stored as an Arrow IPC stream, which /superset/results/<key>/
+# returns as is to clients asking for application/vnd.apache.arrow.stream.
 RESULTS_BACKEND_USE_MSGPACK = False
 
+# Serve SQL Lab queries from the results of an identical query still in the
+# results backend instead of running them again. Queries are identical when their
+# SQL, once comments, whitespace and the case of reserved keywords are normalized,
+# their database, schema, limit and effective user are the same. Only SELECT
+# statements are served from cache, for the cache timeout of their database. Can
+# be enabled per database with the `sqllab_results_cache` key of the database
+# extra.
+SQLLAB_RESULTS_CACHE = False
+
+# Run the statements of a SQL Lab query concurrently, on up to this many
+# connections, when they are all independent: SELECT statements neither writing
+# nor relying on the state of the session such as variables or temporary tables.
+# The results of each statement are then returned, the ones of the last statement
+# being the results of the query. 0 or 1 runs the statements one after the other,
+# the ``sqllab_parallel_statements`` database extra overrides it.
+SQLLAB_PARALLEL_STATEMENTS = 0
+
+# Store SQL Lab results in the results backend as chunks of this many rows,
+# each compressed on its own under a key derived from the results key. Paging
+# through the results with the `offset` and `limit` arguments of the results
+# endpoint then only reads the chunks it needs, and CSV exports stream the
+# chunks one at a time. Results are stored as a single blob when set to 0.
+RESULTS_BACKEND_CHUNK_ROWS = 0
+
+# Write the results of asynchronous SQL Lab queries to the results backend as
+# they are fetched, RESULTS_BACKEND_CHUNK_ROWS rows at a time, rather than once
+# they are all in memory, so that workers don't need memory proportional to
+# SQL_MAX_ROW. Engines supporting it fetch the rows from server-side cursors,
+# e.g. named cursors for PostgreSQL and unbuffered cursors for MySQL. Requires
+# RESULTS_BACKEND_CHUNK_ROWS, results expanded before being stored, i.e. with
+# RESULTS_BACKEND_USE_MSGPACK disabled, are never streamed.
+SQLLAB_STREAM_RESULTS = False
+
+# The codec compressing the payloads stored in the results backend, one of
+# "zlib", "lz4", "zstd" or "none", along with its level, the default level of
+# the codec being used when None. lz4 and zstd trade some compression ratio for
+# much cheaper compression, see scripts/benchmark_results_compression.py. The
+# codec is recorded in each payload so it can be changed at any time, and
+# databases can override it with the `results_backend_compression` key of their
+# extra, e.g. {"codec": "zstd", "level": 3}.
+RESULTS_BACKEND_COMPRESSION = "zlib"
+RESULTS_BACKEND_COMPRESSION_LEVEL: Optional[int] = None
+
 # The S3 bucket where you want to store your external hive tables created
 # from CSV files. For example, 'companyname-superset'
 CSV_TO_HIVE_UPLOAD_S3_BUCKET = None
@@ -600,9 +776,26 @@ BLUEPRINTS: List[Callable] = []
 # into a proxied one
 TRACKING_URL_TRANSFORMER = lambda x: x
 
-# Interval between consecutive polls when using Hive Engine
+# Maximum interval between consecutive polls when using Hive Engine
 HIVE_POLL_INTERVAL = 5
 
+# Presto and Hive queries are polled for progress every
+# SQLLAB_POLL_INTERVAL_MIN seconds at first, the interval doubling after each
+# poll up to SQLLAB_POLL_INTERVAL_MAX seconds (HIVE_POLL_INTERVAL for Hive),
+# so that short queries return quickly without polling long ones too often.
+SQLLAB_POLL_INTERVAL_MIN = 0.05
+SQLLAB_POLL_INTERVAL_MAX = 1
+
+# The progress of the queries running in a worker is written to the metadata
+# database in a single transaction at most every SQLLAB_PROGRESS_FLUSH_INTERVAL
+# seconds. Stopping a query sets a flag in the cache (see CACHE_CONFIG), which
+# the worker running it checks on every poll, the status of the query in the
+# metadata database being checked every SQLLAB_STOP_CHECK_INTERVAL seconds.
+# Unless the cache is shared across processes, i.e. redis or memcached, the
+# status is checked on every poll instead.
+SQLLAB_PROGRESS_FLUSH_INTERVAL = 1
+SQLLAB_STOP_CHECK_INTERVAL = 10
+
 # Allow for javascript controls components
 # this enables programmers to customize certain charts (like the
 # geospatial ones) by inputing javascript in controls. This exposes
@@ -16,6 +16,7 @@
 # under the License.
 # pylint: disable=C,R,W
 # pylint: disable=invalid-unary-operand-type
+import hashlib
 import json
 import logging
 import re
@@ -46,10 +47,12 @@ from sqlalchemy import (
     UniqueConstraint,
 )
 from sqlalchemy.orm import backref, relationship, RelationshipProperty, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy_utils import EncryptedType
 
 from superset import conf, db, security_manager
 from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetric
+from superset.connectors.druid import sql as druid_sql
 from superset.constants import NULL_STRING
 from superset.exceptions import SupersetException
 from superset.models.core import Database
@@ -113,8 +116,8 @@ except NameError:
 
 # Function wrapper because bound methods cannot
 # be passed to processes
-def _fetch_metadata_for(datasource):
-    return datasource.latest_metadata()
+def _fetch_metadata_for(datasource, fingerprint=None):
+    return datasource.fetch_metadata(fingerprint)
 
 
 class DruidCluster(Model, AuditMixinNullable, ImportMixin):
@@ -135,6 +138,11 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
     cache_timeout = Column(Integer)
     broker_user = Column(String(255))
     broker_pass = Column(EncryptedType(String(255), conf.get("SECRET_KEY")))
+    # whether the datasources are queried with Druid SQL rather than native queries
+    use_sql = Column(Boolean, default=False)
+
+    # the number of datasources whose columns and metrics are merged per query
+    REFRESH_CHUNK_SIZE = 500
 
     export_fields = [
         "cluster_name",
@@ -143,6 +151,7 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
         "broker_endpoint",
         "cache_timeout",
         "broker_user",
+        "use_sql",
     ]
     update_from_object_fields = export_fields
     export_children = ["datasources"]
@@ -182,6 +191,20 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
         auth = requests.auth.HTTPBasicAuth(self.broker_user, self.broker_pass)
         return json.loads(requests.get(endpoint, auth=auth).text)
 
+    def get_datasource_schema(self, datasource_name: str) -> Optional[Dict]:
+        """Returns the dimensions and metrics of the recent segments of a
+        datasource, as known by the broker, None when they can't be fetched"""
+        endpoint = self.get_base_broker_url() + "/datasources/" + datasource_name
+        auth = requests.auth.HTTPBasicAuth(self.broker_user, self.broker_pass)
+        try:
+            return json.loads(requests.get(endpoint, auth=auth).text)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.warning(
+                "Could not fetch the schema of datasource [{}]".format(datasource_name)
+            )
+            logging.exception(e)
+            return None
+
     def get_druid_version(self) -> str:
         endpoint = self.get_base_url(self.broker_host, self.broker_port) + "/status"
         auth = requests.auth.HTTPBasicAuth(self.broker_user, self.broker_pass)
@@ -197,9 +220,11 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
         datasource_name: Optional[str] = None,
         merge_flag: bool = True,
         refresh_all: bool = True,
+        force: bool = False,
     ) -> None:
         """Refresh metadata of all datasources in the cluster
-        If ``datasource_name`` is specified, only that datasource is updated
+        If ``datasource_name`` is specified, only that datasource is updated.
+        Datasources whose segments didn't change are skipped unless ``force``
         """
         ds_list = self.get_datasources()
         blacklist = conf.get("DRUID_DATA_SOURCE_BLACKLIST", [])
@@ -210,14 +235,23 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
             ds_refresh.append(datasource_name)
         else:
             return
-        self.refresh(ds_refresh, merge_flag, refresh_all)
+        self.refresh(ds_refresh, merge_flag, refresh_all, force)
 
     def refresh(
-        self, datasource_names: List[str], merge_flag: bool, refresh_all: bool
+        self,
+        datasource_names: List[str],
+        merge_flag: bool,
+        refresh_all: bool,
+        force: bool = False,
     ) -> None:
         """
         Fetches metadata for the specified datasources and
         merges to the Superset database
+
+        The metadata is fetched by DRUID_REFRESH_CONCURRENCY threads, skipping the
+        datasources whose segments didn't change since their last refresh unless
+        ``force``, then the columns and metrics of all the datasources are merged
+        with a query per chunk of datasources.
         """
         session = db.session
         ds_list = (
@@ -226,6 +260,12 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
             .filter(DruidDatasource.datasource_name.in_(datasource_names))
         )
         ds_map = {ds.name: ds for ds in ds_list}
+        existing_names = set(ds_map)
+        fingerprints: Dict[str, Optional[str]] = {}
+        if not force:
+            fingerprints = {
+                ds_name: ds.segments_fingerprint for ds_name, ds in ds_map.items()
+            }
         for ds_name in datasource_names:
             datasource = ds_map.get(ds_name, None)
             if not datasource:
@@ -234,48 +274,91 @@ class DruidCluster(Model, AuditMixinNullable, ImportMixin):
                     session.add(datasource)
                 flasher(_("Adding new datasource [{}]").format(ds_name), "success")
                 ds_map[ds_name] = datasource
+                datasource.cluster = self
             elif refresh_all:
-                flasher(_("Refreshing datasource [{}]").format(ds_name), "info")
+                # the datasource belongs to the cluster already, this spares
+                # loading its previous cluster
+                set_committed_value(datasource, "cluster", self)
             else:
                 del ds_map[ds_name]
                 continue
-            datasource.cluster = self
             datasource.merge_flag = merge_flag
         session.flush()
 
-        # Prepare multithreaded executation
-        pool = ThreadPool()
         ds_refresh = list(ds_map.values())
-        metadata = pool.map(_fetch_metadata_for, ds_refresh)
+        if not ds_refresh:
+            session.commit()
+            return
+        # resolve the version of the cluster once rather than in every thread
+        logging.info(
+            "Refreshing {} datasources of cluster [{}], Druid {}".format(
+                len(ds_refresh), self.cluster_name, self.druid_version
+            )
+        )
+
+        # Prepare multithreaded executation
+        pool = ThreadPool(min(conf.get("DRUID_REFRESH_CONCURRENCY"), len(ds_refresh)))
+        metadata = pool.starmap(
+            _fetch_metadata_for, [(ds, fingerprints.get(ds.name)) for ds in ds_refresh]
+        )
         pool.close()
         pool.join()
 
-        for i in range(0, len(ds_refresh)):
-            datasource = ds_refresh[i]
-            cols = metadata[i]
-            if cols:
-                col_objs_list = (
-                    session.query(DruidColumn)
-                    .filter(DruidColumn.datasource_id == datasource.id)
-                    .filter(DruidColumn.column_name.in_(cols.keys()))
-                )
-                col_objs = {col.column_name: col for col in col_objs_list}
+        refreshed = [
+            (datasource, fingerprint, cols)
+            for datasource, (fingerprint, cols) in zip(ds_refresh, metadata)
+            if cols
+        ]
+        for datasource, unused, unused in refreshed:
+            if datasource.name in existing_names:
+                flasher(_("Refreshing datasource [{}]").format(datasource.name), "info")
+        logging.info(
+            "Refreshed {} of the {} datasources of cluster [{}], the segments of "
+            "the others are unchanged or unavailable".format(
+                len(refreshed), len(ds_refresh), self.cluster_name
+            )
+        )
+
+        datasource_ids = [datasource.id for datasource, unused, unused in refreshed]
+        col_objs: Dict[int, Dict[str, DruidColumn]] = {}
+        dbmetrics: Dict[int, Dict[str, DruidMetric]] = {}
+        for i in range(0, len(datasource_ids), self.REFRESH_CHUNK_SIZE):
+            chunk = datasource_ids[i : i + self.REFRESH_CHUNK_SIZE]
+            for col_obj in session.query(DruidColumn).filter(
+                DruidColumn.datasource_id.in_(chunk)
+            ):
+                col_objs.setdefault(col_obj.datasource_id, {})[
+                    col_obj.column_name
+                ] = col_obj
+            for dbmetric in session.query(DruidMetric).filter(
+                DruidMetric.datasource_id.in_(chunk)
+            ):
+                dbmetrics.setdefault(dbmetric.datasource_id, {})[
+                    dbmetric.metric_name
+                ] = dbmetric
+
+        with session.no_autoflush:
+            for datasource, fingerprint, cols in refreshed:
+                datasource_cols = col_objs.setdefault(datasource.id, {})
                 for col in cols:
                     if col == "__time":  # skip the time column
                         continue
-                    col_obj = col_objs.get(col)
+                    col_obj = datasource_cols.get(col)
                     if not col_obj:
                         col_obj = DruidColumn(
                             datasource_id=datasource.id, column_name=col
                         )
-                        with session.no_autoflush:
-                            session.add(col_obj)
+                        session.add(col_obj)
+                        datasource_cols[col] = col_obj
                     col_obj.type = cols[col]["type"]
                     col_obj.datasource = datasource
                     if col_obj.type == "STRING":
                         col_obj.groupby = True
                         col_obj.filterable = True
-                datasource.refresh_metrics()
+                datasource_metrics = dbmetrics.setdefault(datasource.id, {})
+                for col_obj in datasource_cols.values():
+                    col_obj.refresh_metrics(datasource_metrics)
+                datasource.segments_fingerprint = fingerprint
         session.commit()
 
     @property
@@ -351,15 +434,22 @@ class DruidColumn(Model, BaseColumn):
         }
         return metrics
 
-    def refresh_metrics(self) -> None:
-        """Refresh metrics based on the column metadata"""
+    def refresh_metrics(
+        self, dbmetrics: Optional[Dict[str, "DruidMetric"]] = None
+    ) -> None:
+        """Refresh metrics based on the column metadata
+
+        :param dbmetrics: The metrics of the datasource by name, queried when
+            None, to which the new metrics are added
+        """
         metrics = self.get_metrics()
-        dbmetrics = (
-            db.session.query(DruidMetric)
-            .filter(DruidMetric.datasource_id == self.datasource_id)
-            .filter(DruidMetric.metric_name.in_(metrics.keys()))
-        )
-        dbmetrics = {metric.metric_name: metric for metric in dbmetrics}
+        if dbmetrics is None:
+            dbmetrics = {
+                metric.metric_name: metric
+                for metric in db.session.query(DruidMetric)
+                .filter(DruidMetric.datasource_id == self.datasource_id)
+                .filter(DruidMetric.metric_name.in_(metrics.keys()))
+            }
         for metric in metrics.values():
             dbmetric = dbmetrics.get(metric.metric_name)
             if dbmetric:
@@ -369,6 +459,7 @@ class DruidColumn(Model, BaseColumn):
                 with db.session.no_autoflush:
                     metric.datasource_id = self.datasource_id
                     db.session.add(metric)
+                dbmetrics[metric.metric_name] = metric
 
     @classmethod
     def import_obj(cls, i_column: "DruidColumn") -> "DruidColumn":
@@ -484,6 +575,9 @@ class DruidDatasource(Model, BaseDatasource):
     is_hidden = Column(Boolean, default=False)
     filter_select_enabled = Column(Boolean, default=True)  # override default
     fetch_values_from = Column(String(100))
+    # the hash of the time boundary, dimensions and metrics of the segments when
+    # the datasource was last refreshed
+    segments_fingerprint = Column(String(100))
     cluster_name = Column(
         String(250), ForeignKey("clusters.cluster_name"), nullable=False
     )
@@ -624,17 +718,65 @@ class DruidDatasource(Model, BaseDatasource):
             db.session, i_datasource, lookup_cluster, lookup_datasource, import_time
         )
 
-    def latest_metadata(self):
-        """Returns segment metadata from the latest segment"""
-        logging.info("Syncing datasource [{}]".format(self.datasource_name))
+    def get_time_boundary(self) -> Optional[Dict[str, str]]:
+        """Returns the minimum and maximum time of the segments, None when the
+        datasource is empty or its boundary can't be fetched"""
         client = self.cluster.get_pydruid_client()
         try:
             results = client.time_boundary(datasource=self.datasource_name)
         except IOError:
             results = None
-        if results:
-            max_time = results[0]["result"]["maxTime"]
-            max_time = dparse(max_time)
+        return results[0]["result"] if results else None
+
+    def fetch_metadata(
+        self, fingerprint: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Fetch the metadata of the latest segment unless the segments didn't change.
+
+        The fingerprint of the segments hashes their time boundary, along with
+        the dimensions and metrics of the recent segments known by the broker,
+        which spares a segment metadata query. Segments re-indexed without
+        changing these, e.g. to change the type of a column, aren't detected.
+
+        :param fingerprint: The fingerprint of the segments when the datasource was
+            last refreshed, None to fetch the metadata regardless
+        :returns: The fingerprint of the segments and the columns of the latest
+            segment, None when the segments are unchanged
+        """
+        time_boundary = self.get_time_boundary()
+        new_fingerprint = None
+        if time_boundary:
+            schema = self.cluster.get_datasource_schema(self.datasource_name)
+            fingerprint_data = json.dumps(
+                {
+                    "min_time": time_boundary.get("minTime"),
+                    "max_time": time_boundary.get("maxTime"),
+                    "dimensions": sorted((schema or {}).get("dimensions") or []),
+                    "metrics": sorted((schema or {}).get("metrics") or []),
+                },
+                sort_keys=True,
+            )
+            new_fingerprint = hashlib.md5(fingerprint_data.encode("utf-8")).hexdigest()
+        if fingerprint and fingerprint == new_fingerprint:
+            logging.info(
+                "Segments of datasource [{}] unchanged".format(self.datasource_name)
+            )
+            return new_fingerprint, None
+        return new_fingerprint, self.latest_metadata(time_boundary)
+
+    def latest_metadata(self, time_boundary: Optional[Dict[str, str]] = None):
+        """Returns segment metadata from the latest segment
+
+        :param time_boundary: The time boundary of the datasource, fetched when None
+        """
+        logging.info("Syncing datasource [{}]".format(self.datasource_name))
+        client = self.cluster.get_pydruid_client()
+        if time_boundary is None:
+            time_boundary = self.get_time_boundary()
+        legacy = LooseVersion(self.cluster.druid_version) < LooseVersion("0.8.2")
+        if time_boundary:
+            max_time = dparse(time_boundary["maxTime"])
         else:
             max_time = datetime.now()
         # Query segmentMetadata for 7 days back. However, due to a bug,
@@ -642,10 +784,12 @@ class DruidDatasource(Model, BaseDatasource):
         # realtime segments, which triggered a bug (fixed in druid 0.8.2).
         # https://groups.google.com/forum/#!topic/druid-user/gVCqqspHqOQ
         lbound = (max_time - timedelta(days=7)).isoformat()
-        if LooseVersion(self.cluster.druid_version) < LooseVersion("0.8.2"):
+        if legacy:
             rbound = (max_time - timedelta(1)).isoformat()
         else:
-            rbound = max_time.isoformat()
+            # the end of intervals is exclusive, this includes the segment of the
+            # latest event
+            rbound = (max_time + timedelta(milliseconds=1)).isoformat()
         segment_metadata = None
         try:
             segment_metadata = client.segment_metadata(
@@ -657,10 +801,12 @@ class DruidDatasource(Model, BaseDatasource):
         except Exception as e:
             logging.warning("Failed first attempt to get latest segment")
             logging.exception(e)
-        if not segment_metadata:
+        # the latest segment is within the interval above when the time boundary
+        # is known, scanning all the segments wouldn't find more of them
+        if not segment_metadata and (legacy or not time_boundary):
             # if no segments in the past 7 days, look at all segments
             lbound = datetime(1901, 1, 1).isoformat()[:10]
-            if LooseVersion(self.cluster.druid_version) < LooseVersion("0.8.2"):
+            if legacy:
                 rbound = datetime.now().isoformat()
             else:
                 rbound = datetime(2050, 1, 1).isoformat()[:10]
@@ -986,42 +1132,83 @@ class DruidDatasource(Model, BaseDatasource):
         return df[column_name].to_list()
 
     def get_query_str(self, query_obj, phase=1, client=None):
+        if not client:
+            sql = self.get_sql_query_str(query_obj)
+            if sql is not None:
+                return sql
         return self.run_query(client=client, phase=phase, **query_obj)
 
+    def get_sql_query_str(self, query_obj: Dict) -> Optional[str]:
+        """Get the Druid SQL query of a query object, None when the cluster
+        doesn't use Druid SQL or the query can't be expressed in Druid SQL"""
+        if not self.cluster or not self.cluster.use_sql:
+            return None
+        try:
+            return druid_sql.build_query(self, **query_obj)
+        except druid_sql.UnsupportedQueryException as e:
+            logging.info(f"Running a native query: {e}")
+            return None
+
     def _add_filter_from_pre_query_data(
         self, df: Optional[pd.DataFrame], dimensions, dim_filter
     ):
+        """
+        Add the filter of the groups of the results of a pre-query to a filter.
+
+        Rather than a term per group, the groups are filtered with an `in` filter
+        on the last dimension per combination of the other ones.
+        """
         ret = dim_filter
         if df is not None and not df.empty:
+            # the columns of the dimensions in the results, with the filters
+            # matching one or many of their values
+            dimension_filters = []
+            for dim in dimensions:
+                # Check if this dimension uses an extraction function
+                # If so, create the appropriate pydruid extraction object
+                if isinstance(dim, dict) and "extractionFn" in dim:
+                    (col, extraction_fn) = DruidDatasource._create_extraction_fn(dim)
+                    dim_val = dim["outputName"]
+                elif isinstance(dim, dict):
+                    col = dim_val = dim["outputName"]
+                    extraction_fn = None
+                    if not dim_val:
+                        continue
+                else:
+                    col = dim_val = dim
+                    extraction_fn = None
+                dimension_filters.append((dim_val, col, extraction_fn))
+
+            def get_filter(col, extraction_fn, values):
+                if len(values) > 1:
+                    return Filter(
+                        dimension=col,
+                        values=values,
+                        type="in",
+                        extraction_function=extraction_fn,
+                    )
+                if extraction_fn is not None:
+                    return Filter(
+                        dimension=col,
+                        value=values[0],
+                        extraction_function=extraction_fn,
+                    )
+                return Dimension(col) == values[0]
+
             new_filters = []
-            for unused, row in df.iterrows():
+            columns = [dim_val for dim_val, unused, unused in dimension_filters]
+            rows = zip(*utils.get_column_values(df, columns))
+            for prefix, values in utils.group_by_prefix(rows).items():
                 fields = []
-                for dim in dimensions:
-                    f = None
-                    # Check if this dimension uses an extraction function
-                    # If so, create the appropriate pydruid extraction object
-                    if isinstance(dim, dict) and "extractionFn" in dim:
-                        (col, extraction_fn) = DruidDatasource._create_extraction_fn(
-                            dim
-                        )
-                        dim_val = dim["outputName"]
-                        f = Filter(
-                            dimension=col,
-                            value=row[dim_val],
-                            extraction_function=extraction_fn,
-                        )
-                    elif isinstance(dim, dict):
-                        dim_val = dim["outputName"]
-                        if dim_val:
-                            f = Dimension(dim_val) == row[dim_val]
-                    else:
-                        f = Dimension(dim) == row[dim]
-                    if f:
-                        fields.append(f)
+                for (unused, col, extraction_fn), value in zip(
+                    dimension_filters, prefix
+                ):
+                    fields.append(get_filter(col, extraction_fn, [value]))
+                unused, col, extraction_fn = dimension_filters[-1]
+                fields.append(get_filter(col, extraction_fn, values))
                 if len(fields) > 1:
-                    term = Filter(type="and", fields=fields)
-                    new_filters.append(term)
-                elif fields:
+                    new_filters.append(Filter(type="and", fields=fields))
+                else:
                     new_filters.append(fields[0])
             if new_filters:
                 ff = Filter(type="or", fields=new_filters)
@@ -1373,9 +1560,15 @@ class DruidDatasource(Model, BaseDatasource):
 
     def query(self, query_obj: Dict) -> QueryResult:
         qry_start_dttm = datetime.now()
-        client = self.cluster.get_pydruid_client()
-        query_str = self.get_query_str(client=client, query_obj=query_obj, phase=2)
-        df = client.export_pandas()
+        query_str = self.get_sql_query_str(query_obj)
+        if query_str is not None:
+            df = druid_sql.fetch_dataframe(
+                self.cluster, query_str, conf.get("DRUID_SQL_BATCH_ROWS")
+            )
+        else:
+            client = self.cluster.get_pydruid_client()
+            query_str = self.get_query_str(client=client, query_obj=query_obj, phase=2)
+            df = client.export_pandas()
 
         if df is None or df.size == 0:
             return QueryResult(
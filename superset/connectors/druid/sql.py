@@ -0,0 +1,378 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Druid SQL execution path of Druid datasources
+
+Rather than the native JSON queries of ``DruidDatasource.run_query``, possibly
+run in two phases to limit the number of series, the datasources of clusters
+using Druid SQL issue a single query, limiting the series with a subquery, and
+parse its results as they are received.
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from superset import conf
+from superset.exceptions import SupersetException
+from superset.utils import core as utils
+
+try:
+    import requests
+except ImportError:
+    pass
+
+DRUID_TZ = conf.get("DRUID_TZ")
+
+# the SQL functions of the Druid aggregators of a single field
+AGGREGATE_FUNCTIONS = {
+    "longSum": "SUM",
+    "doubleSum": "SUM",
+    "floatSum": "SUM",
+    "longMin": "MIN",
+    "doubleMin": "MIN",
+    "floatMin": "MIN",
+    "longMax": "MAX",
+    "doubleMax": "MAX",
+    "floatMax": "MAX",
+    "cardinality": "APPROX_COUNT_DISTINCT",
+    "hyperUnique": "APPROX_COUNT_DISTINCT",
+}
+
+
+class UnsupportedQueryException(SupersetException):
+    """The query can't be expressed in Druid SQL, e.g. it uses post aggregations
+    or extraction functions, and has to be run as a native query"""
+
+
+def quote_identifier(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def timestamp(dttm) -> str:
+    return "TIME_PARSE({})".format(literal(dttm.replace(tzinfo=DRUID_TZ).isoformat()))
+
+
+def aggregation_to_sql(aggregation: Dict) -> str:
+    """Translates the JSON of a Druid aggregator to a SQL aggregate"""
+    agg_type = aggregation.get("type")
+    if agg_type == "count":
+        return "COUNT(*)"
+    field_names = aggregation.get("fieldNames") or [aggregation.get("fieldName")]
+    if agg_type in AGGREGATE_FUNCTIONS and len(field_names) == 1 and field_names[0]:
+        return "{}({})".format(
+            AGGREGATE_FUNCTIONS[agg_type], quote_identifier(field_names[0])
+        )
+    raise UnsupportedQueryException(f"Unsupported aggregator: {agg_type}")
+
+
+def metric_to_sql(datasource, metric: Any) -> Tuple[str, str]:
+    """
+    Translates a saved or adhoc metric to a SQL aggregate.
+
+    :param datasource: The datasource
+    :param metric: The name of a saved metric, or an adhoc metric
+    :returns: The label of the metric and its SQL expression
+    """
+    if utils.is_adhoc_metric(metric):
+        label = utils.get_metric_name(metric)
+        if metric.get("expressionType") == utils.ADHOC_METRIC_EXPRESSION_TYPES["SQL"]:
+            return label, "({})".format(metric["sqlExpression"])
+        aggregation = {
+            "type": datasource.druid_type_from_adhoc_metric(metric),
+            "fieldName": metric["column"]["column_name"],
+        }
+        return label, aggregation_to_sql(aggregation)
+
+    metrics_dict = {m.metric_name: m for m in datasource.metrics}
+    metric_obj = metrics_dict.get(metric)
+    if not metric_obj:
+        raise SupersetException(f"Metric {metric} doesn't exist")
+    if metric_obj.metric_type == "postagg":
+        raise UnsupportedQueryException(f"{metric} is a post aggregation")
+    return metric, aggregation_to_sql(metric_obj.json_obj)
+
+
+def time_floor(granularity: Union[str, Dict]) -> Optional[str]:
+    """Translates a Druid granularity to a TIME_FLOOR of the time column, None
+    when the time isn't grouped by"""
+    if granularity == "all":
+        return None
+    if not isinstance(granularity, dict) or granularity.get("type") != "period":
+        raise UnsupportedQueryException(f"Unsupported granularity: {granularity}")
+    args = ['"__time"', literal(granularity["period"])]
+    origin = granularity.get("origin")
+    timezone = granularity.get("timeZone")
+    if origin or timezone:
+        args.append("TIME_PARSE({})".format(literal(origin)) if origin else "NULL")
+    if timezone:
+        args.append(literal(timezone))
+    return "TIME_FLOOR({})".format(", ".join(args))
+
+
+def filter_to_sql(datasource, flt: Dict, columns_dict: Dict) -> Optional[str]:
+    """Translates a filter, mirroring ``DruidDatasource.get_filters``"""
+    col = flt.get("col")
+    op = flt.get("op")
+    eq = flt.get("val")
+    if not col or not op or (eq is None and op not in ("IS NULL", "IS NOT NULL")):
+        return None
+    column = columns_dict.get(col)
+    if column and column.dimension_spec:
+        raise UnsupportedQueryException(f"{col} has a dimension spec")
+
+    is_numeric_col = col in datasource.num_cols
+    eq = datasource.filter_values_handler(
+        eq,
+        is_list_target=op in ("in", "not in"),
+        target_column_is_numeric=is_numeric_col,
+    )
+    col = quote_identifier(col)
+    if op in ("in", "not in"):
+        if not len(eq):
+            return None
+        values = ", ".join(literal(value) for value in eq)
+        return "{} {} ({})".format(col, op.upper(), values)
+    if op == "==":
+        return f"{col} = {literal(eq)}" if eq is not None else f"{col} IS NULL"
+    if op == "!=":
+        return f"{col} <> {literal(eq)}" if eq is not None else f"{col} IS NOT NULL"
+    if op in (">=", "<=", ">", "<"):
+        return f"{col} {op} {literal(eq)}"
+    if op == "regex":
+        return f"REGEXP_LIKE({col}, {literal(eq)})"
+    if op in ("IS NULL", "IS NOT NULL"):
+        return f"{col} {op}"
+    return None
+
+
+def having_to_sql(flt: Dict, metric_exprs: Dict[str, str]) -> Optional[str]:
+    """Translates a filter of the aggregated results, mirroring
+    ``DruidDatasource.get_having_filters``"""
+    if not all(f in flt for f in ["col", "op", "val"]):
+        return None
+    col = flt["col"]
+    op = flt["op"]
+    if op not in ("==", "!=", ">", "<", ">=", "<="):
+        return None
+    expr = metric_exprs.get(col) or quote_identifier(col)
+    op = {"==": "=", "!=": "<>"}.get(op, op)
+    return f"{expr} {op} {literal(flt['val'])}"
+
+
+def build_query(  # pylint: disable=too-many-arguments,too-many-locals
+    datasource,
+    groupby,
+    metrics,
+    granularity,
+    from_dttm,
+    to_dttm,
+    filter=None,  # pylint: disable=redefined-builtin
+    is_timeseries=True,
+    timeseries_limit=None,
+    timeseries_limit_metric=None,
+    row_limit=None,
+    inner_from_dttm=None,
+    inner_to_dttm=None,
+    extras=None,
+    columns=None,
+    order_desc=True,
+    **kwargs,
+) -> str:
+    """
+    Builds the Druid SQL query of a query object.
+
+    The number of series of timeseries is limited with a subquery, rather than
+    with a first query whose results filter a second one.
+
+    :raises UnsupportedQueryException: When the query can't be expressed in
+        Druid SQL
+    """
+    row_limit = row_limit or conf.get("ROW_LIMIT")
+    extras = extras or {}
+    if not is_timeseries:
+        granularity = "all"
+    timezone = from_dttm.replace(tzinfo=DRUID_TZ).tzname() if from_dttm else None
+    columns_dict = {c.column_name: c for c in datasource.columns}
+    groupby = [gb for gb in groupby or [] if gb in columns_dict]
+    for column_name in groupby:
+        if columns_dict[column_name].dimension_spec:
+            raise UnsupportedQueryException(f"{column_name} has a dimension spec")
+
+    def get_where(from_dttm, to_dttm) -> List[str]:
+        where = []
+        if from_dttm:
+            where.append('"__time" >= {}'.format(timestamp(from_dttm)))
+        if to_dttm:
+            where.append('"__time" < {}'.format(timestamp(to_dttm)))
+        for flt in filter or []:
+            cond = filter_to_sql(datasource, flt, columns_dict)
+            if cond:
+                where.append(cond)
+        return where
+
+    def to_sql(select, from_clause, where, group=None, having=None, order=None):
+        sql = "SELECT {}\nFROM {}".format(",\n       ".join(select), from_clause)
+        if where:
+            sql += "\nWHERE {}".format("\n  AND ".join(where))
+        if group:
+            sql += "\nGROUP BY {}".format(", ".join(group))
+        if having:
+            sql += "\nHAVING {}".format("\n   AND ".join(having))
+        if order:
+            sql += "\nORDER BY {}".format(", ".join(order))
+        return sql
+
+    table_name = quote_identifier(datasource.datasource_name)
+    where = get_where(from_dttm, to_dttm)
+    direction = "DESC" if order_desc else "ASC"
+    if columns:
+        select = [quote_identifier(col) for col in ["__time"] + columns]
+        return to_sql(select, table_name, where) + f"\nLIMIT {row_limit}"
+
+    metric_exprs: Dict[str, str] = {}
+    for metric in metrics:
+        label, expr = metric_to_sql(datasource, metric)
+        metric_exprs[label] = expr
+    dimensions = [quote_identifier(col) for col in groupby]
+    time_expr = time_floor(
+        datasource.granularity(
+            granularity, timezone=timezone, origin=extras.get("druid_time_origin")
+        )
+    )
+    select = []
+    group = []
+    if time_expr:
+        select.append("{} AS {}".format(time_expr, quote_identifier(utils.DTTM_ALIAS)))
+        group.append(time_expr)
+    select += dimensions
+    group += dimensions
+    select += [
+        "{} AS {}".format(expr, quote_identifier(label))
+        for label, expr in metric_exprs.items()
+    ]
+    having = [
+        cond
+        for cond in (
+            having_to_sql(flt, metric_exprs) for flt in extras.get("having_druid") or []
+        )
+        if cond
+    ]
+
+    from_clause = table_name
+    if groupby and is_timeseries and timeseries_limit:
+        # limit the number of series to the top ones over the inner time range
+        if timeseries_limit_metric:
+            order_by = metric_to_sql(datasource, timeseries_limit_metric)[1]
+        elif metric_exprs:
+            order_by = list(metric_exprs.values())[0]
+        else:
+            order_by = dimensions[0]
+        series = [
+            f"{dim} AS {quote_identifier(f'__series_{i}')}"
+            for i, dim in enumerate(dimensions)
+        ]
+        inner_sql = to_sql(
+            series if len(dimensions) > 1 else dimensions,
+            table_name,
+            get_where(inner_from_dttm or from_dttm, inner_to_dttm or to_dttm),
+            group=dimensions,
+            order=[f"{order_by} {direction}"],
+        )
+        inner_sql += f"\nLIMIT {min(timeseries_limit, row_limit)}"
+        inner_sql = inner_sql.replace("\n", "\n    ")
+        if len(dimensions) == 1:
+            where.append(f"{dimensions[0]} IN ({inner_sql})")
+        else:
+            on = [
+                f"{dim} = {quote_identifier(f'__series_{i}')}"
+                for i, dim in enumerate(dimensions)
+            ]
+            from_clause += '\nJOIN ({}) AS "__series" ON {}'.format(
+                inner_sql, " AND ".join(on)
+            )
+
+    if groupby:
+        order_by = list(metric_exprs.values())[0] if metric_exprs else dimensions[0]
+        sql = to_sql(
+            select, from_clause, where, group, having, [f"{order_by} {direction}"]
+        )
+        return sql + f"\nLIMIT {row_limit}"
+    return to_sql(select, from_clause, where, group, having, group)
+
+
+def read_array_lines(lines: Iterable[bytes], batch_rows: int = 10000) -> pd.DataFrame:
+    """
+    Parses results in the ``arrayLines`` format with a header, i.e. a JSON array
+    of the column names then one per row, a batch of rows at a time.
+
+    :param lines: The lines of the results, as they are received
+    :param batch_rows: The number of rows of the DataFrames concatenated into
+        the results
+    """
+    header: Optional[List[str]] = None
+    frames = []
+    batch: List[bytes] = []
+    for line in lines:
+        if not line:
+            continue
+        if header is None:
+            header = json.loads(line)
+            continue
+        batch.append(line)
+        if len(batch) >= batch_rows:
+            # a JSON array of the rows is parsed much faster than each row
+            rows = json.loads(b"[" + b",".join(batch) + b"]")
+            frames.append(pd.DataFrame(rows, columns=header))
+            batch = []
+    if batch or not frames:
+        rows = json.loads(b"[" + b",".join(batch) + b"]")
+        frames.append(pd.DataFrame(rows, columns=header))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_dataframe(cluster, sql: str, batch_rows: int = 10000) -> pd.DataFrame:
+    """Runs a Druid SQL query against the broker of a cluster, parsing its
+    results while they're streamed"""
+    auth = None
+    if cluster.broker_user and cluster.broker_pass:
+        auth = requests.auth.HTTPBasicAuth(cluster.broker_user, cluster.broker_pass)
+    payload = {"query": sql, "resultFormat": "arrayLines", "header": True}
+    response = requests.post(
+        cluster.get_base_broker_url() + "/sql", json=payload, auth=auth, stream=True
+    )
+    try:
+        if not response.ok:
+            try:
+                message = response.json().get("errorMessage")
+            except ValueError:
+                message = None
+            raise SupersetException(message or response.text)
+        return read_array_lines(response.iter_lines(), batch_rows)
+    finally:
+        response.close()
@@ -19,7 +19,7 @@ import json
 import logging
 from datetime import datetime
 
-from flask import flash, Markup, redirect
+from flask import flash, Markup, redirect, request
 from flask_appbuilder import CompactCRUDMixin, expose
 from flask_appbuilder.fieldwidgets import Select2Widget
 from flask_appbuilder.models.sqla.interface import SQLAInterface
@@ -200,6 +200,7 @@ class DruidClusterModelView(SupersetModelView, DeleteMixin, YamlExportMixin):
         "broker_endpoint",
         "cache_timeout",
         "cluster_name",
+        "use_sql",
     ]
     edit_columns = add_columns
     list_columns = ["cluster_name", "metadata_last_refreshed"]
@@ -214,6 +215,7 @@ class DruidClusterModelView(SupersetModelView, DeleteMixin, YamlExportMixin):
         "verbose_name": _("Verbose Name"),
         "cache_timeout": _("Cache Timeout"),
         "metadata_last_refreshed": _("Metadata Last Refreshed"),
+        "use_sql": _("Use Druid SQL"),
     }
     description_columns = {
         "cache_timeout": _(
@@ -231,6 +233,11 @@ class DruidClusterModelView(SupersetModelView, DeleteMixin, YamlExportMixin):
             "[auth](http://druid.io/docs/latest/design/auth.html) and "
             "druid-basic-security extension"
         ),
+        "use_sql": _(
+            "Query the datasources of this cluster with Druid SQL, streaming the "
+            "results, rather than with native queries. Queries using post "
+            "aggregations or dimension specs still run as native queries."
+        ),
     }
 
     yaml_dict_key = "databases"
@@ -369,14 +376,19 @@ class Druid(BaseSupersetView):
     @has_access
     @expose("/refresh_datasources/")
     def refresh_datasources(self, refresh_all=True):
-        """endpoint that refreshes druid datasources metadata"""
+        """endpoint that refreshes druid datasources metadata
+
+        Datasources whose segments didn't change since their last refresh are
+        skipped, unless the ``force`` URL parameter is ``true``
+        """
+        force = request.args.get("force") == "true"
         session = db.session()
         DruidCluster = ConnectorRegistry.sources["druid"].cluster_class
         for cluster in session.query(DruidCluster).all():
             cluster_name = cluster.cluster_name
             valid_cluster = True
             try:
-                cluster.refresh_datasources(refresh_all=refresh_all)
+                cluster.refresh_datasources(refresh_all=refresh_all, force=force)
             except Exception as e:
                 valid_cluster = False
                 flash(
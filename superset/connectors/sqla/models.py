@@ -15,6 +15,7 @@
 # specific language governing permissions and limitations
 # under the License.
 # pylint: disable=C,R,W
+import hashlib
 import logging
 import re
 from collections import OrderedDict
@@ -22,9 +23,10 @@ from datetime import datetime
 from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import pandas as pd
+import simplejson as json
 import sqlalchemy as sa
 import sqlparse
-from flask import escape, Markup
+from flask import escape, g, Markup
 from flask_appbuilder import Model
 from flask_babel import lazy_gettext as _
 from sqlalchemy import (
@@ -41,6 +43,7 @@ from sqlalchemy import (
     String,
     Table,
     Text,
+    tuple_,
 )
 from sqlalchemy.exc import CompileError
 from sqlalchemy.orm import backref, Query, relationship, RelationshipProperty, Session
@@ -54,15 +57,19 @@ from superset.connectors.base.models import BaseColumn, BaseDatasource, BaseMetr
 from superset.constants import NULL_STRING
 from superset.db_engine_specs.base import TimestampExpression
 from superset.exceptions import DatabaseNotFoundException
+from superset.extensions import cache_manager, query_cost_guard
 from superset.jinja_context import get_template_processor
 from superset.models.annotations import Annotation
 from superset.models.core import Database
 from superset.models.helpers import QueryResult
 from superset.utils import core as utils, import_datasource
+from superset.utils.query_cost import QueryCostExceededException
 
 config = app.config
 metadata = Model.metadata  # pylint: disable=no-member
 
+EXTRA_CACHE_KEYS_REGEX = re.compile(r"\{\{.*cache_key_wrapper\(.*\).*\}\}")
+
 
 class SqlaQuery(NamedTuple):
     extra_cache_keys: List[Any]
@@ -598,14 +605,81 @@ class SqlaTable(Model, BaseDatasource):
     def get_template_processor(self, **kwargs):
         return get_template_processor(table=self, database=self.database, **kwargs)
 
+    def uses_jinja(self, query_obj: Dict) -> bool:
+        """Whether the query of a query object is processed by Jinja"""
+        extras = query_obj.get("extras") or {}
+        statements = [self.sql, extras.get("where"), extras.get("having")]
+        return any(
+            "{{" in statement or "{%" in statement
+            for statement in statements
+            if statement
+        )
+
+    def get_change_fingerprint(self) -> Dict[str, Any]:
+        """
+        Get the fingerprint of the definition of the table, for cache keys.
+
+        It covers the last change of the table, its columns and metrics and its
+        database, along with the number of columns and metrics, which changes
+        when some are deleted.
+        """
+        changes = [self.changed_on, self.database.changed_on]
+        changes += [col.changed_on for col in self.columns]
+        changes += [metric.changed_on for metric in self.metrics]
+        return {
+            "changed_on": max((dttm for dttm in changes if dttm), default=None),
+            "columns": len(self.columns),
+            "metrics": len(self.metrics),
+        }
+
+    def get_compiled_query_cache_key(self, query_obj: Dict) -> Optional[str]:
+        """
+        Get the key of the SQL compiled for a query object in the compiled query
+        cache, None when it can't be cached.
+
+        The key covers the query object and the change fingerprint of the table.
+        Queries processed by Jinja depend on the request, e.g. through
+        `url_param`, and aren't cached, nor are the queries of tables which
+        aren't saved.
+        """
+        if self.id is None or self.uses_jinja(query_obj):
+            return None
+        cache_dict = {
+            "query_obj": query_obj,
+            "datasource": self.uid,
+            **self.get_change_fingerprint(),
+        }
+        try:
+            json_data = json.dumps(
+                cache_dict, default=utils.json_iso_dttm_ser, sort_keys=True
+            )
+        except TypeError:
+            return None
+        return "compiled_query/" + hashlib.md5(json_data.encode("utf-8")).hexdigest()
+
     def get_query_str_extended(self, query_obj: Dict) -> QueryStringExtended:
-        sqlaq = self.get_sqla_query(**query_obj)
-        sql = self.database.compile_sqla_query(sqlaq.sqla_query)
-        logging.info(sql)
-        sql = sqlparse.format(sql, reindent=True)
-        sql = self.mutate_query_from_config(sql)
+        compiled_query_cache = cache_manager.compiled_query_cache
+        key = None
+        if compiled_query_cache.enabled:
+            key = self.get_compiled_query_cache_key(query_obj)
+        query_str_ext = compiled_query_cache.get(key) if key else None
+        if query_str_ext is None:
+            sqlaq = self.get_sqla_query(**query_obj)
+            sql = self.database.compile_sqla_query(sqlaq.sqla_query)
+            logging.info(sql)
+            sql = sqlparse.format(sql, reindent=True)
+            query_str_ext = QueryStringExtended(
+                labels_expected=sqlaq.labels_expected,
+                sql=sql,
+                prequeries=sqlaq.prequeries,
+            )
+            if key:
+                compiled_query_cache.set(key, query_str_ext)
+        # the mutator depends on the user, copy the lists that callers may alter
         return QueryStringExtended(
-            labels_expected=sqlaq.labels_expected, sql=sql, prequeries=sqlaq.prequeries
+            labels_expected=list(query_str_ext.labels_expected),
+            sql=self.mutate_query_from_config(query_str_ext.sql),
+            prequeries=list(query_str_ext.prequeries),
         )
 
     def get_query_str(self, query_obj: Dict) -> str:
@@ -967,15 +1041,42 @@ class SqlaTable(Model, BaseDatasource):
     def _get_top_groups(
         self, df: pd.DataFrame, dimensions: List, groupby_exprs: OrderedDict
     ) -> ColumnElement:
+        """
+        Get the filter of the groups of the results of a prequery.
+
+        Rather than a term per group, the groups are filtered with a tuple `IN`
+        when the database supports it, or an `IN` on the last dimension per
+        combination of the other ones. Missing values are filtered with
+        `IS NULL`.
+        """
+        exprs = [groupby_exprs[dimension] for dimension in dimensions]
+        rows = list(zip(*utils.get_column_values(df, dimensions)))
         groups = []
-        for unused, row in df.iterrows():
-            group = []
-            for dimension in dimensions:
-                group.append(groupby_exprs[dimension] == row[dimension])
+        if len(exprs) > 1 and self.database.db_engine_spec.allows_tuple_in:
+            # NULL never equals anything, even in a tuple
+            complete_rows = [row for row in rows if None not in row]
+            if complete_rows:
+                groups.append(tuple_(*exprs).in_(complete_rows))
+            rows = [row for row in rows if None in row]
+        for prefix, values in utils.group_by_prefix(rows).items():
+            group = [expr == value for expr, value in zip(exprs, prefix)]
+            group.append(self._in_or_null(exprs[-1], values))
             groups.append(and_(*group))
 
         return or_(*groups)
 
+    @staticmethod
+    def _in_or_null(expr: ColumnElement, values: List) -> ColumnElement:
+        conditions = []
+        non_null_values = [value for value in values if value is not None]
+        if len(non_null_values) == 1:
+            conditions.append(expr == non_null_values[0])
+        elif non_null_values:
+            conditions.append(expr.in_(non_null_values))
+        if len(non_null_values) < len(values):
+            conditions.append(expr.is_(None))
+        return or_(*conditions) if len(conditions) > 1 else conditions[0]
+
     def query(self, query_obj: Dict) -> QueryResult:
         qry_start_dttm = datetime.now()
         query_str_ext = self.get_query_str_extended(query_obj)
@@ -996,7 +1097,16 @@ class SqlaTable(Model, BaseDatasource):
             return df
 
         try:
-            df = self.database.get_df(sql, self.schema, mutator)
+            with query_cost_guard.admit(
+                self.database, self.schema, sql, getattr(g, "user", None), "chart"
+            ):
+                df = self.database.get_df(
+                    sql, self.schema, mutator, row_limit=query_obj.get("row_limit")
+                )
+        except QueryCostExceededException as e:
+            df = None
+            status = utils.QueryStatus.FAILED
+            error_message = str(e)
         except Exception as e:
             df = None
             status = utils.QueryStatus.FAILED
@@ -1144,7 +1254,6 @@ class SqlaTable(Model, BaseDatasource):
         :param query_obj: query object to analyze
         :return: True if at least one item calls cache_key_wrapper, otherwise False
         """
-        regex = re.compile(r"\{\{.*cache_key_wrapper\(.*\).*\}\}")
         templatable_statements: List[str] = []
         if self.sql:
             templatable_statements.append(self.sql)
@@ -1156,16 +1265,36 @@ class SqlaTable(Model, BaseDatasource):
         if "having" in extras:
             templatable_statements.append(extras["having"])
         for statement in templatable_statements:
-            if regex.search(statement):
+            if EXTRA_CACHE_KEYS_REGEX.search(statement):
                 return True
         return False
 
     def get_extra_cache_keys(self, query_obj: Dict) -> List[Any]:
-        if self.has_extra_cache_keys(query_obj):
-            sqla_query = self.get_sqla_query(**query_obj)
-            extra_cache_keys = sqla_query.extra_cache_keys
-            return extra_cache_keys
-        return []
+        """
+        Get the values the templates of a query object pass to cache_key_wrapper.
+
+        They are extracted from the templates without generating the query when
+        they only depend on the request and the user, e.g. through `url_param`,
+        `filter_values` or `current_username`, see `get_cache_key_dependencies`.
+
+        :param query_obj: query object to analyze
+        :return: the values, in the order they are rendered
+        """
+        if not self.has_extra_cache_keys(query_obj):
+            return []
+        extras = query_obj.get("extras") or {}
+        templates = [self.sql, extras.get("where"), extras.get("having")]
+        template_processor = self.get_template_processor(**self.template_params_dict)
+        extra_cache_keys: List[Any] = []
+        for template in templates:
+            if not template:
+                continue
+            keys = template_processor.get_extra_cache_keys(template)
+            if keys is None:
+                sqla_query = self.get_sqla_query(**query_obj)
+                return sqla_query.extra_cache_keys
+            extra_cache_keys += keys
+        return extra_cache_keys
 
 
 sa.event.listen(SqlaTable, "after_insert", security_manager.set_perm)
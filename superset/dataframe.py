@@ -24,6 +24,8 @@ TODO(bkyryliuk): recognize integer encoded enums.
 """
 import logging
 from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -62,6 +64,121 @@ def dedup(l, suffix="__", case_sensitive=True):
     return new_l
 
 
+def df_from_cursor(
+    cursor,
+    column_names: List[str],
+    batch_size: int,
+    dtype: Optional[Dict[str, str]] = None,
+    row_limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """Builds a dataframe by fetching ``batch_size`` rows at a time
+
+    Every batch is converted into typed column arrays as soon as it is fetched,
+    so the full result set is never held as a list of tuples alongside the
+    dataframe. Fetching stops once ``row_limit`` rows have been read.
+
+    :param cursor: DB-API cursor on which a statement has been executed
+    :param column_names: names of the columns in the cursor description
+    :param batch_size: number of rows to pass to ``cursor.fetchmany``
+    :param dtype: pandas dtypes by column name, see ``get_pandas_dtype``
+    :param row_limit: maximum number of rows to fetch
+    :return: the dataframe
+    """
+    chunks: List[List[pd.Series]] = [[] for _ in column_names]
+    row_count = 0
+    while row_limit is None or row_count < row_limit:
+        size = batch_size
+        if row_limit is not None:
+            size = min(size, row_limit - row_count)
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        row_count += len(rows)
+        if dtype:
+            for i, values in enumerate(zip(*rows)):
+                column_dtype = dtype.get(column_names[i])
+                if column_dtype in (None, "object") and any(
+                    isinstance(value, Decimal) for value in values
+                ):
+                    # decimals are converted to floats, like with ``coerce_float``
+                    # below
+                    series = pd.DataFrame.from_records(
+                        list(zip(values)), coerce_float=True
+                    ).iloc[:, 0]
+                else:
+                    series = pd.Series(list(values), dtype=column_dtype)
+                chunks[i].append(series)
+        else:
+            batch = pd.DataFrame.from_records(
+                rows, columns=column_names, coerce_float=True
+            )
+            for i in range(len(column_names)):
+                chunks[i].append(batch.iloc[:, i])
+        if len(rows) < size:
+            break
+
+    if not row_count:
+        return pd.DataFrame(columns=column_names)
+
+    columns = []
+    for i in range(len(column_names)):
+        series = chunks[i]
+        chunks[i] = []
+        column = pd.concat(series, ignore_index=True)
+        if column.dtype == np.object_ and any(s.dtype != np.object_ for s in series):
+            # batches were inferred differently (e.g. a batch of nulls only)
+            column = column.infer_objects()
+        columns.append(column)
+    df = pd.concat(columns, axis=1, ignore_index=True)
+    df.columns = column_names
+    return df
+
+
+def format_column(series: pd.Series) -> list:
+    """Converts a column into a list of JSON serializable values, see
+    `SupersetDataFrame.format_data`"""
+    if not isinstance(series.dtype, np.dtype):
+        # extension dtypes, e.g. nullable integers or datetimes with a timezone
+        return [_format_value(v) for v in np.asarray(series, dtype=object)]
+    kind = series.dtype.kind
+    if kind in "iu":
+        values = series.tolist()
+        array = series.values
+        too_big = array > JS_MAX_INTEGER
+        if kind == "i":
+            too_big |= array < -JS_MAX_INTEGER
+        # if an int is too big for Java Script to handle convert it to a string
+        for i in np.flatnonzero(too_big):
+            values[i] = str(values[i])
+        return values
+    if kind == "M":
+        array = series.values.astype("datetime64[ns]", copy=False)
+        nat = np.isnat(array)
+        if (array[~nat].view("i8") % 1000).any():
+            # nanoseconds can only be represented by timestamps
+            return series.tolist()
+        # boxing into datetimes is much cheaper than into timestamps
+        values = array.astype("datetime64[us]").tolist()
+        for i in np.flatnonzero(nat):
+            values[i] = pd.NaT
+        return values
+    if kind in "bfcm":
+        # numpy scalars are converted to python ones and timedeltas boxed
+        return series.tolist()
+    # work around for https://github.com/pandas-dev/pandas/issues/18372
+    return [
+        v if isinstance(v, str) else _format_value(v)
+        for v in np.asarray(series, dtype=object)
+    ]
+
+
+def _format_value(v):
+    v = maybe_box_datetimelike(v)
+    if isinstance(v, int) and abs(v) > JS_MAX_INTEGER:
+        return str(v)
+    return v
+
+
 def is_numeric(dtype):
     if hasattr(dtype, "_is_numeric"):
         return dtype._is_numeric
@@ -145,23 +262,24 @@ class SupersetDataFrame(object):
         return self.format_data(self.df)
 
     @classmethod
-    def format_data(cls, df):
-        # work around for https://github.com/pandas-dev/pandas/issues/18372
-        data = [
-            dict(
-                (k, maybe_box_datetimelike(v))
-                for k, v in zip(df.columns, np.atleast_1d(row))
-            )
-            for row in df.values
-        ]
-        for d in data:
-            for k, v in list(d.items()):
-                # if an int is too big for Java Script to handle
-                # convert it to a string
-                if isinstance(v, int):
-                    if abs(v) > JS_MAX_INTEGER:
-                        d[k] = str(v)
-        return data
+    def format_data(cls, df, columnar=False):
+        """Converts a dataframe into JSON serializable records
+
+        The conversion is done one column at a time: datetimes are boxed into
+        ``datetime`` objects, or into timestamps when they have nanoseconds, and
+        integers too big for JavaScript are converted to strings.
+
+        :param df: the dataframe
+        :param columnar: return a dict of column name to values rather than
+            a list of records
+        """
+        columns = [format_column(df.iloc[:, i]) for i in range(len(df.columns))]
+        if columnar:
+            return dict(zip(df.columns, columns))
+        if not columns:
+            return [{} for _ in range(len(df.index))]
+        names = list(df.columns)
+        return [dict(zip(names, row)) for row in zip(*columns)]
 
     @classmethod
     def db_type(cls, dtype):
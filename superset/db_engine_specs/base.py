@@ -21,7 +21,17 @@ import re
 from contextlib import closing
 from datetime import datetime
 from distutils.util import strtobool
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 import pandas as pd
 import sqlparse
@@ -125,6 +135,8 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
     allows_joins = True
     allows_subqueries = True
     allows_column_aliases = True
+    # whether rows can be filtered with `(a, b) IN ((1, 2), (3, 4))`
+    allows_tuple_in = False
     force_column_alias_quotes = False
     arraysize = 0
     max_column_name_length = 0
@@ -230,8 +242,55 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         if cls.arraysize:
             cursor.arraysize = cls.arraysize
         if cls.limit_method == LimitMethod.FETCH_MANY:
-            return cursor.fetchmany(limit)
-        return cursor.fetchall()
+            return cls.convert_rows(cursor.fetchmany(limit))
+        return cls.convert_rows(cursor.fetchall())
+
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor, limit: Optional[int], batch_rows: int
+    ) -> Iterator[List[Tuple]]:
+        """
+        Fetches the results of a query in batches, so that they never need to be
+        in memory all at once.
+
+        :param cursor: Cursor instance, ideally a server-side cursor
+        :param limit: Maximum number of rows to be returned by the cursor
+        :param batch_rows: Maximum number of rows of a batch
+        :return: The batches of rows, at least one when the query returns rows
+        """
+        if cls.arraysize:
+            cursor.arraysize = cls.arraysize
+        fetched = 0
+        while not limit or fetched < limit:
+            size = batch_rows if not limit else min(batch_rows, limit - fetched)
+            data = cls.convert_rows(cursor.fetchmany(size))
+            if not data:
+                return
+            fetched += len(data)
+            yield data
+
+    @classmethod
+    def convert_rows(cls, data: List[Any]) -> List[Tuple]:
+        """
+        Converts the rows fetched from a cursor into tuples, for drivers returning
+        rows of their own type.
+
+        :param data: The rows fetched from the cursor
+        :return: The rows
+        """
+        return data
+
+    @classmethod
+    def get_cursor(cls, conn, server_side: bool = False):
+        """
+        Opens a cursor on a raw connection.
+
+        :param conn: The raw DB-API connection
+        :param server_side: Whether to open a cursor leaving the results on the
+            server, to fetch them in batches, where the driver supports it
+        :return: The cursor
+        """
+        return conn.cursor()
 
     @classmethod
     def expand_data(
@@ -680,7 +739,7 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
 
     @classmethod
     def estimate_statement_cost(
-        cls, statement: str, database, cursor, user_name: str
+        cls, statement: str, database, cursor, user_name: Optional[str]
     ) -> Dict[str, Any]:
         """
         Generate a SQL query that estimates the cost of a given statement.
@@ -705,9 +764,25 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         """
         raise Exception("Database does not support cost estimation")
 
+    @classmethod
+    def get_cost_metrics(cls, raw_cost: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Get the numeric cost metrics of a query, checked against the budgets of
+        the query cost guard.
+
+        :param raw_cost: Raw estimate from `estimate_query_cost`
+        :return: The cost metrics of the query as a whole
+        """
+        raise Exception("Database does not support cost estimation")
+
     @classmethod
     def estimate_query_cost(
-        cls, database, schema: str, sql: str, source: str = None
+        cls,
+        database,
+        schema: str,
+        sql: str,
+        source: str = None,
+        user_name: Optional[str] = None,
     ) -> List[Dict[str, str]]:
         """
         Estimate the cost of a multiple statement SQL query.
@@ -716,12 +791,14 @@ class BaseEngineSpec:  # pylint: disable=too-many-public-methods
         :param schema: Database schema
         :param sql: SQL query with possibly multiple statements
         :param source: Source of the query (eg, "sql_lab")
+        :param user_name: Effective username, the user of the request when None
         """
         database_version = database.get_extra().get("version")
         if not cls.get_allow_cost_estimate(database_version):
             raise Exception("Database does not support cost estimation")
 
-        user_name = g.user.username if g.user else None
+        if user_name is None:
+            user_name = g.user.username if g.user else None
         parsed_query = sql_parse.ParsedQuery(sql)
         statements = parsed_query.get_statements()
 
@@ -14,7 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
-from typing import List, Tuple
+from typing import Any, List, Tuple
 
 from superset.db_engine_specs.base import BaseEngineSpec
 
@@ -39,8 +39,7 @@ class ExasolEngineSpec(BaseEngineSpec):  # pylint: disable=abstract-method
     }
 
     @classmethod
-    def fetch_data(cls, cursor, limit: int) -> List[Tuple]:
-        data = super().fetch_data(cursor, limit)
+    def convert_rows(cls, data: List[Any]) -> List[Tuple]:
         # Lists of `pyodbc.Row` need to be unpacked further
         if data and type(data[0]).__name__ == "Row":
             data = [tuple(row) for row in data]
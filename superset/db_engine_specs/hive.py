@@ -19,7 +19,7 @@ import os
 import re
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from urllib import parse
 
 from sqlalchemy import Column
@@ -32,7 +32,9 @@ from werkzeug.utils import secure_filename
 from superset import app, conf
 from superset.db_engine_specs.base import BaseEngineSpec
 from superset.db_engine_specs.presto import PrestoEngineSpec
+from superset.extensions import query_progress_reporter
 from superset.utils import core as utils
+from superset.utils.query_progress import poll_intervals
 
 QueryStatus = utils.QueryStatus
 config = app.config
@@ -96,6 +98,23 @@ class HiveEngineSpec(PrestoEngineSpec):
         except pyhive.exc.ProgrammingError:
             return []
 
+    @classmethod
+    def fetch_data_in_batches(
+        cls, cursor, limit: Optional[int], batch_rows: int
+    ) -> Iterator[List[Tuple]]:
+        import pyhive
+        from TCLIService import ttypes
+
+        state = cursor.poll()
+        if state.operationState == ttypes.TOperationState.ERROR_STATE:
+            raise Exception("Query error", state.errorMessage)
+        try:
+            yield from super(HiveEngineSpec, cls).fetch_data_in_batches(
+                cursor, limit, batch_rows
+            )
+        except pyhive.exc.ProgrammingError:
+            return
+
     @classmethod
     def create_and_fill_table_from_csv(  # pylint: disable=too-many-locals
         cls, form_data: dict, csv_filename: str, database
@@ -250,51 +269,54 @@ class HiveEngineSpec(PrestoEngineSpec):
             hive.ttypes.TOperationState.INITIALIZED_STATE,
             hive.ttypes.TOperationState.RUNNING_STATE,
         )
+        intervals = poll_intervals(
+            config["SQLLAB_POLL_INTERVAL_MIN"], hive_poll_interval
+        )
         polled = cursor.poll()
         last_log_line = 0
         tracking_url = None
         job_id = None
         query_id = query.id
-        while polled.operationState in unfinished_states:
-            query = session.query(type(query)).filter_by(id=query_id).one()
-            if query.status == QueryStatus.STOPPED:
-                cursor.cancel()
-                break
-
-            log = cursor.fetch_logs() or ""
-            if log:
-                log_lines = log.splitlines()
-                progress = cls.progress(log_lines)
-                logging.info(f"Query {query_id}: Progress total: {progress}")
-                needs_commit = False
-                if progress > query.progress:
-                    query.progress = progress
-                    needs_commit = True
-                if not tracking_url:
-                    tracking_url = cls.get_tracking_url(log_lines)
-                    if tracking_url:
-                        job_id = tracking_url.split("/")[-2]
-                        logging.info(
-                            f"Query {query_id}: Found the tracking url: {tracking_url}"
-                        )
-                        tracking_url = tracking_url_trans(tracking_url)
-                        logging.info(
-                            f"Query {query_id}: Transformation applied: {tracking_url}"
-                        )
-                        query.tracking_url = tracking_url
-                        logging.info(f"Query {query_id}: Job id: {job_id}")
-                        needs_commit = True
-                if job_id and len(log_lines) > last_log_line:
-                    # Wait for job id before logging things out
-                    # this allows for prefixing all log lines and becoming
-                    # searchable in something like Kibana
-                    for l in log_lines[last_log_line:]:
-                        logging.info(f"Query {query_id}: [{job_id}] {l}")
-                    last_log_line = len(log_lines)
-                if needs_commit:
-                    session.commit()
-            time.sleep(hive_poll_interval)
-            polled = cursor.poll()
+        try:
+            while polled.operationState in unfinished_states:
+                if query_progress_reporter.is_stopped(query, session):
+                    cursor.cancel()
+                    break
+
+                log = cursor.fetch_logs() or ""
+                if log:
+                    log_lines = log.splitlines()
+                    progress = cls.progress(log_lines)
+                    logging.info(f"Query {query_id}: Progress total: {progress}")
+                    query_progress_reporter.report(query, progress=progress)
+                    if not tracking_url:
+                        tracking_url = cls.get_tracking_url(log_lines)
+                        if tracking_url:
+                            job_id = tracking_url.split("/")[-2]
+                            logging.info(
+                                f"Query {query_id}: Found the tracking url: {tracking_url}"
+                            )
+                            tracking_url = tracking_url_trans(tracking_url)
+                            logging.info(
+                                f"Query {query_id}: Transformation applied: {tracking_url}"
+                            )
+                            query.tracking_url = tracking_url
+                            query_progress_reporter.report(
+                                query, tracking_url=tracking_url
+                            )
+                            logging.info(f"Query {query_id}: Job id: {job_id}")
+                    if job_id and len(log_lines) > last_log_line:
+                        # Wait for job id before logging things out
+                        # this allows for prefixing all log lines and becoming
+                        # searchable in something like Kibana
+                        for l in log_lines[last_log_line:]:
+                            logging.info(f"Query {query_id}: [{job_id}] {l}")
+                        last_log_line = len(log_lines)
+                    query_progress_reporter.flush(session)
+                time.sleep(next(intervals))
+                polled = cursor.poll()
+        finally:
+            query_progress_reporter.done(query, session)
 
     @classmethod
     def get_columns(
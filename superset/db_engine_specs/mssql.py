@@ -16,7 +16,7 @@
 # under the License.
 import re
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Any, List, Optional, Tuple
 
 from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.types import String, TypeEngine, UnicodeText
@@ -61,8 +61,7 @@ class MssqlEngineSpec(BaseEngineSpec):
         return None
 
     @classmethod
-    def fetch_data(cls, cursor, limit: int) -> List[Tuple]:
-        data = super().fetch_data(cursor, limit)
+    def convert_rows(cls, data: List[Any]) -> List[Tuple]:
         if data and type(data[0]).__name__ == "Row":
             data = [tuple(row) for row in data]
         return data
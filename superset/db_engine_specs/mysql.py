@@ -27,6 +27,7 @@ from superset.db_engine_specs.base import BaseEngineSpec
 class MySQLEngineSpec(BaseEngineSpec):
     engine = "mysql"
     max_column_name_length = 64
+    allows_tuple_in = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -58,6 +59,24 @@ class MySQLEngineSpec(BaseEngineSpec):
             return f"""STR_TO_DATE('{dttm.isoformat(sep=" ", timespec="microseconds")}', '%Y-%m-%d %H:%i:%s.%f')"""  # pylint: disable=line-too-long
         return None
 
+    @classmethod
+    def get_cursor(cls, conn, server_side: bool = False):
+        if not server_side:
+            return conn.cursor()
+        # unbuffered cursors stream the rows from the server rather than loading
+        # them all in memory when the query is executed
+        dbapi_conn = getattr(conn, "connection", conn)
+        module = type(dbapi_conn).__module__
+        if module.startswith("MySQLdb"):
+            import MySQLdb.cursors  # pylint: disable=import-error
+
+            return conn.cursor(MySQLdb.cursors.SSCursor)
+        if module.startswith("pymysql"):
+            import pymysql.cursors  # pylint: disable=import-error
+
+            return conn.cursor(pymysql.cursors.SSCursor)
+        return conn.cursor()
+
     @classmethod
     def adjust_database_uri(cls, uri, selected_schema=None):
         if selected_schema:
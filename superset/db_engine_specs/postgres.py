@@ -14,6 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import uuid
 from datetime import datetime
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
@@ -59,8 +60,17 @@ class PostgresBaseEngineSpec(BaseEngineSpec):
 class PostgresEngineSpec(PostgresBaseEngineSpec):
     engine = "postgresql"
     max_column_name_length = 63
+    allows_tuple_in = True
     try_remove_schema_from_table_name = False
 
+    @classmethod
+    def get_cursor(cls, conn, server_side: bool = False):
+        if not server_side:
+            return conn.cursor()
+        # psycopg2 named cursors declare a cursor on the server and fetch its
+        # rows as they are requested, `itersize` rows at a time
+        return conn.cursor(name=f"superset_{uuid.uuid4().hex}")
+
     @classmethod
     def get_table_names(
         cls, database: "Database", inspector: PGInspector, schema: Optional[str]
@@ -22,7 +22,7 @@ from collections import defaultdict, deque
 from contextlib import closing
 from datetime import datetime
 from distutils.version import StrictVersion
-from typing import Any, cast, Dict, List, Optional, Tuple, TYPE_CHECKING
+from typing import Any, cast, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 from urllib import parse
 
 import simplejson as json
@@ -35,9 +35,12 @@ from sqlalchemy.sql.expression import ColumnClause, Select
 from superset import app, is_feature_enabled, security_manager
 from superset.db_engine_specs.base import BaseEngineSpec
 from superset.exceptions import SupersetTemplateException
+from superset.extensions import query_progress_reporter
 from superset.models.sql_types.presto_sql_types import type_map as presto_type_map
 from superset.sql_parse import ParsedQuery
 from superset.utils import core as utils
+from superset.utils.query_cost import sum_cost_metrics
+from superset.utils.query_progress import poll_intervals
 
 if TYPE_CHECKING:
     # prevent circular imports
@@ -62,6 +65,50 @@ pandas_dtype_map = {
 }
 
 
+def _unnest_array(
+    data: List[dict], name: str, unnested_rows: Dict[int, int]
+) -> List[dict]:
+    """
+    Unnest the values of an array column into consecutive rows.
+
+    The values of a row go to the row itself and to the rows following it that
+    were added when unnesting the previous arrays of the same level, as counted
+    by ``unnested_rows``, new rows being added when those aren't enough. The
+    rows are laid out in a new list in a single pass rather than inserted into
+    ``data``, which would make unnesting quadratic in the number of rows.
+
+    :param data: The rows
+    :param name: The name of the array column
+    :param unnested_rows: The number of rows added after each row, by position,
+        updated with the rows added for this array
+    :return: The rows, with the array unnested
+    """
+
+    unnested_data: List[dict] = []
+    i = 0
+    while i < len(data):
+        row = data[i]
+        values = row.get(name)
+        position = len(unnested_data)
+        if not values:
+            unnested_data.append(row)
+            i += 1
+            continue
+
+        # the rows already added for this row, followed by the missing ones
+        current_unnested_rows = unnested_rows[position]
+        unnested_data.extend(data[i : i + current_unnested_rows + 1])
+        missing = len(values) - 1 - current_unnested_rows
+        if missing > 0:
+            unnested_data.extend({} for _ in range(missing))
+            unnested_rows[position] += missing
+
+        for unnested_row, value in zip(unnested_data[position:], values):
+            unnested_row[name] = value
+        i += current_unnested_rows + 1
+    return unnested_data
+
+
 def get_children(column: Dict[str, str]) -> List[Dict[str, str]]:
     """
     Get the children of a complex Presto type (row or array).
@@ -109,6 +156,7 @@ def get_children(column: Dict[str, str]) -> List[Dict[str, str]]:
 
 class PrestoEngineSpec(BaseEngineSpec):
     engine = "presto"
+    allows_tuple_in = True
 
     _time_grain_functions = {
         None: "{col}",
@@ -444,7 +492,7 @@ class PrestoEngineSpec(BaseEngineSpec):
 
     @classmethod
     def estimate_statement_cost(  # pylint: disable=too-many-locals
-        cls, statement: str, database, cursor, user_name: str
+        cls, statement: str, database, cursor, user_name: Optional[str]
     ) -> Dict[str, Any]:
         """
         Run a SQL query that estimates the cost of a given statement.
@@ -481,6 +529,13 @@ class PrestoEngineSpec(BaseEngineSpec):
         result = json.loads(cursor.fetchone()[0])
         return result
 
+    @classmethod
+    def get_cost_metrics(cls, raw_cost: List[Dict[str, Any]]) -> Dict[str, float]:
+        # the statements run one after the other, only their memory isn't summed
+        return sum_cost_metrics(
+            [row.get("estimate", {}) for row in raw_cost], maximum=["maxMemory"]
+        )
+
     @classmethod
     def query_cost_formatter(
         cls, raw_cost: List[Dict[str, Any]]
@@ -602,12 +657,15 @@ class PrestoEngineSpec(BaseEngineSpec):
         # expanding ROW types into new columns
         to_process = deque((column, 0) for column in columns)
         all_columns: List[dict] = []
+        all_column_names: Set[str] = set()
         expanded_columns = []
         current_array_level = None
         while to_process:
             column, level = to_process.popleft()
-            if column["name"] not in [column["name"] for column in all_columns]:
+            name = column["name"]
+            if name not in all_column_names:
                 all_columns.append(column)
+                all_column_names.add(name)
 
             # When unnesting arrays we need to keep track of how many extra rows
             # were added, for each original row. This is necessary when we expand
@@ -618,39 +676,13 @@ class PrestoEngineSpec(BaseEngineSpec):
                 unnested_rows: Dict[int, int] = defaultdict(int)
                 current_array_level = level
 
-            name = column["name"]
-
             if column["type"].startswith("ARRAY("):
                 # keep processing array children; we append to the right so that
                 # multiple nested arrays are processed breadth-first
                 to_process.append((get_children(column)[0], level + 1))
 
                 # unnest array objects data into new rows
-                i = 0
-                while i < len(data):
-                    row = data[i]
-                    values = row.get(name)
-                    if values:
-                        # how many extra rows we need to unnest the data?
-                        extra_rows = len(values) - 1
-
-                        # how many rows were already added for this row?
-                        current_unnested_rows = unnested_rows[i]
-
-                        # add any necessary rows
-                        missing = extra_rows - current_unnested_rows
-                        for _ in range(missing):
-                            data.insert(i + current_unnested_rows + 1, {})
-                            unnested_rows[i] += 1
-
-                        # unnest array into rows
-                        for j, value in enumerate(values):
-                            data[i + j][name] = value
-
-                        # skip newly unnested rows
-                        i += unnested_rows[i]
-
-                    i += 1
+                data = _unnest_array(data, name, unnested_rows)
 
             if column["type"].startswith("ROW("):
                 # expand columns; we append them to the left so they are added
@@ -660,12 +692,15 @@ class PrestoEngineSpec(BaseEngineSpec):
                 expanded_columns.extend(expanded)
 
                 # expand row objects into new columns
+                expanded_names = [col["name"] for col in expanded]
                 for row in data:
-                    for value, col in zip(row.get(name) or [], expanded):
-                        row[col["name"]] = value
+                    values = row.get(name)
+                    if values:
+                        row.update(zip(expanded_names, values))
 
+        all_column_names_list = [column["name"] for column in all_columns]
         data = [
-            {k["name"]: row.get(k["name"], "") for k in all_columns} for row in data
+            {name: row.get(name, "") for name in all_column_names_list} for row in data
         ]
 
         return all_columns, data, expanded_columns
@@ -731,42 +766,46 @@ class PrestoEngineSpec(BaseEngineSpec):
     def handle_cursor(cls, cursor, query, session):
         """Updates progress information"""
         query_id = query.id
+        intervals = poll_intervals(
+            config["SQLLAB_POLL_INTERVAL_MIN"], config["SQLLAB_POLL_INTERVAL_MAX"]
+        )
         logging.info(f"Query {query_id}: Polling the cursor for progress")
         polled = cursor.poll()
         # poll returns dict -- JSON status information or ``None``
         # if the query is done
         # https://github.com/dropbox/PyHive/blob/
         # b34bdbf51378b3979eaf5eca9e956f06ddc36ca0/pyhive/presto.py#L178
-        while polled:
-            # Update the object and wait for the kill signal.
-            stats = polled.get("stats", {})
-
-            query = session.query(type(query)).filter_by(id=query_id).one()
-            if query.status in [QueryStatus.STOPPED, QueryStatus.TIMED_OUT]:
-                cursor.cancel()
-                break
-
-            if stats:
-                state = stats.get("state")
+        try:
+            while polled:
+                # Update the object and wait for the kill signal.
+                stats = polled.get("stats", {})
 
-                # if already finished, then stop polling
-                if state == "FINISHED":
+                if query_progress_reporter.is_stopped(query, session):
+                    cursor.cancel()
                     break
 
-                completed_splits = float(stats.get("completedSplits"))
-                total_splits = float(stats.get("totalSplits"))
-                if total_splits and completed_splits:
-                    progress = 100 * (completed_splits / total_splits)
-                    logging.info(
-                        "Query {} progress: {} / {} "  # pylint: disable=logging-format-interpolation
-                        "splits".format(query_id, completed_splits, total_splits)
-                    )
-                    if progress > query.progress:
-                        query.progress = progress
-                    session.commit()
-            time.sleep(1)
-            logging.info(f"Query {query_id}: Polling the cursor for progress")
-            polled = cursor.poll()
+                if stats:
+                    state = stats.get("state")
+
+                    # if already finished, then stop polling
+                    if state == "FINISHED":
+                        break
+
+                    completed_splits = float(stats.get("completedSplits"))
+                    total_splits = float(stats.get("totalSplits"))
+                    if total_splits and completed_splits:
+                        progress = 100 * (completed_splits / total_splits)
+                        logging.info(
+                            "Query {} progress: {} / {} "  # pylint: disable=logging-format-interpolation
+                            "splits".format(query_id, completed_splits, total_splits)
+                        )
+                        query_progress_reporter.report(query, progress=progress)
+                        query_progress_reporter.flush(session)
+                time.sleep(next(intervals))
+                logging.info(f"Query {query_id}: Polling the cursor for progress")
+                polled = cursor.poll()
+        finally:
+            query_progress_reporter.done(query, session)
 
     @classmethod
     def _extract_error_message(cls, e):
@@ -29,7 +29,10 @@ from flask_talisman import Talisman
 from werkzeug.local import LocalProxy
 
 from superset.utils.cache_manager import CacheManager
+from superset.utils.engine_pools import EnginePoolManager
 from superset.utils.feature_flag_manager import FeatureFlagManager
+from superset.utils.query_cost import QueryCostGuard
+from superset.utils.query_progress import QueryProgressReporter
 
 
 class JinjaContextManager:
@@ -127,12 +130,15 @@ appbuilder = AppBuilder(update_perms=False)
 cache_manager = CacheManager()
 celery_app = celery.Celery()
 db = SQLA()
+engine_pool_manager = EnginePoolManager()
 _event_logger: dict = {}
 event_logger = LocalProxy(lambda: _event_logger.get("event_logger"))
 feature_flag_manager = FeatureFlagManager()
 jinja_context_manager = JinjaContextManager()
 manifest_processor = UIManifestProcessor(APP_DIR)
 migrate = Migrate()
+query_cost_guard = QueryCostGuard()
+query_progress_reporter = QueryProgressReporter()
 results_backend_manager = ResultsBackendManager()
 security_manager = LocalProxy(lambda: appbuilder.sm)
 talisman = Talisman()
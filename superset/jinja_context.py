@@ -17,9 +17,11 @@
 """Defines the templating context for SQL Lab"""
 import inspect
 import json
-from typing import Any, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from flask import g, request
+from jinja2 import nodes, TemplateSyntaxError
 from jinja2.sandbox import SandboxedEnvironment
 
 from superset import jinja_base_context
@@ -151,6 +153,129 @@ class CacheKeyWrapper:  # pylint: disable=too-few-public-methods
         return key
 
 
+# The functions of the context the values passed to ``cache_key_wrapper`` may be
+# computed with, they only depend on the request and the logged in user
+CACHE_KEY_FUNCTIONS = frozenset(
+    ["current_user_id", "current_username", "filter_values", "url_param"]
+)
+
+
+class UnknownCacheKeyDependency(Exception):
+    """The cache keys of a template can't be known without rendering it"""
+
+
+def _check_cache_key_expression(node: nodes.Node) -> None:
+    if isinstance(node, nodes.Const):
+        return
+    if isinstance(node, (nodes.List, nodes.Tuple)):
+        for item in node.items:
+            _check_cache_key_expression(item)
+        return
+    if (
+        isinstance(node, nodes.Call)
+        and isinstance(node.node, nodes.Name)
+        and node.node.name in CACHE_KEY_FUNCTIONS
+        and node.dyn_args is None
+        and node.dyn_kwargs is None
+    ):
+        for arg in node.args:
+            _check_cache_key_expression(arg)
+        for kwarg in node.kwargs:
+            _check_cache_key_expression(kwarg.value)
+        return
+    raise UnknownCacheKeyDependency(f"Unsupported cache key expression: {node}")
+
+
+def _find_cache_key_wrappers(node: nodes.Node) -> List[nodes.Call]:
+    """Find the calls to ``cache_key_wrapper`` run whenever an output node is"""
+    wrappers = []
+    for child in node.iter_child_nodes():
+        if isinstance(child, (nodes.CondExpr, nodes.And, nodes.Or)):
+            # part of the expression may not be evaluated
+            if any(
+                name.name == "cache_key_wrapper" for name in child.find_all(nodes.Name)
+            ):
+                raise UnknownCacheKeyDependency("Conditional cache key")
+            continue
+        if (
+            isinstance(child, nodes.Call)
+            and isinstance(child.node, nodes.Name)
+            and child.node.name == "cache_key_wrapper"
+        ):
+            if child.dyn_args or child.dyn_kwargs or len(child.args) != 1:
+                raise UnknownCacheKeyDependency("Unsupported cache_key_wrapper call")
+            _check_cache_key_expression(child.args[0])
+            wrappers.append(child)
+        else:
+            wrappers += _find_cache_key_wrappers(child)
+    return wrappers
+
+
+@lru_cache(maxsize=1024)
+def get_cache_key_dependencies(sql: str) -> Optional[Tuple[nodes.Expr, ...]]:
+    """
+    Get the expressions a template passes to ``cache_key_wrapper``, without
+    rendering it. Analyses are memoized per template.
+
+    Only the expressions computed with constants and ``CACHE_KEY_FUNCTIONS`` are
+    supported, outside of control structures such as loops or conditions.
+
+    :param sql: The template
+    :returns: The expressions in the order they are rendered, None when the
+        template has to be rendered to get its cache keys
+    """
+
+    try:
+        template = SandboxedEnvironment().parse(sql)
+    except TemplateSyntaxError:
+        return None
+    try:
+        wrappers: List[nodes.Call] = []
+        for node in template.body:
+            if isinstance(node, nodes.Output):
+                wrappers += _find_cache_key_wrappers(node)
+            elif any(
+                name.name == "cache_key_wrapper" for name in node.find_all(nodes.Name)
+            ):
+                raise UnknownCacheKeyDependency("cache_key_wrapper in a statement")
+    except UnknownCacheKeyDependency:
+        return None
+
+    names = [
+        name
+        for name in template.find_all(nodes.Name)
+        if name.name == "cache_key_wrapper" or name.name in CACHE_KEY_FUNCTIONS
+    ]
+    if any(name.ctx != "load" for name in names) or any(
+        True for _ in template.find_all((nodes.Extends, nodes.Include, nodes.Import))
+    ):
+        # the functions are shadowed, or part of the template lives elsewhere
+        return None
+    if len(wrappers) != sum(name.name == "cache_key_wrapper" for name in names):
+        # cache_key_wrapper is aliased or nested
+        return None
+    return tuple(wrapper.args[0] for wrapper in wrappers)
+
+
+def _evaluate_cache_key_expression(node: nodes.Expr, context: Dict[str, Any]) -> Any:
+    if isinstance(node, nodes.Const):
+        return node.value
+    if isinstance(node, nodes.List):
+        return [_evaluate_cache_key_expression(n, context) for n in node.items]
+    if isinstance(node, nodes.Tuple):
+        return tuple(_evaluate_cache_key_expression(n, context) for n in node.items)
+    func = context.get(node.node.name)
+    if not callable(func):
+        raise UnknownCacheKeyDependency(f"{node.node.name} isn't callable")
+    return func(
+        *[_evaluate_cache_key_expression(arg, context) for arg in node.args],
+        **{
+            kwarg.key: _evaluate_cache_key_expression(kwarg.value, context)
+            for kwarg in node.kwargs
+        },
+    )
+
+
 class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
     """Base class for database-specific jinja context
 
@@ -174,7 +299,7 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         query=None,
         table=None,
         extra_cache_keys: Optional[List[Any]] = None,
-        **kwargs
+        **kwargs,
     ):
         self.database = database
         self.query = query
@@ -208,6 +333,24 @@ class BaseTemplateProcessor:  # pylint: disable=too-few-public-methods
         kwargs.update(self.context)
         return template.render(kwargs)
 
+    def get_extra_cache_keys(self, sql: str) -> Optional[List[Any]]:
+        """Get the values a template passes to ``cache_key_wrapper`` without
+        rendering it, see ``get_cache_key_dependencies``
+
+        :param sql: The template
+        :returns: The cache keys, None when the template has to be rendered
+        """
+        dependencies = get_cache_key_dependencies(sql)
+        if dependencies is None:
+            return None
+        try:
+            return [
+                _evaluate_cache_key_expression(expression, self.context)
+                for expression in dependencies
+            ]
+        except UnknownCacheKeyDependency:
+            return None
+
 
 class PrestoTemplateProcessor(BaseTemplateProcessor):
     """Presto Jinja context
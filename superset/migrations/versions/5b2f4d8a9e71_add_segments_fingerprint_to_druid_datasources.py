@@ -0,0 +1,41 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""add_segments_fingerprint_to_druid_datasources
+
+Revision ID: 5b2f4d8a9e71
+Revises: c0a3ea245b61
+Create Date: 2026-10-18 14:36:08.129573
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "5b2f4d8a9e71"
+down_revision = "c0a3ea245b61"
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def upgrade():
+    op.add_column(
+        "datasources", sa.Column("segments_fingerprint", sa.String(100), nullable=True)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("datasources") as batch_op:
+        batch_op.drop_column("segments_fingerprint")
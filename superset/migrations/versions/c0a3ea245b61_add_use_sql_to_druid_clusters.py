@@ -0,0 +1,39 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""add_use_sql_to_druid_clusters
+
+Revision ID: c0a3ea245b61
+Revises: 817e1c9b09d0
+Create Date: 2026-10-18 10:12:43.381204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = "c0a3ea245b61"
+down_revision = "817e1c9b09d0"
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def upgrade():
+    op.add_column("clusters", sa.Column("use_sql", sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("clusters") as batch_op:
+        batch_op.drop_column("use_sql")
@@ -22,7 +22,18 @@ import textwrap
 from contextlib import closing
 from copy import copy, deepcopy
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type, TYPE_CHECKING
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+)
 from urllib import parse
 
 import numpy
@@ -57,12 +68,15 @@ from sqlalchemy_utils import EncryptedType
 
 from superset import app, db, db_engine_specs, is_feature_enabled, security_manager
 from superset.connectors.connector_registry import ConnectorRegistry
+from superset.dataframe import df_from_cursor
 from superset.db_engine_specs.base import TimeGrain
+from superset.extensions import engine_pool_manager
 from superset.legacy import update_time_range
 from superset.models.helpers import AuditMixinNullable, ImportMixin
 from superset.models.tags import ChartUpdater, DashboardUpdater, FavStarUpdater
 from superset.models.user_attributes import UserAttribute
 from superset.utils import cache as cache_util, core as utils
+from superset.utils.engine_pools import get_pool_params
 from superset.viz import BaseViz, viz_types
 
 if TYPE_CHECKING:
@@ -925,13 +939,63 @@ class Database(
                 effective_username = g.user.username
         return effective_username
 
-    @utils.memoized(watch=("impersonate_user", "sqlalchemy_uri_decrypted", "extra"))
     def get_sqla_engine(
         self,
         schema: Optional[str] = None,
         nullpool: bool = True,
         user_name: Optional[str] = None,
         source: Optional[int] = None,
+    ) -> Engine:
+        if self.impersonate_user and not user_name:
+            # engines are cached per effective user
+            user_name = self.get_effective_user(make_url(self.sqlalchemy_uri_decrypted))
+
+        pool_config = self.get_extra().get("connection_pool")
+        if not pool_config:
+            return self._get_sqla_engine(schema, nullpool, user_name, source)
+
+        key = (
+            self.id,
+            self.sqlalchemy_uri_decrypted,
+            self.extra,
+            self.impersonate_user,
+            schema,
+            user_name,
+            source,
+        )
+        return engine_pool_manager.get_engine(
+            key,
+            lambda: self._create_sqla_engine(
+                schema,
+                user_name=user_name,
+                source=source,
+                pool_params=get_pool_params(pool_config),
+            ),
+            stats_key=f"db_pool.{self.id}",
+        )
+
+    @utils.memoized(
+        watch=("impersonate_user", "sqlalchemy_uri_decrypted", "extra"),
+        maxsize=config["SQLA_ENGINE_CACHE_MAX_SIZE"],
+        ttl=config["SQLA_ENGINE_CACHE_TTL"],
+        on_evict=lambda engine: engine.dispose(),
+    )
+    def _get_sqla_engine(
+        self,
+        schema: Optional[str] = None,
+        nullpool: bool = True,
+        user_name: Optional[str] = None,
+        source: Optional[int] = None,
+    ) -> Engine:
+        return self._create_sqla_engine(schema, nullpool, user_name, source)
+
+    def _create_sqla_engine(  # pylint: disable=too-many-arguments
+        self,
+        schema: Optional[str] = None,
+        nullpool: bool = True,
+        user_name: Optional[str] = None,
+        source: Optional[int] = None,
+        pool_params: Optional[Dict[str, Any]] = None,
     ) -> Engine:
         extra = self.get_extra()
         sqlalchemy_url = make_url(self.sqlalchemy_uri_decrypted)
@@ -948,7 +1012,9 @@ class Database(
         logging.info("Database.get_sqla_engine(). Masked URL: %s", str(masked_url))
 
         params = extra.get("engine_params", {})
-        if nullpool:
+        if pool_params:
+            params.update(pool_params)
+        elif nullpool:
             params["poolclass"] = NullPool
 
         # If using Hive, this will set hive.server2.proxy.user=$effective_username
@@ -977,54 +1043,108 @@ class Database(
     def get_quoter(self):
         return self.get_dialect().identifier_preparer.quote
 
-    def get_df(  # pylint: disable=too-many-locals
-        self, sql: str, schema: str, mutator: Optional[Callable] = None
-    ) -> pd.DataFrame:
-        sqls = [str(s).strip(" ;") for s in sqlparse.parse(sql)]
+    @property
+    def fetch_batch_size(self) -> Optional[int]:
+        return self.get_extra().get("fetch_batch_size", config["DB_FETCH_BATCH_SIZE"])
+
+    def _get_df_engine(self, schema: Optional[str]) -> Engine:
         source_key = None
         if request and request.referrer:
             if "/superset/dashboard/" in request.referrer:
                 source_key = "dashboard"
             elif "/superset/explore/" in request.referrer:
                 source_key = "chart"
-        engine = self.get_sqla_engine(
+        return self.get_sqla_engine(
             schema=schema, source=utils.sources[source_key] if source_key else None
         )
-        username = utils.get_username()
 
-        def needs_conversion(df_series: pd.Series) -> bool:
-            return not df_series.empty and isinstance(df_series[0], (list, dict))
+    def _execute_statements(
+        self, engine: Engine, cursor, sql: str, schema: Optional[str]
+    ) -> List[str]:
+        """Runs the statements of ``sql``, leaving the results of the last one
+        to fetch from the cursor, and returns its column names"""
+        sqls = [str(s).strip(" ;") for s in sqlparse.parse(sql)]
+        username = utils.get_username()
 
         def _log_query(sql: str) -> None:
             if log_query:
                 log_query(engine.url, sql, schema, username, __name__, security_manager)
 
-        with closing(engine.raw_connection()) as conn:
-            with closing(conn.cursor()) as cursor:
-                for sql_ in sqls[:-1]:
-                    _log_query(sql_)
-                    self.db_engine_spec.execute(cursor, sql_)
-                    cursor.fetchall()
+        for sql_ in sqls[:-1]:
+            _log_query(sql_)
+            self.db_engine_spec.execute(cursor, sql_)
+            cursor.fetchall()
 
-                _log_query(sqls[-1])
-                self.db_engine_spec.execute(cursor, sqls[-1])
+        _log_query(sqls[-1])
+        self.db_engine_spec.execute(cursor, sqls[-1])
 
-                if cursor.description is not None:
-                    columns = [col_desc[0] for col_desc in cursor.description]
-                else:
-                    columns = []
+        if cursor.description is not None:
+            return [col_desc[0] for col_desc in cursor.description]
+        return []
 
-                df = pd.DataFrame.from_records(
-                    data=list(cursor.fetchall()), columns=columns, coerce_float=True
-                )
+    @staticmethod
+    def _convert_nested_columns(df: pd.DataFrame) -> pd.DataFrame:
+        def needs_conversion(df_series: pd.Series) -> bool:
+            return not df_series.empty and isinstance(df_series[0], (list, dict))
+
+        for k, v in df.dtypes.items():
+            if v.type == numpy.object_ and needs_conversion(df[k]):
+                df[k] = df[k].apply(utils.json_dumps_w_dates)
+        return df
+
+    def get_df(
+        self,
+        sql: str,
+        schema: str,
+        mutator: Optional[Callable] = None,
+        row_limit: Optional[int] = None,
+    ) -> pd.DataFrame:
+        engine = self._get_df_engine(schema)
+        with closing(engine.raw_connection()) as conn:
+            with closing(conn.cursor()) as cursor:
+                columns = self._execute_statements(engine, cursor, sql, schema)
+
+                batch_size = self.fetch_batch_size
+                if batch_size:
+                    dtype = None
+                    if cursor.description is not None:
+                        dtype = self.db_engine_spec.get_pandas_dtype(cursor.description)
+                    df = df_from_cursor(
+                        cursor, columns, batch_size, dtype=dtype, row_limit=row_limit
+                    )
+                else:
+                    df = pd.DataFrame.from_records(
+                        data=list(cursor.fetchall()), columns=columns, coerce_float=True
+                    )
 
                 if mutator:
                     df = mutator(df)
 
-                for k, v in df.dtypes.items():
-                    if v.type == numpy.object_ and needs_conversion(df[k]):
-                        df[k] = df[k].apply(utils.json_dumps_w_dates)
-                return df
+                return self._convert_nested_columns(df)
+
+    def iter_df(self, sql: str, schema: str, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Runs ``sql`` and yields its results ``batch_size`` rows at a time
+
+        The rows are fetched from the cursor as the dataframes are consumed, the
+        first dataframe is yielded even when it is empty so its columns are known.
+        """
+        engine = self._get_df_engine(schema)
+        with closing(engine.raw_connection()) as conn:
+            with closing(conn.cursor()) as cursor:
+                columns = self._execute_statements(engine, cursor, sql, schema)
+                dtype = None
+                if cursor.description is not None:
+                    dtype = self.db_engine_spec.get_pandas_dtype(cursor.description)
+                first = True
+                while True:
+                    df = df_from_cursor(
+                        cursor, columns, batch_size, dtype=dtype, row_limit=batch_size
+                    )
+                    if first or not df.empty:
+                        yield self._convert_nested_columns(df)
+                    first = False
+                    if len(df.index) < batch_size:
+                        break
 
     def compile_sqla_query(self, qry: Select, schema: Optional[str] = None) -> str:
         engine = self.get_sqla_engine(schema=schema)
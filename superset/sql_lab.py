@@ -14,21 +14,24 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import hashlib
 import logging
+import threading
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import closing
 from datetime import datetime
 from sys import getsizeof
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Set, Tuple, Union
 
 import backoff
 import msgpack
-import pyarrow as pa
 import simplejson as json
 import sqlalchemy
 from celery.exceptions import SoftTimeLimitExceeded
 from contextlib2 import contextmanager
 from flask_babel import lazy_gettext as _
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
@@ -41,12 +44,14 @@ from superset import (
 )
 from superset.dataframe import SupersetDataFrame
 from superset.db_engine_specs import BaseEngineSpec
-from superset.extensions import celery_app
+from superset.extensions import celery_app, query_cost_guard, query_progress_reporter
 from superset.models.sql_lab import Query
 from superset.sql_parse import ParsedQuery
-from superset.utils.core import json_iso_dttm_ser, QueryStatus, sources, zlib_compress
+from superset.utils import arrow_ipc, compression, query_cost, results_chunks
+from superset.utils.core import json_iso_dttm_ser, QueryStatus, sources
 from superset.utils.dates import now_as_float
 from superset.utils.decorators import stats_timing
+from superset.utils.query_cost import QueryCostExceededException
 
 config = app.config
 stats_logger = config["STATS_LOGGER"]
@@ -176,10 +181,9 @@ def get_sql_results(  # pylint: disable=too-many-arguments
 
 
 # pylint: disable=too-many-arguments
-def execute_sql_statement(sql_statement, query, user_name, session, cursor, log_params):
-    """Executes a single SQL statement"""
+def prepare_sql_statement(sql_statement: str, query: Query, user_name) -> str:
+    """Checks a single SQL statement may run and returns the SQL to execute"""
     database = query.database
-    db_engine_spec = database.db_engine_spec
     parsed_query = ParsedQuery(sql_statement)
     sql = parsed_query.stripped()
 
@@ -211,6 +215,19 @@ def execute_sql_statement(sql_statement, query, user_name, session, cursor, log_
     # Hook to allow environment-specific mutation (usually comments) to the SQL
     if SQL_QUERY_MUTATOR:
         sql = SQL_QUERY_MUTATOR(sql, user_name, security_manager, database)
+    return sql
+
+
+def execute_sql_statement(  # pylint: disable=too-many-arguments
+    sql_statement, query, user_name, session, cursor, log_params, results_writer=None
+):
+    """Executes a single SQL statement
+
+    When a ``results_writer`` is passed, the results are fetched in batches
+    written to the results backend as they are fetched, and None is returned.
+    """
+    db_engine_spec = query.database.db_engine_spec
+    sql = prepare_sql_statement(sql_statement, query, user_name)
 
     try:
         if log_query:
@@ -237,6 +254,9 @@ def execute_sql_statement(sql_statement, query, user_name, session, cursor, log_
                 query.id,
                 str(query.to_dict()),
             )
+            if results_writer:
+                _stream_results(cursor, query, db_engine_spec, results_writer)
+                return None
             data = db_engine_spec.fetch_data(cursor, query.limit)
 
     except SoftTimeLimitExceeded as e:
@@ -254,6 +274,128 @@ def execute_sql_statement(sql_statement, query, user_name, session, cursor, log_
     return SupersetDataFrame(data, cursor_description, db_engine_spec)
 
 
+def _stream_results(
+    cursor, query: Query, db_engine_spec, results_writer: "ResultsChunkWriter"
+) -> None:
+    """Writes the results of a statement as chunks as they are fetched"""
+    batches = db_engine_spec.fetch_data_in_batches(
+        cursor, query.limit, config["RESULTS_BACKEND_CHUNK_ROWS"]
+    )
+    for data in batches:
+        results_writer.write_dataframe(
+            SupersetDataFrame(data, cursor.description, db_engine_spec)
+        )
+    if not results_writer.chunk_sizes:
+        results_writer.write_dataframe(
+            SupersetDataFrame([], cursor.description, db_engine_spec)
+        )
+
+
+def can_stream_results(
+    query: Query, statement: str, expand_data: bool, use_msgpack: Optional[bool]
+) -> bool:
+    """Whether the results of a statement may be written to the results backend
+    as they are fetched, rather than once they are all in memory
+
+    Data expanded before being stored depends on all the rows, so it can't be
+    streamed.
+    """
+    if not config["SQLLAB_STREAM_RESULTS"] or not config["RESULTS_BACKEND_CHUNK_ROWS"]:
+        return False
+    if query.select_as_cta or (expand_data and not use_msgpack):
+        return False
+    return ParsedQuery(statement).is_select()
+
+
+def get_results_cache_key(
+    query: Query, statements: list, user_name: Optional[str], expand_data: bool
+) -> Optional[str]:
+    """Get the key of the results of a query in the SQL Lab results cache
+
+    Only queries made of SELECT statements, against databases with the results
+    cache enabled, are cached. The key covers the normalized SQL, the database,
+    the schema, the limit and the effective user.
+    """
+    database = query.database
+    enabled = database.get_extra().get(
+        "sqllab_results_cache", config["SQLLAB_RESULTS_CACHE"]
+    )
+    if not enabled or query.select_as_cta or not statements:
+        return None
+    parsed_queries = [ParsedQuery(statement) for statement in statements]
+    if not all(parsed_query.is_select() for parsed_query in parsed_queries):
+        return None
+
+    effective_user = database.get_effective_user(
+        make_url(database.sqlalchemy_uri_decrypted), user_name
+    )
+    cache_dict = {
+        "sql": [parsed_query.normalized() for parsed_query in parsed_queries],
+        "database_id": database.id,
+        "schema": query.schema,
+        "limit": query.limit,
+        "effective_user": effective_user,
+        "expand_data": expand_data,
+    }
+    json_data = json.dumps(cache_dict, sort_keys=True)
+    return "sqllab_results/" + hashlib.md5(json_data.encode("utf-8")).hexdigest()
+
+
+def _get_cached_results(
+    query: Query, results_cache_key: str, return_results: bool, session
+) -> Optional[dict]:
+    """Serves a query from the results of an identical query stored in the
+    results backend, returns None when there are none"""
+    cached = results_backend.get(results_cache_key)
+    if not cached or not results_backend.has(cached["results_key"]):
+        return None
+
+    payload = dict(query_id=query.id)
+    if return_results:
+        blob = results_backend.get(cached["results_key"])
+        if not blob:
+            return None
+        serialized_payload = compression.decompress(
+            blob, decode=not results_backend_use_msgpack
+        )
+        if results_backend_use_msgpack:
+            payload = msgpack.loads(serialized_payload, raw=False)
+        else:
+            payload = json.loads(serialized_payload)
+        if results_chunks.is_chunked(payload):
+            # the data of chunked results isn't returned
+            return None
+        payload["query_id"] = query.id
+
+    logger.info(
+        f"Query {query.id}: Serving results from cache, key: {cached['results_key']}"
+    )
+    stats_logger.incr("sqllab.results_cache.hit")
+    query.results_key = cached["results_key"]
+    query.rows = cached["rows"]
+    query.progress = 100
+    query.set_extra_json_key("served_from_cache", True)
+    query.end_time = now_as_float()
+    query.status = QueryStatus.SUCCESS
+    session.commit()
+
+    payload["query"] = query.to_dict()
+    payload["query"]["state"] = QueryStatus.SUCCESS
+    return payload
+
+
+def get_results_codec(database) -> compression.CompressionCodec:
+    """Get the codec compressing the results of a database in the results backend,
+    set by its ``results_backend_compression`` extra or globally"""
+    codec_config = database.get_extra().get("results_backend_compression")
+    if codec_config is None:
+        return compression.get_codec(
+            config["RESULTS_BACKEND_COMPRESSION"],
+            config["RESULTS_BACKEND_COMPRESSION_LEVEL"],
+        )
+    return compression.get_codec(codec_config)
+
+
 def _serialize_payload(
     payload: dict, use_msgpack: Optional[bool] = False
 ) -> Union[bytes, str]:
@@ -264,25 +406,101 @@ def _serialize_payload(
     return json.dumps(payload, default=json_iso_dttm_ser, ignore_nan=True)
 
 
+class ResultsChunkWriter:
+    """Writes the results of a query to the results backend one chunk at a time,
+    see ``superset.utils.results_chunks``"""
+
+    def __init__(
+        self,
+        key: str,
+        cache_timeout: int,
+        use_msgpack: Optional[bool] = False,
+        codec: Optional[compression.CompressionCodec] = None,
+    ) -> None:
+        self.key = key
+        self.cache_timeout = cache_timeout
+        self.use_msgpack = use_msgpack
+        self.codec = codec
+        self.chunk_sizes: List[int] = []
+        self.columns: Optional[list] = None
+
+    @property
+    def rows(self) -> int:
+        return sum(self.chunk_sizes)
+
+    def write(self, data: Union[bytes, list], row_count: int) -> None:
+        """Writes the serialized data of the next ``row_count`` rows"""
+        compressed = compression.compress(
+            _serialize_payload({"data": data}, self.use_msgpack), self.codec
+        )
+        results_backend.set(
+            results_chunks.chunk_key(self.key, len(self.chunk_sizes)),
+            compressed,
+            self.cache_timeout,
+        )
+        self.chunk_sizes.append(row_count)
+
+    def write_dataframe(self, cdf: SupersetDataFrame) -> None:
+        """Writes the next rows, the columns are the ones of the first chunk"""
+        if self.columns is None:
+            self.columns = cdf.columns or []
+        data: Union[bytes, list]
+        if self.use_msgpack:
+            data = arrow_ipc.serialize_dataframe(cdf.raw_df)
+        else:
+            data = cdf.data or []
+        self.write(data, cdf.size)
+
+    def close(self, payload: dict) -> None:
+        """Writes the manifest, once all the chunks are written"""
+        manifest = {k: v for k, v in payload.items() if k != "data"}
+        manifest["chunks"] = self.chunk_sizes
+        compressed = compression.compress(
+            _serialize_payload(manifest, self.use_msgpack), self.codec
+        )
+        results_backend.set(self.key, compressed, self.cache_timeout)
+
+
+def _store_results_chunks(  # pylint: disable=too-many-arguments
+    key: str,
+    payload: dict,
+    cdf: SupersetDataFrame,
+    chunk_rows: int,
+    cache_timeout: int,
+    use_msgpack: Optional[bool] = False,
+    codec: Optional[compression.CompressionCodec] = None,
+) -> None:
+    """Stores the results under ``key`` as chunks of ``chunk_rows`` rows
+
+    The data of each chunk is serialized and compressed on its own, the payload
+    without its data is stored under ``key`` once all the chunks are written.
+    """
+    writer = ResultsChunkWriter(key, cache_timeout, use_msgpack, codec)
+    row_count = len(cdf.raw_df.index) if use_msgpack else len(payload["data"])
+    for start, end in results_chunks.split_rows(row_count, chunk_rows):
+        if use_msgpack:
+            data = arrow_ipc.serialize_dataframe(cdf.raw_df.iloc[start:end])
+        else:
+            data = payload["data"][start:end]
+        writer.write(data, end - start)
+    writer.close(payload)
+
+
 def _serialize_and_expand_data(
     cdf: SupersetDataFrame,
     db_engine_spec: BaseEngineSpec,
     use_msgpack: Optional[bool] = False,
     expand_data: bool = False,
-) -> Tuple[Union[bytes, str], list, list, list]:
+) -> Tuple[Union[bytes, list], list, list, list]:
     selected_columns: list = cdf.columns or []
     expanded_columns: list
+    data: Union[bytes, list]
 
     if use_msgpack:
         with stats_timing(
             "sqllab.query.results_backend_pa_serialization", stats_logger
         ):
-            data = (
-                pa.default_serialization_context()
-                .serialize(cdf.raw_df)
-                .to_buffer()
-                .to_pybytes()
-            )
+            data = arrow_ipc.serialize_dataframe(cdf.raw_df)
         # expand when loading data from results backend
         all_columns, expanded_columns = (selected_columns, [])
     else:
@@ -298,6 +516,287 @@ def _serialize_and_expand_data(
     return (data, selected_columns, all_columns, expanded_columns)
 
 
+def get_statements_concurrency(database) -> int:
+    """Get the number of statements of a query that may run concurrently against
+    a database, set by its ``sqllab_parallel_statements`` extra or globally"""
+    return database.get_extra().get(
+        "sqllab_parallel_statements", config["SQLLAB_PARALLEL_STATEMENTS"]
+    )
+
+
+def can_run_statements_in_parallel(
+    query: Query, statements: List[str], concurrency: int
+) -> bool:
+    """Whether the statements of a query are independent and may run concurrently,
+    each one on its own connection
+
+    Only SELECT statements neither writing nor relying on the state of the
+    session, e.g. variables or temporary tables, are independent. CREATE TABLE AS
+    queries always run their statements one after the other.
+    """
+    if concurrency <= 1 or len(statements) <= 1 or query.select_as_cta:
+        return False
+    return all(ParsedQuery(statement).is_stateless_select() for statement in statements)
+
+
+def _set_statements_progress(
+    query: Query, completed: int, running: int, total: int
+) -> None:
+    if running == 1 and completed < total:
+        msg = f"Running statement {completed + 1} out of {total}"
+    else:
+        msg = (
+            f"Running {total} statements: {completed} completed, " f"{running} running"
+        )
+    logger.info(f"Query {query.id}: {msg}")
+    query.set_extra_json_key("progress", msg)
+    query.set_extra_json_key(
+        "statements_progress",
+        {"completed": completed, "running": running, "total": total},
+    )
+
+
+def _run_statement(  # pylint: disable=too-many-arguments
+    engine,
+    sql: str,
+    db_engine_spec: BaseEngineSpec,
+    limit: int,
+    running_cursors: Optional[Set] = None,
+    lock: Optional[threading.Lock] = None,
+) -> SupersetDataFrame:
+    """Runs a statement on a connection of its own, its cursor being in
+    ``running_cursors`` while it runs"""
+    with closing(engine.raw_connection()) as conn:
+        with closing(conn.cursor()) as cursor:
+            if running_cursors is not None and lock is not None:
+                with lock:
+                    running_cursors.add(cursor)
+            try:
+                db_engine_spec.execute(cursor, sql)
+                data = db_engine_spec.fetch_data(cursor, limit)
+                return SupersetDataFrame(data, cursor.description, db_engine_spec)
+            finally:
+                if running_cursors is not None and lock is not None:
+                    with lock:
+                        running_cursors.discard(cursor)
+
+
+def _cancel_cursor(cursor) -> None:
+    """Cancels the statement running on a cursor, when its driver supports it,
+    e.g. the Presto and Hive ones"""
+    cancel = getattr(cursor, "cancel", None)
+    if cancel is None:
+        return
+    try:
+        cancel()
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(f"Could not cancel statement: {e}")
+
+
+def execute_sql_statements_in_parallel(  # pylint: disable=too-many-locals
+    statements: List[str],
+    query: Query,
+    user_name: Optional[str],
+    session,
+    engine,
+    concurrency: int,
+    log_params: Optional[dict] = None,
+) -> Optional[List[SupersetDataFrame]]:
+    """Runs independent statements concurrently, on up to ``concurrency``
+    connections, and returns their results in the order of the statements, None
+    when the query is stopped
+
+    The statements run in worker threads, which are only passed plain values,
+    while the progress of the query is tracked in the calling thread, the only
+    one using the session. When the query is stopped or one of its statements
+    fails, the statements that didn't start are dropped and the running ones are
+    cancelled when the driver supports it. Other drivers run them to completion
+    on their connections, in the background.
+    """
+    db_engine_spec = query.database.db_engine_spec
+    limit = query.limit
+    sqls = [
+        prepare_sql_statement(statement, query, user_name) for statement in statements
+    ]
+    if log_query:
+        for sql in sqls:
+            log_query(
+                query.database.sqlalchemy_uri,
+                sql,
+                query.schema,
+                user_name,
+                __name__,
+                security_manager,
+                log_params,
+            )
+    query.executed_sql = ";\n".join(sqls)
+    statement_count = len(sqls)
+    max_workers = min(concurrency, statement_count)
+    _set_statements_progress(query, 0, max_workers, statement_count)
+    session.commit()
+
+    flask_app = app._get_current_object()  # pylint: disable=protected-access
+
+    running_cursors: Set = set()
+    lock = threading.Lock()
+
+    def run_statement(sql: str) -> SupersetDataFrame:
+        with flask_app.app_context():
+            return _run_statement(
+                engine, sql, db_engine_spec, limit, running_cursors, lock
+            )
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(run_statement, sql) for sql in sqls]
+    indexes = {future: i for i, future in enumerate(futures)}
+    pending = set(futures)
+    try:
+        with stats_timing("sqllab.query.time_executing_query", stats_logger):
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=config["SQLLAB_POLL_INTERVAL_MAX"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    exception = future.exception()
+                    if exception is not None:
+                        i = indexes[future]
+                        logger.error(
+                            f"Query {query.id}: {exception}", exc_info=exception
+                        )
+                        raise SqlLabException(
+                            f"[Statement {i+1} out of {statement_count}] "
+                            + db_engine_spec.extract_error_message(exception)
+                        )
+                if query_progress_reporter.is_stopped(query, session):
+                    return None
+                completed = statement_count - len(pending)
+                if done:
+                    _set_statements_progress(
+                        query,
+                        completed,
+                        min(max_workers, len(pending)),
+                        statement_count,
+                    )
+                    query.progress = int(100 * completed / statement_count)
+                    session.commit()
+    except SoftTimeLimitExceeded as e:
+        logger.exception(f"Query {query.id}: {e}")
+        raise SqlLabTimeoutException(
+            "SQL Lab timeout. This environment's policy is to kill queries "
+            "after {} seconds.".format(SQLLAB_TIMEOUT)
+        )
+    finally:
+        for future in pending:
+            future.cancel()
+        with lock:
+            cursors = list(running_cursors)
+        for cursor in cursors:
+            _cancel_cursor(cursor)
+        executor.shutdown(wait=False)
+        query_progress_reporter.done(query, session)
+    return [future.result() for future in futures]
+
+
+def _store_results(
+    key: str,
+    payload: dict,
+    cdf: SupersetDataFrame,
+    cache_timeout: int,
+    codec: Optional[compression.CompressionCodec] = None,
+) -> None:
+    """Stores the results of a statement under ``key`` in the results backend"""
+    chunk_rows = config["RESULTS_BACKEND_CHUNK_ROWS"]
+    with stats_timing("sqllab.query.results_backend_write", stats_logger):
+        if chunk_rows:
+            _store_results_chunks(
+                key,
+                payload,
+                cdf,
+                chunk_rows,
+                cache_timeout,
+                results_backend_use_msgpack,
+                codec,
+            )
+            return
+
+        with stats_timing(
+            "sqllab.query.results_backend_write_serialization", stats_logger
+        ):
+            serialized_payload = _serialize_payload(
+                payload, results_backend_use_msgpack
+            )
+
+        with stats_timing(
+            "sqllab.query.results_backend_write_compression", stats_logger
+        ):
+            compressed = compression.compress(serialized_payload, codec)
+        logger.debug(f"*** serialized payload size: {getsizeof(serialized_payload)}")
+        logger.debug(f"*** compressed payload size: {getsizeof(compressed)}")
+        results_backend.set(key, compressed, cache_timeout)
+
+
+def statement_results_key(key: str, index: int) -> str:
+    """Get the key of the results of a statement of the query stored under
+    ``key``"""
+    return f"{key}/statement/{index}"
+
+
+def get_query_results_key(key: str) -> str:
+    """Get the results key of the query owning the results stored under ``key``"""
+    return key.split("/statement/", 1)[0]
+
+
+def _get_statements_payloads(  # pylint: disable=too-many-arguments
+    statements: List[str],
+    cdfs: List[SupersetDataFrame],
+    payload: dict,
+    db_engine_spec: BaseEngineSpec,
+    key: Optional[str],
+    expand_data: bool,
+    use_msgpack: Optional[bool],
+    cache_timeout: int,
+    codec: Optional[compression.CompressionCodec] = None,
+) -> List[dict]:
+    """Get the results of each statement of a query run in parallel
+
+    The results of the last statement are the ones of the query. When ``key`` is
+    set, the results of the other statements are stored under keys derived from
+    it and only referenced, otherwise they are returned inline.
+    """
+    statements_payloads = []
+    for i, (statement, cdf) in enumerate(zip(statements, cdfs)):
+        statement_payload = {"sql": statement, "rows": cdf.size}
+        if i == len(cdfs) - 1:
+            if key:
+                statement_payload["results_key"] = key
+            statements_payloads.append(statement_payload)
+            continue
+
+        data, selected, columns, expanded = _serialize_and_expand_data(
+            cdf, db_engine_spec, use_msgpack, expand_data
+        )
+        results = {
+            "status": QueryStatus.SUCCESS,
+            "data": data,
+            "columns": columns,
+            "selected_columns": selected,
+            "expanded_columns": expanded,
+        }
+        if key:
+            results["query"] = payload["query"]
+            if use_msgpack:
+                results["data_format"] = arrow_ipc.ARROW_DATA_FORMAT
+            statement_key = statement_results_key(key, i)
+            _store_results(statement_key, results, cdf, cache_timeout, codec)
+            statement_payload["results_key"] = statement_key
+        else:
+            statement_payload.update(results)
+        statements_payloads.append(statement_payload)
+    return statements_payloads
+
+
 def execute_sql_statements(
     query_id,
     rendered_query,
@@ -328,48 +827,142 @@ def execute_sql_statements(
     statements = parsed_query.get_statements()
     logger.info(f"Query {query_id}: Executing {len(statements)} statement(s)")
 
+    results_cache_key = None
+    if store_results and results_backend:
+        results_cache_key = get_results_cache_key(
+            query, statements, user_name, expand_data
+        )
+    if results_cache_key:
+        cached_payload = _get_cached_results(
+            query, results_cache_key, return_results, session
+        )
+        if cached_payload is not None:
+            return cached_payload if return_results else None
+        stats_logger.incr("sqllab.results_cache.miss")
+
+    try:
+        decision = query_cost_guard.check(
+            database, query.schema, rendered_query, query.user, "sql_lab"
+        )
+    except QueryCostExceededException as e:
+        return handle_query_error(str(e), query, session, payload)
+
     logger.info(f"Query {query_id}: Set query to 'running'")
     query.status = QueryStatus.RUNNING
     query.start_running_time = now_as_float()
     session.commit()
 
-    engine = database.get_sqla_engine(
-        schema=query.schema,
-        nullpool=True,
-        user_name=user_name,
-        source=sources.get("sql_lab", None),
-    )
-    # Sharing a single connection and cursor across the
-    # execution of all statements (if many)
-    with closing(engine.raw_connection()) as conn:
-        with closing(conn.cursor()) as cursor:
-            statement_count = len(statements)
-            for i, statement in enumerate(statements):
-                # Check if stopped
-                query = get_query(query_id, session)
-                if query.status == QueryStatus.STOPPED:
-                    return None
+    if decision == query_cost.DEPRIORITIZE:
+        logger.info(f"Query {query_id}: Deprioritized, waiting for a slot")
+        query.set_extra_json_key(
+            "progress", "Waiting for a slot, as the query is expensive"
+        )
+        session.commit()
+    with query_cost_guard.slot(database, decision):
+        engine = database.get_sqla_engine(
+            schema=query.schema,
+            nullpool=True,
+            user_name=user_name,
+            source=sources.get("sql_lab", None),
+        )
+        use_msgpack = store_results and results_backend_use_msgpack
+        cache_timeout = database.cache_timeout
+        if cache_timeout is None:
+            cache_timeout = config["CACHE_DEFAULT_TIMEOUT"]
+        codec = get_results_codec(database)
+        key = str(uuid.uuid4())
+        results_writer = None
+        statement_count = len(statements)
+        concurrency = get_statements_concurrency(database)
+        parallel = can_run_statements_in_parallel(query, statements, concurrency)
+        if parallel:
+            logger.info(
+                f"Query {query_id}: Running {statement_count} statements in parallel"
+            )
+            try:
+                cdfs = execute_sql_statements_in_parallel(
+                    statements,
+                    query,
+                    user_name,
+                    session,
+                    engine,
+                    concurrency,
+                    log_params,
+                )
+            except SqlLabException as e:
+                return handle_query_error(str(e), query, session, payload)
+            if cdfs is None:
+                return None
+            cdf = cdfs[-1]
+        else:
+            # Sharing a single connection and cursor across the
+            # execution of all statements (if many)
+            with closing(engine.raw_connection()) as conn:
+                with closing(conn.cursor()) as cursor:
+                    for i, statement in enumerate(statements):
+                        # Check if stopped
+                        query = get_query(query_id, session)
+                        if query.status == QueryStatus.STOPPED:
+                            return None
 
-                # Run statement
-                msg = f"Running statement {i+1} out of {statement_count}"
-                logger.info(f"Query {query_id}: {msg}")
-                query.set_extra_json_key("progress", msg)
-                session.commit()
-                try:
-                    cdf = execute_sql_statement(
-                        statement, query, user_name, session, cursor, log_params
-                    )
-                except Exception as e:  # pylint: disable=broad-except
-                    msg = str(e)
-                    if statement_count > 1:
-                        msg = f"[Statement {i+1} out of {statement_count}] " + msg
-                    payload = handle_query_error(msg, query, session, payload)
-                    return payload
+                        # Run statement
+                        _set_statements_progress(query, i, 1, statement_count)
+                        session.commit()
+                        if (
+                            i == statement_count - 1
+                            and store_results
+                            and results_backend
+                            and not return_results
+                            and can_stream_results(
+                                query, statement, expand_data, use_msgpack
+                            )
+                        ):
+                            logger.info(
+                                f"Query {query_id}: Streaming results to results "
+                                f"backend, key: {key}"
+                            )
+                            results_writer = ResultsChunkWriter(
+                                key, cache_timeout, use_msgpack, codec
+                            )
+                        try:
+                            if results_writer:
+                                # fetch the results in batches from a server-side
+                                # cursor, where the driver supports it
+                                with closing(
+                                    db_engine_spec.get_cursor(conn, server_side=True)
+                                ) as results_cursor:
+                                    cdf = execute_sql_statement(
+                                        statement,
+                                        query,
+                                        user_name,
+                                        session,
+                                        results_cursor,
+                                        log_params,
+                                        results_writer,
+                                    )
+                            else:
+                                cdf = execute_sql_statement(
+                                    statement,
+                                    query,
+                                    user_name,
+                                    session,
+                                    cursor,
+                                    log_params,
+                                )
+                        except Exception as e:  # pylint: disable=broad-except
+                            msg = str(e)
+                            if statement_count > 1:
+                                msg = (
+                                    f"[Statement {i+1} out of {statement_count}] " + msg
+                                )
+                            payload = handle_query_error(msg, query, session, payload)
+                            return payload
 
     # Success, updating the query entry in database
-    query.rows = cdf.size
+    query.rows = results_writer.rows if results_writer else cdf.size
     query.progress = 100
     query.set_extra_json_key("progress", None)
+    query.set_extra_json_key("statements_progress", None)
     if query.select_as_cta:
         query.select_sql = database.select_star(
             query.tmp_table_name,
@@ -380,9 +973,17 @@ def execute_sql_statements(
         )
     query.end_time = now_as_float()
 
-    data, selected_columns, all_columns, expanded_columns = _serialize_and_expand_data(
-        cdf, db_engine_spec, store_results and results_backend_use_msgpack, expand_data
-    )
+    if results_writer:
+        # the data is already in the results backend
+        data, selected_columns, expanded_columns = None, results_writer.columns, []
+        all_columns = selected_columns
+    else:
+        (
+            data,
+            selected_columns,
+            all_columns,
+            expanded_columns,
+        ) = _serialize_and_expand_data(cdf, db_engine_spec, use_msgpack, expand_data)
 
     payload.update(
         {
@@ -395,28 +996,37 @@ def execute_sql_statements(
         }
     )
     payload["query"]["state"] = QueryStatus.SUCCESS
+    if use_msgpack:
+        payload["data_format"] = arrow_ipc.ARROW_DATA_FORMAT
 
-    if store_results and results_backend:
-        key = str(uuid.uuid4())
-        logger.info(f"Query {query_id}: Storing results in results backend, key: {key}")
-        with stats_timing("sqllab.query.results_backend_write", stats_logger):
-            with stats_timing(
-                "sqllab.query.results_backend_write_serialization", stats_logger
-            ):
-                serialized_payload = _serialize_payload(
-                    payload, results_backend_use_msgpack
-                )
-            cache_timeout = database.cache_timeout
-            if cache_timeout is None:
-                cache_timeout = config["CACHE_DEFAULT_TIMEOUT"]
+    if parallel:
+        payload["statements"] = _get_statements_payloads(
+            statements,
+            cdfs,
+            payload,
+            db_engine_spec,
+            key if store_results and results_backend else None,
+            expand_data,
+            use_msgpack,
+            cache_timeout,
+            codec,
+        )
 
-            compressed = zlib_compress(serialized_payload)
-            logger.debug(
-                f"*** serialized payload size: {getsizeof(serialized_payload)}"
+    if store_results and results_backend:
+        if results_writer:
+            results_writer.close(payload)
+        else:
+            logger.info(
+                f"Query {query_id}: Storing results in results backend, key: {key}"
             )
-            logger.debug(f"*** compressed payload size: {getsizeof(compressed)}")
-            results_backend.set(key, compressed, cache_timeout)
+            _store_results(key, payload, cdf, cache_timeout, codec)
         query.results_key = key
+        if results_cache_key:
+            results_backend.set(
+                results_cache_key,
+                {"results_key": key, "rows": query.rows},
+                cache_timeout,
+            )
 
     query.status = QueryStatus.SUCCESS
     session.commit()
@@ -19,13 +19,67 @@ from typing import List, Optional, Set
 
 import sqlparse
 from sqlparse.sql import Identifier, IdentifierList, remove_quotes, Token, TokenList
-from sqlparse.tokens import Keyword, Name, Punctuation, String, Whitespace
+from sqlparse.tokens import (
+    Assignment,
+    Keyword,
+    Name,
+    Operator,
+    Punctuation,
+    String,
+    Whitespace,
+)
 from sqlparse.utils import imt
 
 RESULT_OPERATIONS = {"UNION", "INTERSECT", "EXCEPT", "SELECT"}
 ON_KEYWORD = "ON"
 PRECEDES_TABLE_NAME = {"FROM", "JOIN", "DESCRIBE", "WITH", "LEFT JOIN", "RIGHT JOIN"}
 CTE_PREFIX = "CTE__"
+# keywords reserved by SQL, which only name tables or columns when quoted, so that
+# their case can be normalized without changing the meaning of queries
+RESERVED_KEYWORDS = frozenset(
+    [
+        "ALL",
+        "AND",
+        "AS",
+        "ASC",
+        "BETWEEN",
+        "BY",
+        "CASE",
+        "CROSS",
+        "DESC",
+        "DISTINCT",
+        "ELSE",
+        "END",
+        "EXCEPT",
+        "FROM",
+        "FULL",
+        "GROUP",
+        "HAVING",
+        "IN",
+        "INNER",
+        "INTERSECT",
+        "IS",
+        "JOIN",
+        "LEFT",
+        "LIKE",
+        "LIMIT",
+        "NOT",
+        "NULL",
+        "OFFSET",
+        "ON",
+        "OR",
+        "ORDER",
+        "OUTER",
+        "RIGHT",
+        "SELECT",
+        "THEN",
+        "UNION",
+        "USING",
+        "WHEN",
+        "WHERE",
+        "WITH",
+    ]
+)
 
 
 def _extract_limit_from_query(statement: TokenList) -> Optional[int]:
@@ -81,9 +135,46 @@ class ParsedQuery(object):
         """Pessimistic readonly, 100% sure statement won't mutate anything"""
         return self.is_select() or self.is_explain()
 
+    def is_stateless_select(self) -> bool:
+        """Whether the query is a SELECT neither writing, e.g. SELECT ... INTO,
+        nor using the state of the session, e.g. variables or temporary tables
+        such as ``#tmp``, so that it can run on any connection"""
+        if not self._parsed or not all(
+            statement.get_type() == "SELECT" for statement in self._parsed
+        ):
+            return False
+        for statement in self._parsed:
+            for token in statement.flatten():
+                if token.ttype in Keyword and token.normalized == "INTO":
+                    return False
+                if token.ttype in Name and token.value.startswith(("#", "@")):
+                    return False
+                if token.ttype in (Assignment, Operator) and token.value in (":=", "@"):
+                    return False
+        return True
+
     def stripped(self) -> str:
         return self.sql.strip(" \t\n;")
 
+    def normalized(self) -> str:
+        """Returns the SQL without comments, with collapsed whitespace and
+        uppercase reserved keywords, so that equivalent queries compare equal
+
+        Other keywords, e.g. ``events``, may name tables or columns, whose case
+        matters to some engines, and are left as is.
+        """
+        sql = sqlparse.format(
+            self.stripped(), strip_comments=True, strip_whitespace=True
+        )
+        return "".join(
+            token.value.upper()
+            if token.ttype in Keyword
+            and all(word in RESERVED_KEYWORDS for word in token.value.upper().split())
+            else token.value
+            for statement in sqlparse.parse(sql)
+            for token in statement.flatten()
+        )
+
     def get_statements(self) -> List[str]:
         """Returns a list of SQL statements as strings, stripped"""
         statements = []
@@ -41,9 +41,8 @@ class BaseStatsLogger(object):
     def timing(self, key, value):
         raise NotImplementedError()
 
-    def gauge(self, key):
-        """Setup a gauge"""
-        raise NotImplementedError()
+    def gauge(self, key, value=None):
+        """Setup a gauge, optionally setting its value, ignored unless implemented"""
 
 
 class DummyStatsLogger(BaseStatsLogger):
@@ -58,12 +57,21 @@ class DummyStatsLogger(BaseStatsLogger):
             (Fore.CYAN + f"[stats_logger] (timing) {key} | {value} " + Style.RESET_ALL)
         )
 
-    def gauge(self, key):
+    def gauge(self, key, value=None):
         logging.debug(
-            (Fore.CYAN + "[stats_logger] (gauge) " + f"{key}" + Style.RESET_ALL)
+            (Fore.CYAN + f"[stats_logger] (gauge) {key} | {value} " + Style.RESET_ALL)
         )
 
 
+def set_gauge(stats_logger: BaseStatsLogger, key: str, value) -> None:
+    """Set the value of a gauge, unless the stats logger doesn't support it, e.g.
+    custom stats loggers whose ``gauge`` takes no value"""
+    try:
+        stats_logger.gauge(key, value)
+    except (NotImplementedError, TypeError):
+        pass
+
+
 try:
     from statsd import StatsClient
 
@@ -91,9 +99,12 @@ try:
         def timing(self, key, value):
             self.client.timing(key, value)
 
-        def gauge(self, key):
-            # pylint: disable=no-value-for-parameter
-            self.client.gauge(key)
+        def gauge(self, key, value=None):
+            if value is None:
+                # pylint: disable=no-value-for-parameter
+                self.client.gauge(key)
+            else:
+                self.client.gauge(key, value)
 
 
 except Exception:  # pylint: disable=broad-except
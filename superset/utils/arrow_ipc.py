@@ -0,0 +1,153 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Encoding of SQL Lab results as Arrow IPC streams
+
+Columns Arrow can store natively are kept as is, strings being dictionary
+encoded. The others, nested values or mixed types that would need pickling, are
+stored as JSON encoded strings and listed in the ``superset.json_columns`` key
+of the schema metadata so they can be decoded when read back.
+"""
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import simplejson as json
+
+from superset.utils.core import json_iso_dttm_ser
+
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+# the format of the data of the results stored in the results backend
+ARROW_DATA_FORMAT = "arrow"
+JSON_COLUMNS_METADATA_KEY = b"superset.json_columns"
+
+
+def _json_encode(value):
+    if value is None:
+        return None
+    return json.dumps(value, default=json_iso_dttm_ser, ignore_nan=True)
+
+
+def _json_decode(value):
+    if not isinstance(value, str):
+        return None
+    return json.loads(value)
+
+
+def _to_arrow(series: pd.Series) -> Optional[pa.Array]:
+    """Converts a column to a flat Arrow array, None when it isn't possible"""
+    try:
+        array = pa.array(series, from_pandas=True)
+    except (pa.ArrowException, ValueError, TypeError, OverflowError):
+        return None
+    if pa.types.is_nested(array.type):
+        return None
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        array = array.dictionary_encode()
+    return array
+
+
+def dataframe_to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a dataframe into an Arrow table, without its index.
+
+    :param df: The dataframe
+    :returns: The table
+    """
+
+    arrays: List[pa.Array] = []
+    json_columns = []
+    for name, series in df.items():
+        array = _to_arrow(series)
+        if array is None:
+            json_columns.append(str(name))
+            array = pa.array(
+                [_json_encode(value) for value in series.astype(object)],
+                type=pa.string(),
+            )
+        arrays.append(array)
+    table = pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns])
+    if json_columns:
+        table = table.replace_schema_metadata(
+            {JSON_COLUMNS_METADATA_KEY: json.dumps(json_columns)}
+        )
+    return table
+
+
+def table_to_dataframe(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table written by ``dataframe_to_table`` into a dataframe.
+
+    :param table: The table
+    :returns: The dataframe
+    """
+
+    metadata = table.schema.metadata or {}
+    json_columns = set(
+        json.loads(metadata.get(JSON_COLUMNS_METADATA_KEY, b"[]").decode("utf-8"))
+    )
+    df = table.to_pandas(date_as_object=True)
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # dictionary encoded strings
+            series = series.astype(object).where(series.notna(), None)
+        if name in json_columns:
+            series = series.map(_json_decode)
+        df[name] = series
+    return df
+
+
+def serialize_table(table: pa.Table) -> bytes:
+    """Writes an Arrow table as an IPC stream"""
+    sink = pa.BufferOutputStream()
+    writer = pa.RecordBatchStreamWriter(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+def deserialize_table(data: bytes) -> pa.Table:
+    """Reads an Arrow table from an IPC stream"""
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+
+
+def serialize_dataframe(df: pd.DataFrame) -> bytes:
+    return serialize_table(dataframe_to_table(df))
+
+
+def deserialize_dataframe(data: bytes) -> pd.DataFrame:
+    return table_to_dataframe(deserialize_table(data))
+
+
+def concat_tables(tables: List[pa.Table]) -> pa.Table:
+    """
+    Concatenates the tables of consecutive results chunks.
+
+    The chunks are converted on their own, so their strings have different
+    dictionaries and a column may even have a different type from one chunk to
+    the other, e.g. when all its values are null in a chunk. The tables are
+    thus concatenated as dataframes and converted again.
+
+    :param tables: The tables, at least one
+    :returns: The concatenated table
+    """
+
+    if len(tables) == 1:
+        return tables[0]
+    return dataframe_to_table(
+        pd.concat([table_to_dataframe(table) for table in tables], ignore_index=True)
+    )
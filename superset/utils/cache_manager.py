@@ -14,11 +14,19 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
-from typing import Optional
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
 
 from flask import Flask
 from flask_caching import Cache
 
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger
+from superset.utils.cache_serialization import ChartDataCacheSerializer, get_serializer
+from superset.utils.dates import EPOCH
+from superset.utils.local_cache import LocalCache
+from superset.utils.single_flight import SingleFlight
+
 
 class CacheManager:
     def __init__(self) -> None:
@@ -26,12 +34,39 @@ class CacheManager:
 
         self._tables_cache = None
         self._cache = None
+        self._data_serializer: ChartDataCacheSerializer = get_serializer(None)
+        self._single_flight = SingleFlight()
+        self._local_cache = LocalCache()
+        self._compiled_query_cache = LocalCache()
+        self._stats_logger: BaseStatsLogger = DummyStatsLogger()
 
     def init_app(self, app):
         self._cache = self._setup_cache(app, app.config.get("CACHE_CONFIG"))
         self._tables_cache = self._setup_cache(
             app, app.config.get("TABLE_NAMES_CACHE_CONFIG")
         )
+        self._data_serializer = get_serializer(
+            app.config.get("CHART_DATA_CACHE_SERIALIZER"),
+            app.config.get("CHART_DATA_CACHE_COMPRESSION"),
+        )
+        self._single_flight = SingleFlight(
+            self._cache,
+            enabled=app.config.get("CHART_DATA_SINGLE_FLIGHT", False),
+            lock_timeout=app.config.get("CHART_DATA_SINGLE_FLIGHT_LOCK_TIMEOUT", 60),
+            wait_timeout=app.config.get("CHART_DATA_SINGLE_FLIGHT_WAIT_TIMEOUT", 30),
+            stats_logger=app.config.get("STATS_LOGGER"),
+        )
+        self._stats_logger = app.config.get("STATS_LOGGER") or DummyStatsLogger()
+        self._local_cache = LocalCache(
+            app.config.get("CHART_DATA_LOCAL_CACHE_MAX_BYTES", 0),
+            stats_logger=self._stats_logger,
+            stats_prefix="chart_data_cache.local",
+        )
+        self._compiled_query_cache = LocalCache(
+            app.config.get("SQLA_COMPILED_QUERY_CACHE_MAX_BYTES", 0),
+            stats_logger=self._stats_logger,
+            stats_prefix="compiled_query_cache",
+        )
 
     @staticmethod
     def _setup_cache(app: Flask, cache_config) -> Optional[Cache]:
@@ -54,3 +89,82 @@ class CacheManager:
     @property
     def cache(self):
         return self._cache
+
+    @property
+    def data_serializer(self) -> ChartDataCacheSerializer:
+        return self._data_serializer
+
+    @property
+    def single_flight(self) -> SingleFlight:
+        return self._single_flight
+
+    @property
+    def local_cache(self) -> LocalCache:
+        return self._local_cache
+
+    @property
+    def compiled_query_cache(self) -> LocalCache:
+        return self._compiled_query_cache
+
+    def get_chart_data(
+        self, key: str, timeout: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the chart data payload stored at a key, from the in-process cache if
+        enabled and then from the cache backend.
+
+        The payloads read from the backend are kept in the in-process cache until
+        `timeout` seconds after they were computed. A copy of the dataframe is
+        returned so callers can't alter the cached one.
+
+        :param key: The cache key
+        :param timeout: The timeout the payload was cached with
+        :returns: The deserialized payload
+        """
+
+        value = self._local_cache.get(key)
+        if value is None:
+            blob = self._cache.get(key) if self._cache else None
+            if not blob:
+                self._stats_logger.incr("chart_data_cache.remote.miss")
+                return None
+            self._stats_logger.incr("chart_data_cache.remote.hit")
+            value = self._data_serializer.loads(blob)
+            if self._local_cache.enabled:
+                expires_at = None
+                if timeout and value.get("dttm"):
+                    cached_dttm = datetime.strptime(value["dttm"], "%Y-%m-%dT%H:%M:%S")
+                    expires_at = (cached_dttm - EPOCH).total_seconds() + timeout
+                self._local_cache.set(key, value, expires_at=expires_at)
+        return _copy_payload(value)
+
+    def set_chart_data(
+        self, key: str, value: Dict[str, Any], timeout: Optional[int] = None
+    ) -> int:
+        """
+        Store a chart data payload in the cache backend and the in-process cache.
+
+        :param key: The cache key
+        :param value: The payload
+        :param timeout: The timeout, in seconds
+        :returns: The size of the serialized payload
+        """
+
+        blob = self._data_serializer.dumps(value)
+        if self._cache:
+            self._cache.set(key, blob, timeout=timeout)
+        if self._local_cache.enabled:
+            expires_at = time.time() + timeout if timeout else None
+            self._local_cache.set(key, _copy_payload(value), expires_at=expires_at)
+        return len(blob)
+
+    def delete_chart_data(self, key: str) -> None:
+        self._local_cache.delete(key)
+        if self._cache:
+            self._cache.delete(key)
+
+
+def _copy_payload(value: Dict[str, Any]) -> Dict[str, Any]:
+    if value.get("df") is None:
+        return dict(value)
+    return dict(value, df=value["df"].copy())
@@ -0,0 +1,154 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Serializers for the chart data payloads stored in the cache
+
+A chart data cache entry is a dict holding the ``df`` along with some
+metadata (``query``, ``dttm``). The pickle serializer is the legacy format,
+the Arrow serializer stores the frame as an Arrow IPC stream preceded by a
+small JSON header, optionally compressed with one of the codecs supported by
+pyarrow. ``loads`` sniffs the format of the blob so entries written by either
+serializer stay readable when switching from one to the other.
+"""
+import json
+import logging
+import pickle as pkl
+import struct
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+ARROW_MAGIC = b"SSARROW1"
+ARROW_COMPRESSION_CODECS = ("lz4", "zstd")
+_HEADER_LENGTH = struct.Struct("<I")
+
+logger = logging.getLogger(__name__)
+
+
+class ChartDataCacheSerializer:
+    """Base class for chart data cache serializers"""
+
+    name = "base"
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        raise NotImplementedError()
+
+    def loads(self, blob: bytes) -> Dict[str, Any]:
+        """Deserializes a blob, whichever serializer wrote it"""
+        if is_arrow_payload(blob):
+            return ArrowSerializer.loads_arrow(blob)
+        return pkl.loads(blob)
+
+
+class PickleSerializer(ChartDataCacheSerializer):
+    name = "pickle"
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        return pkl.dumps(value, protocol=pkl.HIGHEST_PROTOCOL)
+
+
+class ArrowSerializer(ChartDataCacheSerializer):
+    """Stores the ``df`` as an Arrow IPC stream
+
+    Blob layout: ``ARROW_MAGIC | header length (uint32) | JSON header | body``,
+    where the header holds every non-``df`` key of the cache value, the schema
+    of the frame and the compression settings of the body.
+    """
+
+    name = "arrow"
+
+    def __init__(self, compression: Optional[str] = None) -> None:
+        if compression and compression not in ARROW_COMPRESSION_CODECS:
+            raise ValueError(
+                "Unsupported chart data cache compression: {}".format(compression)
+            )
+        self.compression = compression
+
+    def dumps(self, value: Dict[str, Any]) -> bytes:
+        df = value.get("df")
+        header = {k: v for k, v in value.items() if k != "df"}
+        body = b""
+        if df is not None:
+            try:
+                table = pa.Table.from_pandas(df)
+            except (pa.ArrowException, TypeError, ValueError) as e:
+                # mixed object columns, nested types, ... keep the legacy format
+                logger.warning("Falling back to pickle for chart data cache: %s", e)
+                return PickleSerializer().dumps(value)
+            sink = pa.BufferOutputStream()
+            writer = pa.RecordBatchStreamWriter(sink, table.schema)
+            writer.write_table(table)
+            writer.close()
+            buf = sink.getvalue()
+            header["schema"] = [
+                {"name": field.name, "type": str(field.type)} for field in table.schema
+            ]
+            header["uncompressed_size"] = buf.size
+            if self.compression:
+                header["compression"] = self.compression
+                body = pa.compress(buf, codec=self.compression, asbytes=True)
+            else:
+                body = buf.to_pybytes()
+        header["has_df"] = df is not None
+        header_bytes = json.dumps(header).encode("utf-8")
+        return b"".join(
+            [ARROW_MAGIC, _HEADER_LENGTH.pack(len(header_bytes)), header_bytes, body]
+        )
+
+    @staticmethod
+    def loads_arrow(blob: bytes) -> Dict[str, Any]:
+        view = memoryview(blob)
+        offset = len(ARROW_MAGIC)
+        (header_length,) = _HEADER_LENGTH.unpack_from(view, offset)
+        offset += _HEADER_LENGTH.size
+        header = json.loads(bytes(view[offset : offset + header_length]))
+        offset += header_length
+
+        df: Optional[pd.DataFrame] = None
+        if header.pop("has_df"):
+            # wrapping the memoryview avoids copying the body out of the blob
+            body = pa.py_buffer(view[offset:])
+            compression = header.pop("compression", None)
+            if compression:
+                body = pa.decompress(
+                    body,
+                    decompressed_size=header["uncompressed_size"],
+                    codec=compression,
+                )
+            df = pa.ipc.open_stream(body).read_all().to_pandas()
+        header.pop("schema", None)
+        header.pop("uncompressed_size", None)
+        header["df"] = df
+        return header
+
+
+def is_arrow_payload(blob: Union[bytes, memoryview]) -> bool:
+    return bytes(blob[: len(ARROW_MAGIC)]) == ARROW_MAGIC
+
+
+def get_serializer(
+    serializer: Union[str, ChartDataCacheSerializer, None],
+    compression: Optional[str] = None,
+) -> ChartDataCacheSerializer:
+    """Instantiates the serializer referenced in the config"""
+    if isinstance(serializer, ChartDataCacheSerializer):
+        return serializer
+    if serializer == ArrowSerializer.name:
+        return ArrowSerializer(compression)
+    if serializer in (None, PickleSerializer.name):
+        return PickleSerializer()
+    raise ValueError("Unknown chart data cache serializer: {}".format(serializer))
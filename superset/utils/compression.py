@@ -0,0 +1,181 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Compression codecs of the payloads stored in the results backend
+
+A compressed payload starts with a header holding ``MAGIC``, the id of the
+codec and the size of the uncompressed payload. Blobs without the header were
+written before codecs could be configured and are zlib streams, which can't
+start with ``MAGIC``.
+"""
+import logging
+import struct
+import zlib
+from typing import Any, Dict, Optional, Type, Union
+
+import pyarrow as pa
+
+MAGIC = b"\x00SSC"
+_HEADER = struct.Struct("<4sBQ")
+
+logger = logging.getLogger(__name__)
+
+
+class CompressionCodec:
+    """Base class for the codecs of the results backend payloads"""
+
+    name = "base"
+    codec_id = -1
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data: Union[bytes, memoryview], size: int) -> bytes:
+        raise NotImplementedError()
+
+
+class NoCompressionCodec(CompressionCodec):
+    name = "none"
+    codec_id = 0
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: Union[bytes, memoryview], size: int) -> bytes:
+        return bytes(data)
+
+
+class ZlibCodec(CompressionCodec):
+    name = "zlib"
+    codec_id = 1
+
+    def compress(self, data: bytes) -> bytes:
+        level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+        return zlib.compress(data, level)
+
+    def decompress(self, data: Union[bytes, memoryview], size: int) -> bytes:
+        return zlib.decompress(data)
+
+
+class ArrowCodec(CompressionCodec):
+    """Codecs bundled with pyarrow
+
+    Compression levels need pyarrow's ``Codec``, available from pyarrow 2.0,
+    older versions compress at the default level of the codec.
+    """
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        super().__init__(level)
+        self._codec = None
+        if hasattr(pa, "Codec"):
+            self._codec = pa.Codec(self.name, compression_level=level)
+        elif level is not None:
+            logger.warning(
+                "The %s compression level requires pyarrow 2.0, using the default",
+                self.name,
+            )
+
+    def compress(self, data: bytes) -> bytes:
+        if self._codec:
+            return self._codec.compress(data, asbytes=True)
+        return pa.compress(data, codec=self.name, asbytes=True)
+
+    def decompress(self, data: Union[bytes, memoryview], size: int) -> bytes:
+        if self._codec:
+            return self._codec.decompress(data, decompressed_size=size, asbytes=True)
+        return pa.decompress(
+            data, decompressed_size=size, codec=self.name, asbytes=True
+        )
+
+
+class Lz4Codec(ArrowCodec):
+    name = "lz4"
+    codec_id = 2
+
+
+class ZstdCodec(ArrowCodec):
+    name = "zstd"
+    codec_id = 3
+
+
+CODECS: Dict[str, Type[CompressionCodec]] = {
+    codec.name: codec for codec in (NoCompressionCodec, ZlibCodec, Lz4Codec, ZstdCodec)
+}
+_CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+def get_codec(config: Any = None, level: Optional[int] = None) -> CompressionCodec:
+    """
+    Instantiates a codec from its configuration.
+
+    :param config: A codec, the name of a codec or a dict with its ``codec`` and
+        ``level``, zlib when None
+    :param level: The compression level when ``config`` is a name
+    :returns: The codec
+    """
+
+    if isinstance(config, CompressionCodec):
+        return config
+    if isinstance(config, dict):
+        config, level = config.get("codec"), config.get("level")
+    name = config or ZlibCodec.name
+    if name not in CODECS:
+        raise ValueError(f"Unknown results backend compression codec: {name}")
+    return CODECS[name](level)
+
+
+def compress(
+    data: Union[bytes, str], codec: Optional[CompressionCodec] = None
+) -> bytes:
+    """
+    Compresses a payload, prefixed by a header recording the codec.
+
+    :param data: The payload, strings are encoded in UTF-8
+    :param codec: The codec, zlib when None
+    :returns: The compressed payload
+    """
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    codec = codec or ZlibCodec()
+    header = _HEADER.pack(MAGIC, codec.codec_id, len(data))
+    return header + codec.compress(data)
+
+
+def decompress(blob: Union[bytes, str], decode: bool = True) -> Union[bytes, str]:
+    """
+    Decompresses a payload written by ``compress`` or ``zlib_compress``.
+
+    :param blob: The compressed payload
+    :param decode: Whether to decode the payload as UTF-8
+    :returns: The payload
+    """
+
+    if isinstance(blob, str):
+        blob = blob.encode("utf-8")
+    if blob[: len(MAGIC)] == MAGIC:
+        _, codec_id, size = _HEADER.unpack_from(blob)
+        codec = _CODECS_BY_ID.get(codec_id)
+        if codec is None:
+            raise ValueError(f"Unknown results backend compression codec: {codec_id}")
+        # slicing a memoryview avoids copying the compressed payload
+        data = codec().decompress(memoryview(blob)[_HEADER.size :], size)
+    else:
+        data = zlib.decompress(blob)
+    return data.decode("utf-8") if decode else data
@@ -24,9 +24,11 @@ import logging
 import os
 import signal
 import smtplib
+import threading
 import traceback
 import uuid
 import zlib
+from collections import OrderedDict
 from datetime import date, datetime, time, timedelta
 from email.mime.application import MIMEApplication
 from email.mime.image import MIMEImage
@@ -34,8 +36,19 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate
 from enum import Enum
-from time import struct_time
-from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+from time import monotonic, struct_time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 from urllib.parse import unquote_plus
 
 import bleach
@@ -46,7 +59,7 @@ import parsedatetime
 import sqlalchemy as sa
 from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta
-from flask import current_app, flash, g, Markup, render_template
+from flask import current_app, flash, g, has_app_context, Markup, render_template
 from flask_appbuilder.security.sqla.models import User
 from flask_babel import gettext as __, lazy_gettext as _
 from sqlalchemy import event, exc, select, Text
@@ -55,6 +68,7 @@ from sqlalchemy.sql.type_api import Variant
 from sqlalchemy.types import TEXT, TypeDecorator
 
 from superset.exceptions import SupersetException, SupersetTimeoutException
+from superset.stats_logger import set_gauge
 from superset.utils.dates import datetime_to_epoch, EPOCH
 
 try:
@@ -70,6 +84,9 @@ ADHOC_METRIC_EXPRESSION_TYPES = {"SIMPLE": "SIMPLE", "SQL": "SQL"}
 
 JS_MAX_INTEGER = 9007199254740991  # Largest int Java Script can handle 2^53-1
 
+# Default number of values kept by each memoized function
+MEMOIZED_MAX_SIZE = 1024
+
 sources = {"chart": 0, "dashboard": 1, "sql_lab": 2}
 
 try:
@@ -111,30 +128,99 @@ class _memoized:
 
     Define ``watch`` as a tuple of attribute names if this Decorator
     should account for instance variable changes.
+
+    The cache keeps the ``maxsize`` most recently used values, for at most
+    ``ttl`` seconds when set. ``on_evict`` is called with the values dropped
+    from the cache, e.g. to release their resources, and with the values
+    computed for arguments whose value another thread cached first.
     """
 
-    def __init__(self, func, watch=()):
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        func,
+        watch=(),
+        maxsize: Optional[int] = MEMOIZED_MAX_SIZE,
+        ttl: Optional[int] = None,
+        on_evict: Optional[Callable[[Any], None]] = None,
+    ):
         self.func = func
-        self.cache = {}
+        self.cache: "OrderedDict[tuple, Tuple[Any, Optional[float]]]" = OrderedDict()
         self.is_method = False
-        self.watch = watch
+        self.watch = watch or ()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.cache)
 
     def __call__(self, *args, **kwargs):
         key = [args, frozenset(kwargs.items())]
         if self.is_method:
             key.append(tuple([getattr(args[0], v, None) for v in self.watch]))
         key = tuple(key)
-        if key in self.cache:
-            return self.cache[key]
         try:
-            value = self.func(*args, **kwargs)
-            self.cache[key] = value
-            return value
+            hash(key)
         except TypeError:
             # uncachable -- for instance, passing a list as an argument.
             # Better to not cache than to blow up entirely.
             return self.func(*args, **kwargs)
 
+        evicted = []
+        discarded = []
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > monotonic():
+                    self.cache.move_to_end(key)
+                    return value
+                evicted.append(self.cache.pop(key)[0])
+        try:
+            value = self.func(*args, **kwargs)
+            expires_at = monotonic() + self.ttl if self.ttl else None
+            with self._lock:
+                entry = self.cache.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > monotonic()):
+                    # another thread cached a value meanwhile, which is kept
+                    self.cache.move_to_end(key)
+                    discarded.append(value)
+                    return entry[0]
+                if entry is not None:
+                    evicted.append(entry[0])
+                self.cache[key] = (value, expires_at)
+                while self.maxsize and len(self.cache) > self.maxsize:
+                    evicted.append(self.cache.popitem(last=False)[1][0])
+            return value
+        finally:
+            self._evicted(evicted)
+            self._release(discarded)
+
+    def _release(self, values: List[Any]) -> None:
+        if not self.on_evict:
+            return
+        for value in values:
+            try:
+                self.on_evict(value)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.warning("Could not release evicted value: %s", e)
+
+    def _evicted(self, values: List[Any]) -> None:
+        if not values:
+            return
+        self.evictions += len(values)
+        stats_logger = current_app.config["STATS_LOGGER"] if has_app_context() else None
+        if stats_logger:
+            for _ in values:
+                stats_logger.incr(f"memoized.{self.func.__qualname__}.eviction")
+        self._release(values)
+        if stats_logger:
+            set_gauge(
+                stats_logger, f"memoized.{self.func.__qualname__}.size", len(self)
+            )
+
     def __repr__(self):
         """Return the function's docstring."""
         return self.func.__doc__
@@ -146,13 +232,19 @@ class _memoized:
         return functools.partial(self.__call__, obj)
 
 
-def memoized(func=None, watch=None):
+def memoized(
+    func=None,
+    watch=None,
+    maxsize: Optional[int] = MEMOIZED_MAX_SIZE,
+    ttl: Optional[int] = None,
+    on_evict: Optional[Callable[[Any], None]] = None,
+):
     if func:
         return _memoized(func)
     else:
 
         def wrapper(f):
-            return _memoized(f, watch)
+            return _memoized(f, watch, maxsize, ttl, on_evict)
 
         return wrapper
 
@@ -1203,6 +1295,39 @@ def split(
     yield s[i:]
 
 
+def get_column_values(df: pd.DataFrame, columns: List[str]) -> List[List[Any]]:
+    """
+    Get the values of columns of a DataFrame as lists of Python objects, missing
+    values, e.g. NaN, being None.
+
+    :param df: The DataFrame
+    :param columns: The names of the columns
+    :return: The values of each column
+    """
+    values = []
+    for col in columns:
+        series = df[col].astype(object)
+        values.append(series.where(series.notnull(), None).tolist())
+    return values
+
+
+def group_by_prefix(rows: Iterable[Tuple]) -> "OrderedDict[Tuple, List]":
+    """
+    Group rows by all their values but the last one, e.g. to filter the rows of
+    a query result with one `IN` per group rather than a term per row.
+
+    >>> group_by_prefix([("a", 1), ("a", 2), ("b", 1)])
+    OrderedDict([(('a',), [1, 2]), (('b',), [1])])
+
+    :param rows: The rows, all of the same length
+    :return: The last values of the rows by the values before
+    """
+    groups: "OrderedDict[Tuple, List]" = OrderedDict()
+    for row in rows:
+        groups.setdefault(tuple(row[:-1]), []).append(row[-1])
+    return groups
+
+
 class TimeRangeEndpoint(str, Enum):
     """
     The time range endpoint types which represent inclusive, exclusive, or unknown.
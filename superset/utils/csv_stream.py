@@ -0,0 +1,120 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import itertools
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger
+from superset.utils.dates import now_as_float
+from superset.utils.local_cache import estimate_size
+
+
+def split_frame(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yields consecutive slices of at most ``chunk_rows`` rows of a dataframe
+
+    An empty dataframe is yielded as is, so its columns still make a header.
+    """
+    if df.empty or not chunk_rows:
+        yield df
+        return
+    for start in range(0, len(df.index), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def stream_csv(  # pylint: disable=too-many-arguments
+    frames: Iterable[pd.DataFrame],
+    index: Optional[bool] = False,
+    compress: bool = False,
+    stats_logger: Optional[BaseStatsLogger] = None,
+    stats_prefix: str = "csv_export",
+    **csv_kwargs: Any,
+) -> Iterator[bytes]:
+    """
+    Encode dataframes as a single CSV document, one dataframe at a time.
+
+    The first dataframe is fetched right away so errors, e.g. from running the
+    query the dataframes come from, are raised to the caller rather than in the
+    middle of the response. The header is taken from the first dataframe, which
+    may be empty. When compressing, the gzip stream is flushed after every
+    dataframe so each of them reaches the client as soon as it is encoded.
+
+    The time to the first byte, the total duration and the peak memory used by
+    a dataframe and its encoded CSV are sent as timings to the stats logger.
+
+    :param frames: The dataframes to export, all with the same columns
+    :param index: Whether to write the index, when None it is written unless
+        the first dataframe has a range index
+    :param compress: Whether to gzip the CSV
+    :param stats_logger: The stats logger
+    :param stats_prefix: The prefix of the stats keys
+    :param csv_kwargs: Arguments passed to ``DataFrame.to_csv``, see CSV_EXPORT
+    :returns: The chunks of the CSV document
+    """
+
+    start = now_as_float()
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        first = pd.DataFrame()
+    if index is None:
+        index = not isinstance(first.index, pd.RangeIndex)
+    return _stream_csv(
+        itertools.chain([first], frames),
+        start,
+        index,
+        compress,
+        stats_logger or DummyStatsLogger(),
+        stats_prefix,
+        csv_kwargs,
+    )
+
+
+def _stream_csv(  # pylint: disable=too-many-arguments
+    frames: Iterator[pd.DataFrame],
+    start: float,
+    index: bool,
+    compress: bool,
+    stats_logger: BaseStatsLogger,
+    stats_prefix: str,
+    csv_kwargs: dict,
+) -> Iterator[bytes]:
+    encoding = csv_kwargs.pop("encoding", None) or "utf-8"
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    peak_memory = 0
+    first_byte_sent = False
+    try:
+        for i, frame in enumerate(frames):
+            data = frame.to_csv(index=index, header=i == 0, **csv_kwargs).encode(
+                encoding
+            )
+            peak_memory = max(peak_memory, estimate_size(frame) + len(data))
+            if compressor:
+                data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                if not first_byte_sent:
+                    stats_logger.timing(
+                        f"{stats_prefix}.time_to_first_byte", now_as_float() - start
+                    )
+                    first_byte_sent = True
+                yield data
+        if compressor:
+            yield compressor.flush()
+    finally:
+        stats_logger.timing(f"{stats_prefix}.duration", now_as_float() - start)
+        stats_logger.timing(f"{stats_prefix}.peak_memory", peak_memory)
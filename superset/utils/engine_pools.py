@@ -0,0 +1,153 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger, set_gauge
+
+# the keys of the `connection_pool` database extra passed to create_engine
+POOL_PARAMS = ("pool_size", "max_overflow", "pool_recycle", "pool_timeout")
+
+
+def get_pool_params(pool_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the create_engine arguments of a `connection_pool` database extra"""
+    params = {key: pool_config[key] for key in POOL_PARAMS if key in pool_config}
+    params["pool_pre_ping"] = pool_config.get("pool_pre_ping", True)
+    return params
+
+
+def make_fork_safe(engine: Engine) -> None:
+    """Prevents connections opened by a process from being used by its forks
+
+    Connections are tagged with the pid of the process that opened them, and
+    the ones checked out from another process, e.g. a celery worker forked after
+    the pool was filled, are dropped without being closed so the connection of
+    the parent process stays usable. See "Using Connection Pools with
+    Multiprocessing" in the SQLAlchemy documentation.
+    """
+
+    @event.listens_for(engine, "connect")
+    def connect(  # pylint: disable=unused-argument,unused-variable
+        dbapi_connection, connection_record
+    ):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(  # pylint: disable=unused-argument,unused-variable
+        dbapi_connection, connection_record, connection_proxy
+    ):
+        pid = os.getpid()
+        if connection_record.info["pid"] != pid:
+            connection_record.connection = connection_proxy.connection = None
+            raise exc.DisconnectionError(
+                "Connection record belongs to pid {}, attempting to check out in "
+                "pid {}".format(connection_record.info["pid"], pid)
+            )
+
+
+class EnginePoolManager:
+    """Keeps the engines of the databases having a connection pool
+
+    Engines are keyed by everything that may change the connection, including
+    the effective user when impersonating, so pooled connections are never
+    shared between users. The number of pools is bounded by
+    DB_CONNECTION_POOL_MAX_COUNT, the least recently used engines being
+    disposed when it's reached.
+    """
+
+    def __init__(self) -> None:
+        self.max_count = 0
+        self.stats_logger: BaseStatsLogger = DummyStatsLogger()
+        self._lock = threading.Lock()
+        self._engines: "OrderedDict[Hashable, Engine]" = OrderedDict()
+
+    def init_app(self, app):
+        self.max_count = app.config["DB_CONNECTION_POOL_MAX_COUNT"]
+        self.stats_logger = app.config["STATS_LOGGER"]
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+    def get_engine(
+        self, key: Hashable, create_engine: Callable[[], Engine], stats_key: str
+    ) -> Engine:
+        """
+        Get the pooled engine of ``key``, creating it when needed.
+
+        :param key: The key of the engine
+        :param create_engine: Creates the engine
+        :param stats_key: The prefix of the gauges of the pool
+        :returns: The engine
+        """
+
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                return engine
+
+            engine = create_engine()
+            make_fork_safe(engine)
+            self._track(engine, stats_key)
+            self._engines[key] = engine
+            while self.max_count and len(self._engines) > self.max_count:
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+                self.stats_logger.incr("db_pool.eviction")
+            set_gauge(self.stats_logger, "db_pool.count", len(self._engines))
+            return engine
+
+    def dispose(self, key: Optional[Hashable] = None) -> None:
+        """Disposes the engine of ``key``, or all the engines"""
+        with self._lock:
+            if key is None:
+                engines = list(self._engines.values())
+                self._engines.clear()
+            else:
+                engine = self._engines.pop(key, None)
+                engines = [engine] if engine else []
+            set_gauge(self.stats_logger, "db_pool.count", len(self._engines))
+        for engine in engines:
+            engine.dispose()
+
+    def _track(self, engine: Engine, stats_key: str) -> None:
+        # only queue pools count their checked out and overflow connections, unlike
+        # e.g. the pools of SQLite file databases or a `poolclass` of the extra
+        if not isinstance(engine.pool, QueuePool):
+            return
+        stats_logger = self.stats_logger
+
+        def report(checked_out: int) -> None:
+            set_gauge(stats_logger, f"{stats_key}.checked_out", checked_out)
+            set_gauge(
+                stats_logger, f"{stats_key}.overflow", max(engine.pool.overflow(), 0)
+            )
+
+        @event.listens_for(engine, "checkout")
+        def checkout(*args):  # pylint: disable=unused-argument,unused-variable
+            report(engine.pool.checkedout())
+
+        @event.listens_for(engine, "checkin")
+        def checkin(*args):  # pylint: disable=unused-argument,unused-variable
+            # the connection is returned to the pool after the checkin event
+            report(engine.pool.checkedout() - 1)
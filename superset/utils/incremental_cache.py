@@ -0,0 +1,84 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Helpers for the incremental caching of time series chart data
+
+The time range of a query is split into chunks of a fixed duration aligned on
+the epoch. As long as the chunk duration is a multiple of the time grain, every
+time bucket returned by the database falls in a single chunk, so the rows of a
+chunk don't depend on the rest of the time range and can be cached on their own
+and stitched back together.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from superset.utils.dates import EPOCH
+
+# time grains with a fixed duration, i.e. not weeks, months, quarters or years
+FIXED_TIME_GRAINS: Dict[str, timedelta] = {
+    "PT1S": timedelta(seconds=1),
+    "PT1M": timedelta(minutes=1),
+    "PT5M": timedelta(minutes=5),
+    "PT10M": timedelta(minutes=10),
+    "PT15M": timedelta(minutes=15),
+    "PT0.5H": timedelta(minutes=30),
+    "PT1H": timedelta(hours=1),
+    "P1D": timedelta(days=1),
+}
+
+
+def get_chunk_duration(
+    time_grain: Optional[str], chunk_duration: timedelta
+) -> Optional[timedelta]:
+    """
+    Get the duration of the chunks the data of a time grain can be cached in.
+
+    :param time_grain: The ISO 8601 duration of the time grain
+    :param chunk_duration: The preferred chunk duration
+    :returns: The chunk duration, None if the time grain has no fixed duration
+    """
+
+    grain = FIXED_TIME_GRAINS.get(time_grain or "")
+    if not grain:
+        return None
+    if chunk_duration < grain or chunk_duration % grain:
+        return grain
+    return chunk_duration
+
+
+def split_time_range(
+    from_dttm: datetime, to_dttm: datetime, chunk_duration: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Split the [from_dttm, to_dttm) time range at the chunk boundaries.
+
+    The first and last pieces are shorter than a chunk when the time range bounds
+    are not aligned on the chunk boundaries.
+
+    :param from_dttm: The start of the time range, inclusive
+    :param to_dttm: The end of the time range, exclusive
+    :param chunk_duration: The chunk duration
+    :returns: The [start, end) pieces of the time range
+    """
+
+    pieces = []
+    start = from_dttm
+    while start < to_dttm:
+        boundary = EPOCH + ((start - EPOCH) // chunk_duration + 1) * chunk_duration
+        end = min(boundary, to_dttm)
+        pieces.append((start, end))
+        start = end
+    return pieces
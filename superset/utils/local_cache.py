@@ -0,0 +1,120 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import pandas as pd
+
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger
+
+
+def estimate_size(value: Any) -> int:
+    """Estimates the memory used by a value, in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """In-process LRU cache bounded by the size of its values in bytes
+
+    Values are kept as is, the cache is disabled when ``max_bytes`` is 0.
+    Entries expire at the time given when setting them, and the least recently
+    used entries are evicted when adding a value would exceed ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 0,
+        stats_logger: Optional[BaseStatsLogger] = None,
+        stats_prefix: str = "local_cache",
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.stats_logger = stats_logger or DummyStatsLogger()
+        self.stats_prefix = stats_prefix
+        self.size = 0
+        self._lock = threading.Lock()
+        # key -> (value, size, expiration timestamp)
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = (
+            OrderedDict()
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.time():
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.stats_logger.incr(f"{self.stats_prefix}.miss")
+                return None
+            self._entries.move_to_end(key)
+        self.stats_logger.incr(f"{self.stats_prefix}.hit")
+        return entry[0]
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expires_at: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes or (
+                expires_at is not None and expires_at <= time.time()
+            ):
+                return
+            while self.size + size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.stats_logger.incr(f"{self.stats_prefix}.eviction")
+            self._entries[key] = (value, size, expires_at)
+            self.size += size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
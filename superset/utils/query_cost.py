@@ -0,0 +1,322 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Admission control of queries based on the cost estimated by their engine"""
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import simplejson as json
+
+from superset.exceptions import SupersetException
+from superset.sql_parse import ParsedQuery
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger
+from superset.utils.core import sources
+
+ALLOW = "allow"
+DEPRIORITIZE = "deprioritize"
+REJECT = "reject"
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCostExceededException(SupersetException):
+    status = 403
+
+
+class QueryCostGuard:
+    """Checks the estimated cost of queries against budgets before they run
+
+    Budgets map the cost metrics of an engine, e.g. ``cpuCost`` for Presto, to
+    their maximum. They are set per role with QUERY_COST_BUDGETS_BY_ROLE, a user
+    getting the most generous budget of their roles, roles without a budget
+    being unlimited, and per database with the ``query_cost_budget`` key of its
+    extra, capping the budget of every user.
+
+    Queries over budget are either rejected or deprioritized, depending on
+    QUERY_COST_GUARD_ACTION. Deprioritized asynchronous SQL Lab queries are sent
+    to the QUERY_COST_GUARD_DEPRIORITIZED_QUEUE Celery queue, whose workers cap
+    how many of them run, while other deprioritized queries wait for one of the
+    QUERY_COST_GUARD_DEPRIORITIZED_CONCURRENCY slots of their database in the
+    process. Slots only limit processes running queries in several threads, e.g.
+    threaded web servers. Estimates are cached per normalized SQL, so that
+    checking a query again doesn't hit the database.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.action = REJECT
+        self.role_budgets: Dict[str, Dict[str, float]] = {}
+        self.deprioritized_concurrency = 1
+        self.deprioritized_queue: Optional[str] = None
+        self.cache_timeout = 3600
+        self.stats_logger: BaseStatsLogger = DummyStatsLogger()
+        self._cache = None
+        self._lock = threading.Lock()
+        self._semaphores: Dict[Tuple[int, int], threading.BoundedSemaphore] = {}
+
+    def init_app(self, app, cache=None):
+        self.enabled = app.config["QUERY_COST_GUARD_ENABLED"]
+        self.action = app.config["QUERY_COST_GUARD_ACTION"]
+        if self.action not in (DEPRIORITIZE, REJECT):
+            raise ValueError(f"Unknown query cost guard action: {self.action}")
+        self.role_budgets = app.config["QUERY_COST_BUDGETS_BY_ROLE"]
+        self.deprioritized_concurrency = app.config[
+            "QUERY_COST_GUARD_DEPRIORITIZED_CONCURRENCY"
+        ]
+        self.deprioritized_queue = app.config["QUERY_COST_GUARD_DEPRIORITIZED_QUEUE"]
+        self.cache_timeout = app.config["QUERY_COST_ESTIMATE_CACHE_TIMEOUT"]
+        self.stats_logger = app.config["STATS_LOGGER"]
+        self._cache = cache
+
+    def get_budget(self, database, user=None) -> Dict[str, float]:
+        """
+        Get the budget of the queries of a user against a database.
+
+        :param database: The database
+        :param user: The user running the query, None when unknown
+        :returns: The maximum of each cost metric, empty when unlimited
+        """
+
+        role_names = [role.name for role in getattr(user, "roles", None) or []]
+        budget: Dict[str, float] = {}
+        # roles without a budget are unlimited, as is any user having one
+        if role_names and all(name in self.role_budgets for name in role_names):
+            role_budgets = [self.role_budgets[name] for name in role_names]
+            # a metric missing from the budget of one of the roles is unlimited
+            metrics = set.intersection(*(set(b) for b in role_budgets))
+            budget = {
+                metric: max(b[metric] for b in role_budgets) for metric in metrics
+            }
+        for metric, limit in database.get_extra().get("query_cost_budget", {}).items():
+            budget[metric] = min(limit, budget.get(metric, limit))
+        return budget
+
+    @staticmethod
+    def _cache_key(database, schema: Optional[str], sql: str) -> str:
+        statements = [
+            ParsedQuery(statement).normalized()
+            for statement in ParsedQuery(sql).get_statements()
+        ]
+        json_data = json.dumps(
+            {"database_id": database.id, "schema": schema, "sql": statements},
+            sort_keys=True,
+        )
+        return "query_cost/" + hashlib.md5(json_data.encode("utf-8")).hexdigest()
+
+    def estimate(
+        self,
+        database,
+        schema: Optional[str],
+        sql: str,
+        user_name: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> Optional[Dict[str, float]]:
+        """
+        Estimate the cost of a query, from the cache when it was estimated before.
+
+        :param database: The database
+        :param schema: The schema
+        :param sql: The SQL, possibly made of multiple statements
+        :param user_name: The effective user
+        :param source: The source of the query, e.g. "sql_lab"
+        :returns: The cost metrics of the query, None when it can't be estimated
+        """
+
+        key = self._cache_key(database, schema, sql)
+        if self._cache is not None:
+            cost = self._cache.get(key)
+            if cost is not None:
+                self.stats_logger.incr("query_cost.estimate.cache_hit")
+                return cost
+
+        db_engine_spec = database.db_engine_spec
+        try:
+            raw_cost = db_engine_spec.estimate_query_cost(
+                database,
+                schema,
+                sql,
+                sources.get(source) if source else None,
+                user_name=user_name,
+            )
+            cost = db_engine_spec.get_cost_metrics(raw_cost)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Could not estimate the cost of the query: {e}")
+            self.stats_logger.incr("query_cost.estimate.error")
+            return None
+
+        self.stats_logger.incr("query_cost.estimate.cache_miss")
+        if self._cache is not None:
+            self._cache.set(key, cost, timeout=self.cache_timeout)
+        return cost
+
+    def _exceeded_budget(
+        self,
+        database,
+        schema: Optional[str],
+        sql: str,
+        user=None,
+        source: Optional[str] = None,
+    ) -> Optional[Dict[str, Tuple[float, float]]]:
+        """Get the estimated cost and the budget of the metrics of a query over
+        budget, None when it isn't checked"""
+        if not self.enabled:
+            return None
+        version = database.get_extra().get("version")
+        if not database.db_engine_spec.get_allow_cost_estimate(version):
+            return None
+        budget = self.get_budget(database, user)
+        if not budget:
+            return None
+
+        cost = self.estimate(
+            database, schema, sql, getattr(user, "username", None), source
+        )
+        return {
+            metric: (cost[metric], limit)
+            for metric, limit in budget.items()
+            if cost and metric in cost and cost[metric] > limit
+        }
+
+    def check(
+        self,
+        database,
+        schema: Optional[str],
+        sql: str,
+        user=None,
+        source: Optional[str] = None,
+    ) -> str:
+        """
+        Decide whether a query may run, raising when it's rejected.
+
+        Queries are allowed when their cost can't be estimated.
+
+        :param database: The database
+        :param schema: The schema
+        :param sql: The SQL, possibly made of multiple statements
+        :param user: The user running the query, None when unknown
+        :param source: The source of the query, e.g. "sql_lab"
+        :returns: ``ALLOW`` or ``DEPRIORITIZE``
+        :raises QueryCostExceededException: When the query is rejected
+        """
+
+        exceeded = self._exceeded_budget(database, schema, sql, user, source)
+        if exceeded is None:
+            return ALLOW
+        decision = self.action if exceeded else ALLOW
+        self.stats_logger.incr(f"query_cost.{source or 'unknown'}.{decision}")
+        if decision == REJECT:
+            details = ", ".join(
+                f"{metric} {value:g} > {limit:g}"
+                for metric, (value, limit) in sorted(exceeded.items())
+            )
+            raise QueryCostExceededException(
+                f"The estimated cost of the query exceeds its budget: {details}"
+            )
+        return decision
+
+    def get_queue(
+        self,
+        database,
+        schema: Optional[str],
+        sql: str,
+        user=None,
+        source: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Get the Celery queue of an asynchronous query, before it's sent.
+
+        The decision is made again, and logged, by the worker running the query,
+        from the cached estimate. Queries that are rejected are sent to the
+        default queue, to be rejected by the worker.
+
+        :returns: QUERY_COST_GUARD_DEPRIORITIZED_QUEUE for deprioritized queries,
+            None for the default queue
+        """
+
+        if self.action != DEPRIORITIZE or not self.deprioritized_queue:
+            return None
+        if self._exceeded_budget(database, schema, sql, user, source):
+            return self.deprioritized_queue
+        return None
+
+    def get_semaphore(self, database) -> threading.BoundedSemaphore:
+        """Get the process wide semaphore of the deprioritized queries of a
+        database"""
+        # the cap is part of the key so that editing it takes effect right away
+        key = (database.id, self.deprioritized_concurrency)
+        with self._lock:
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(
+                    max(self.deprioritized_concurrency, 1)
+                )
+            return self._semaphores[key]
+
+    @contextmanager
+    def slot(self, database, decision: str) -> Iterator[None]:
+        """Wait for a slot of the database of a query when it's deprioritized"""
+        if decision != DEPRIORITIZE:
+            yield
+            return
+        with self.get_semaphore(database):
+            yield
+
+    @contextmanager
+    def admit(
+        self,
+        database,
+        schema: Optional[str],
+        sql: str,
+        user=None,
+        source: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Run a query once it's admitted, see ``check`` and ``slot``.
+
+        :raises QueryCostExceededException: When the query is rejected
+        """
+
+        decision = self.check(database, schema, sql, user, source)
+        with self.slot(database, decision):
+            yield decision
+
+
+def sum_cost_metrics(
+    costs: List[Dict[str, Any]], maximum: Optional[List[str]] = None
+) -> Dict[str, float]:
+    """
+    Aggregate the cost metrics of the statements of a query.
+
+    :param costs: The cost metrics of each statement
+    :param maximum: The metrics aggregated with their maximum rather than summed,
+        e.g. the peak memory
+    :returns: The cost metrics of the query
+    """
+
+    totals: Dict[str, float] = {}
+    for cost in costs:
+        for metric, value in cost.items():
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if metric in totals and maximum and metric in maximum:
+                totals[metric] = max(totals[metric], value)
+            else:
+                totals[metric] = totals.get(metric, 0.0) + value
+    return totals
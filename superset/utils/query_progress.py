@@ -0,0 +1,171 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import threading
+from time import monotonic
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger, set_gauge
+from superset.utils.core import QueryStatus
+
+# the cache types whose entries are seen by every process, i.e. by the web
+# servers requesting stops as well as by the workers running the queries
+SHARED_CACHE_TYPES = frozenset(
+    ["memcached", "redis", "saslmemcached", "spreadsaslmemcached"]
+)
+
+
+def poll_intervals(
+    initial: float, maximum: float, factor: float = 2.0
+) -> Iterator[float]:
+    """
+    Yields the delays between consecutive polls of a running query, growing
+    exponentially from ``initial`` up to ``maximum`` seconds.
+
+    :param initial: The first delay
+    :param maximum: The maximum delay
+    :param factor: The growth factor of the delays
+    :returns: The delays, forever
+    """
+
+    interval = min(initial, maximum)
+    while True:
+        yield interval
+        interval = min(interval * factor, maximum)
+
+
+class QueryProgressReporter:
+    """Coalesces the progress of the queries running in a worker
+
+    Engine specs polling a cursor report the progress and tracking URL of their
+    query here rather than committing them to the metadata database on every
+    poll. Pending updates of all the queries of the worker are written in a
+    single transaction at most every SQLLAB_PROGRESS_FLUSH_INTERVAL seconds.
+
+    Stop requests are signaled through a flag in the cache, which is checked
+    on every poll, while the status of the query in the metadata database is
+    only checked every SQLLAB_STOP_CHECK_INTERVAL seconds. Unless the cache is
+    shared across processes, e.g. redis or memcached, the workers can't see the
+    flags set by the web servers and the status is checked on every poll instead.
+    """
+
+    def __init__(self) -> None:
+        self.flush_interval = 1.0
+        self.stop_check_interval = 10.0
+        self.stats_logger: BaseStatsLogger = DummyStatsLogger()
+        self._cache = None
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+        self._last_flush = monotonic()
+        self._last_stop_checks: Dict[int, float] = {}
+
+    def init_app(self, app, cache=None):
+        self.flush_interval = app.config["SQLLAB_PROGRESS_FLUSH_INTERVAL"]
+        # stops are only noticed through the metadata database without a cache
+        # shared with the web servers
+        cache_type = (app.config.get("CACHE_CONFIG") or {}).get("CACHE_TYPE")
+        self.stop_check_interval = (
+            app.config["SQLLAB_STOP_CHECK_INTERVAL"]
+            if cache is not None and cache_type in SHARED_CACHE_TYPES
+            else 0
+        )
+        self.stats_logger = app.config["STATS_LOGGER"]
+        self._cache = cache
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def report(self, query, **values: Any) -> None:
+        """
+        Record values to write to a query, the progress only ever increases.
+
+        :param query: The query
+        :param values: The values of the columns of the query to update
+        """
+
+        with self._lock:
+            pending = self._pending.setdefault((type(query), query.id), {})
+            progress = values.pop("progress", None)
+            if progress is not None and progress > pending.get(
+                "progress", query.progress or 0
+            ):
+                pending["progress"] = progress
+            pending.update(values)
+
+    def flush(self, session, force: bool = False) -> None:
+        """
+        Write the pending updates of all the queries of the worker.
+
+        :param session: The session of the metadata database
+        :param force: Whether to write the updates before the flush interval
+            has elapsed since the last write
+        """
+
+        with self._lock:
+            if not self._pending or (
+                not force and monotonic() - self._last_flush < self.flush_interval
+            ):
+                return
+            pending, self._pending = self._pending, {}
+            self._last_flush = monotonic()
+
+        for (model, query_id), values in pending.items():
+            if values:
+                session.query(model).filter(model.id == query_id).update(
+                    values, synchronize_session=False
+                )
+        session.commit()
+        set_gauge(self.stats_logger, "sqllab.progress.flushed", len(pending))
+
+    @staticmethod
+    def stop_key(query_id: int) -> str:
+        return f"sqllab_stop_query/{query_id}"
+
+    def request_stop(self, query_id: int, timeout: Optional[int] = None) -> None:
+        """Signal the worker running a query that it should be stopped"""
+        if self._cache:
+            self._cache.set(self.stop_key(query_id), True, timeout=timeout)
+
+    def is_stopped(self, query, session) -> bool:
+        """
+        Whether a query was requested to stop, checking the cache flag first and
+        the status of the query in the metadata database every once in a while.
+
+        :param query: The query
+        :param session: The session of the metadata database
+        :returns: Whether the query should be stopped
+        """
+
+        if self._cache and self._cache.get(self.stop_key(query.id)):
+            self._last_stop_checks.pop(query.id, None)
+            return True
+
+        now = monotonic()
+        last_check = self._last_stop_checks.get(query.id)
+        if last_check is not None and now - last_check < self.stop_check_interval:
+            return False
+        self._last_stop_checks[query.id] = now
+        model = type(query)
+        (status,) = session.query(model.status).filter(model.id == query.id).one()
+        if status in (QueryStatus.STOPPED, QueryStatus.TIMED_OUT):
+            self._last_stop_checks.pop(query.id, None)
+            return True
+        return False
+
+    def done(self, query, session) -> None:
+        """Write the pending updates once a query stopped being polled"""
+        self._last_stop_checks.pop(query.id, None)
+        self.flush(session, force=True)
@@ -0,0 +1,80 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Helpers for storing SQL Lab results in the results backend as chunks
+
+Large results are split into groups of consecutive rows that are serialized and
+compressed on their own and stored under keys derived from the results key. The
+results key itself holds a manifest: the payload without its data, along with
+the number of rows of each chunk under ``chunks``. Readers can then fetch only
+the chunks overlapping the rows they need.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def chunk_key(key: str, index: int) -> str:
+    return f"{key}/chunk/{index}"
+
+
+def is_chunked(payload: Dict[str, Any]) -> bool:
+    return "chunks" in payload
+
+
+def split_rows(row_count: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    """
+    Split ``row_count`` rows in [start, end) chunks of at most ``chunk_rows`` rows.
+
+    :param row_count: The number of rows
+    :param chunk_rows: The maximum number of rows of a chunk
+    :returns: The [start, end) row ranges of the chunks
+    """
+
+    return [
+        (start, min(start + chunk_rows, row_count))
+        for start in range(0, row_count, chunk_rows)
+    ]
+
+
+def locate_rows(
+    chunk_sizes: List[int], offset: int = 0, limit: Optional[int] = None
+) -> List[Tuple[int, int, int]]:
+    """
+    Find the chunks holding the rows [offset, offset + limit).
+
+    :param chunk_sizes: The number of rows of each chunk
+    :param offset: The first row to read
+    :param limit: The maximum number of rows to read, all the rows when None
+    :returns: The index of each chunk to read along with the [start, end) rows
+        to read from it
+    """
+
+    end = None if limit is None else offset + limit
+    locations = []
+    chunk_start = 0
+    for index, size in enumerate(chunk_sizes):
+        chunk_end = chunk_start + size
+        if end is not None and chunk_start >= end:
+            break
+        if chunk_end > offset:
+            locations.append(
+                (
+                    index,
+                    max(offset - chunk_start, 0),
+                    size if end is None else min(end - chunk_start, size),
+                )
+            )
+        chunk_start = chunk_end
+    return locations
@@ -0,0 +1,131 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from contextlib2 import contextmanager
+
+from superset.stats_logger import BaseStatsLogger, DummyStatsLogger
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same cache key
+
+    When a cache key misses, the first caller becomes the leader and computes
+    the value while the others wait for it to show up in the cache instead of
+    running the same query. Callers in the same process wait on an event, and
+    callers in other processes wait on a lock key stored in the cache backend
+    through its atomic ``add``. Locks expire after ``lock_timeout`` seconds so
+    a crashed leader never blocks a key for good, and waiters give up after
+    ``wait_timeout`` seconds and compute the value themselves.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        cache: Any = None,
+        enabled: bool = False,
+        lock_timeout: int = 60,
+        wait_timeout: int = 30,
+        poll_interval: float = 0.1,
+        stats_logger: Optional[BaseStatsLogger] = None,
+    ) -> None:
+        self.cache = cache
+        self.enabled = enabled
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.stats_logger = stats_logger or DummyStatsLogger()
+        self._mutex = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+
+    @staticmethod
+    def lock_key(key: str) -> str:
+        return f"single_flight/{key}"
+
+    @contextmanager
+    def flight(self, key: Optional[str]) -> Iterator[bool]:
+        """Context manager around the computation of the value of ``key``
+
+        Yields ``True`` when the caller waited for another worker to compute
+        the value, in which case it should be read back from the cache, and
+        ``False`` when the caller is expected to compute it.
+        """
+        if not self.enabled or not self.cache or not key:
+            yield False
+            return
+
+        with self._mutex:
+            event = self._inflight.get(key)
+            is_local_leader = event is None
+            if event is None:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if not is_local_leader:
+            yield self._wait_local(event)
+            return
+
+        has_lock = False
+        try:
+            has_lock = self._acquire(key)
+            if has_lock:
+                self.stats_logger.incr("single_flight.leader")
+                yield False
+            else:
+                yield self._wait_remote(key)
+        finally:
+            if has_lock:
+                self._release(key)
+            with self._mutex:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _acquire(self, key: str) -> bool:
+        try:
+            return bool(self.cache.add(self.lock_key(key), 1, self.lock_timeout))
+        except Exception as e:  # pylint: disable=broad-except
+            # the backend being down shouldn't prevent charts from loading
+            logger.warning("Could not acquire single flight lock: %s", e)
+            return True
+
+    def _release(self, key: str) -> None:
+        try:
+            self.cache.delete(self.lock_key(key))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Could not release single flight lock: %s", e)
+
+    def _wait_local(self, event: threading.Event) -> bool:
+        if event.wait(self.wait_timeout):
+            self.stats_logger.incr("single_flight.coalesced_wait")
+            return True
+        self.stats_logger.incr("single_flight.wait_timeout")
+        return False
+
+    def _wait_remote(self, key: str) -> bool:
+        deadline = time.time() + self.wait_timeout
+        lock_key = self.lock_key(key)
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            if self.cache.get(lock_key) is None:
+                self.stats_logger.incr("single_flight.coalesced_wait")
+                return True
+        self.stats_logger.incr("single_flight.wait_timeout")
+        return False
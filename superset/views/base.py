@@ -18,11 +18,22 @@ import functools
 import logging
 import traceback
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Optional
 
+import pandas as pd
 import simplejson as json
 import yaml
-from flask import abort, flash, g, get_flashed_messages, redirect, Response, session
+from flask import (
+    abort,
+    flash,
+    g,
+    get_flashed_messages,
+    redirect,
+    request,
+    Response,
+    session,
+    stream_with_context,
+)
 from flask_appbuilder import BaseView, Model, ModelView
 from flask_appbuilder.actions import action
 from flask_appbuilder.forms import DynamicForm
@@ -39,6 +50,7 @@ from superset import appbuilder, conf, db, get_feature_flags, security_manager
 from superset.exceptions import SupersetException, SupersetSecurityException
 from superset.translations.utils import get_language_pack
 from superset.utils import core as utils
+from superset.utils.csv_stream import stream_csv
 
 FRONTEND_CONF_KEYS = (
     "SUPERSET_WEBSERVER_TIMEOUT",
@@ -381,6 +393,38 @@ class CsvResponse(Response):  # pylint: disable=too-many-ancestors
     charset = conf["CSV_EXPORT"].get("encoding", "utf-8")
 
 
+def csv_stream_response(  # pylint: disable=too-many-arguments
+    frames: Iterable[pd.DataFrame],
+    filename: Optional[str] = None,
+    index: Optional[bool] = False,
+    mimetype: str = "application/csv",
+    stats_prefix: str = "csv_export",
+) -> Response:
+    """Streams dataframes to the client as a CSV file
+
+    The CSV is gzipped when CSV_EXPORT_GZIP is enabled and the client accepts it.
+    """
+    compress = bool(conf["CSV_EXPORT_GZIP"]) and "gzip" in request.accept_encodings
+    csv = stream_csv(
+        frames,
+        index=index,
+        compress=compress,
+        stats_logger=conf["STATS_LOGGER"],
+        stats_prefix=stats_prefix,
+        **conf["CSV_EXPORT"],
+    )
+    response = CsvResponse(
+        stream_with_context(csv),
+        status=200,
+        headers=generate_download_headers("csv", filename),
+        mimetype=mimetype,
+    )
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+    return response
+
+
 def check_ownership(obj, raise_if_false=True):
     """Meant to be used in `pre_update` hooks on models to enforce ownership
 
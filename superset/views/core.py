@@ -18,10 +18,11 @@
 import logging
 import os
 import re
+from concurrent.futures import as_completed, ThreadPoolExecutor
 from contextlib import closing
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, cast, Dict, List, Optional, Union
+from typing import Any, cast, Dict, Iterator, List, Optional, Tuple, Union
 from urllib import parse
 
 import backoff
@@ -31,6 +32,7 @@ import pyarrow as pa
 import simplejson as json
 from flask import (
     abort,
+    copy_current_request_context,
     flash,
     g,
     Markup,
@@ -38,6 +40,7 @@ from flask import (
     render_template,
     request,
     Response,
+    stream_with_context,
     url_for,
 )
 from flask_appbuilder import expose
@@ -78,12 +81,20 @@ from superset.exceptions import (
     SupersetSecurityException,
     SupersetTimeoutException,
 )
+from superset.extensions import query_cost_guard, query_progress_reporter
 from superset.jinja_context import get_template_processor
 from superset.models.sql_lab import Query, TabState
 from superset.models.user_attributes import UserAttribute
 from superset.sql_parse import ParsedQuery
 from superset.sql_validators import get_validator_by_name
-from superset.utils import core as utils, dashboard_import_export
+from superset.utils import (
+    arrow_ipc,
+    compression,
+    core as utils,
+    dashboard_import_export,
+    results_chunks,
+)
+from superset.utils.csv_stream import split_frame
 from superset.utils.dates import now_as_float
 from superset.utils.decorators import etag_cache, stats_timing
 
@@ -93,10 +104,9 @@ from .base import (
     BaseSupersetView,
     check_ownership,
     common_bootstrap_payload,
-    CsvResponse,
+    csv_stream_response,
     data_payload_response,
     DeleteMixin,
-    generate_download_headers,
     get_error_msg,
     get_user_roles,
     handle_api_exception,
@@ -110,9 +120,11 @@ from .database import views as in_views
 from .utils import (
     apply_display_max_row_limit,
     bootstrap_user_data,
+    get_database_semaphore,
     get_datasource_info,
     get_form_data,
     get_viz,
+    process_form_data,
 )
 
 config = app.config
@@ -224,11 +236,15 @@ def _deserialize_results_payload(
             "sqllab.query.results_backend_msgpack_deserialize", stats_logger
         ):
             ds_payload = msgpack.loads(payload, raw=False)
+        if results_chunks.is_chunked(ds_payload):
+            # the data is read from the chunks by the caller
+            return ds_payload
 
         with stats_timing("sqllab.query.results_backend_pa_deserialize", stats_logger):
-            df = pa.deserialize(ds_payload["data"])
+            df = _deserialize_results_data(
+                ds_payload["data"], ds_payload.get("data_format")
+            )
 
-        # TODO: optimize this, perhaps via df.to_dict, then traversing
         ds_payload["data"] = dataframe.SupersetDataFrame.format_data(df) or []
 
         db_engine_spec = query.database.db_engine_spec
@@ -247,6 +263,138 @@ def _deserialize_results_payload(
             return json.loads(payload)  # type: ignore
 
 
+def _deserialize_results_data(data: bytes, data_format: Optional[str]) -> pd.DataFrame:
+    """Deserializes the data of results stored with msgpack, as an Arrow IPC
+    stream or, for results stored by older versions, with pyarrow's
+    deprecated serialization"""
+    if data_format == arrow_ipc.ARROW_DATA_FORMAT:
+        return arrow_ipc.deserialize_dataframe(data)
+    return pa.deserialize(data)
+
+
+def _deserialize_results_chunk(
+    blob: bytes, use_msgpack: Optional[bool] = False, data_format: Optional[str] = None
+) -> Union[pd.DataFrame, list]:
+    payload = compression.decompress(blob, decode=not use_msgpack)
+    if use_msgpack:
+        data = msgpack.loads(payload, raw=False)["data"]
+        return _deserialize_results_data(data, data_format)
+    return json.loads(payload)["data"]
+
+
+def _read_results_chunks(  # pylint: disable=too-many-arguments
+    key: str,
+    manifest: dict,
+    query,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    use_msgpack: Optional[bool] = False,
+) -> Optional[dict]:
+    """Reads the rows [offset, offset + limit) of results stored as chunks
+
+    Only the chunks holding these rows are fetched from the results backend.
+    Returns None when one of them expired.
+    """
+    chunk_sizes = manifest.pop("chunks")
+    locations = results_chunks.locate_rows(chunk_sizes, offset, limit)
+    keys = [results_chunks.chunk_key(key, index) for index, _, _ in locations]
+    with stats_timing("sqllab.query.results_backend_read_chunks", stats_logger):
+        blobs = results_backend.get_many(*keys) if keys else []
+    if any(blob is None for blob in blobs):
+        return None
+
+    parts = []
+    for (_, start, end), blob in zip(locations, blobs):
+        data = _deserialize_results_chunk(
+            blob, use_msgpack, manifest.get("data_format")
+        )
+        if isinstance(data, pd.DataFrame):
+            parts.append(data.iloc[start:end])
+        else:
+            parts.append(data[start:end])
+
+    if use_msgpack:
+        data = (
+            dataframe.SupersetDataFrame.format_data(pd.concat(parts)) if parts else []
+        )
+        db_engine_spec = query.database.db_engine_spec
+        all_columns, data, expanded_columns = db_engine_spec.expand_data(
+            manifest["selected_columns"], data
+        )
+        manifest.update({"columns": all_columns, "expanded_columns": expanded_columns})
+    else:
+        data = [row for part in parts for row in part]
+    manifest["data"] = data
+
+    if limit is not None and offset + limit < sum(chunk_sizes):
+        manifest["displayLimitReached"] = True
+    return manifest
+
+
+def _iter_results_chunks(
+    key: str, manifest: dict, query, use_msgpack: Optional[bool] = False
+) -> Iterator[pd.DataFrame]:
+    """Yields the results stored as chunks, one chunk at a time
+
+    Results stored with msgpack are expanded like in `_read_results_chunks`.
+    """
+
+    def to_frame(data: list) -> pd.DataFrame:
+        columns = manifest["columns"]
+        if use_msgpack:
+            db_engine_spec = query.database.db_engine_spec
+            columns, data, _ = db_engine_spec.expand_data(
+                manifest["selected_columns"], data
+            )
+        return pd.DataFrame.from_records(data, columns=[c["name"] for c in columns])
+
+    if not manifest["chunks"]:
+        yield to_frame([])
+    for index in range(len(manifest["chunks"])):
+        blob = results_backend.get(results_chunks.chunk_key(key, index))
+        if blob is None:
+            raise SupersetException(f"Results chunk {index} of {key} expired")
+        data = _deserialize_results_chunk(
+            blob, use_msgpack, manifest.get("data_format")
+        )
+        if use_msgpack:
+            data = dataframe.SupersetDataFrame.format_data(data)
+        yield to_frame(data)
+
+
+def _read_results_arrow(
+    key: str, payload: dict, offset: int = 0, limit: Optional[int] = None
+) -> Optional[bytes]:
+    """Reads the rows [offset, offset + limit) of results stored as Arrow IPC
+    streams, as an Arrow IPC stream
+
+    The stored stream is returned as is when all the rows of results that
+    aren't chunked are read. Returns None when one of the chunks expired.
+    """
+    if not results_chunks.is_chunked(payload):
+        if not offset and limit is None:
+            return payload["data"]
+        table = arrow_ipc.deserialize_table(payload["data"])
+        return arrow_ipc.serialize_table(table.slice(offset, limit))
+
+    locations = results_chunks.locate_rows(payload["chunks"], offset, limit)
+    keys = [results_chunks.chunk_key(key, index) for index, _, _ in locations]
+    with stats_timing("sqllab.query.results_backend_read_chunks", stats_logger):
+        blobs = results_backend.get_many(*keys) if keys else []
+    if any(blob is None for blob in blobs):
+        return None
+
+    tables = []
+    for (_, start, end), blob in zip(locations, blobs):
+        data = msgpack.loads(compression.decompress(blob, decode=False), raw=False)
+        table = arrow_ipc.deserialize_table(data["data"])
+        tables.append(table.slice(start, end - start))
+    if not tables:
+        columns = [column["name"] for column in payload["columns"]]
+        tables.append(arrow_ipc.dataframe_to_table(pd.DataFrame(columns=columns)))
+    return arrow_ipc.serialize_table(arrow_ipc.concat_tables(tables))
+
+
 class SliceFilter(BaseFilter):
     def apply(self, query, func):  # noqa
         if security_manager.all_datasource_access():
@@ -801,7 +949,7 @@ class Superset(BaseSupersetView):
 
     def get_raw_results(self, viz_obj):
         return self.json_response(
-            {"data": viz_obj.get_df_payload()["df"].to_dict("records")}
+            {"data": viz_obj.get_df_payload(incremental=True)["df"].to_dict("records")}
         )
 
     def get_samples(self, viz_obj):
@@ -811,11 +959,8 @@ class Superset(BaseSupersetView):
         self, viz_obj, csv=False, query=False, results=False, samples=False
     ):
         if csv:
-            return CsvResponse(
-                viz_obj.get_csv(),
-                status=200,
-                headers=generate_download_headers("csv"),
-                mimetype="application/csv",
+            return csv_stream_response(
+                viz_obj.get_csv_frames(), index=None, stats_prefix="csv_export.chart"
             )
 
         if query:
@@ -908,6 +1053,149 @@ class Superset(BaseSupersetView):
             viz_obj, csv=csv, query=query, results=results, samples=samples
         )
 
+    @event_logger.log_this
+    @api
+    @has_access_api
+    @handle_api_exception
+    @expose("/explore_json_batch/", methods=["POST"])
+    def explore_json_batch(self):
+        """Serves the data of several charts in a single request
+
+        The `queries` form field holds a JSON list of form_data. Each datasource
+        is resolved and permission checked once, charts sharing the same cache
+        key are computed once, and the other ones run concurrently on a bounded
+        thread pool which respects the per database concurrency caps.
+
+        Results are streamed back as newline delimited JSON as soon as they are
+        ready, one line per chart holding the `index` of the chart in `queries`,
+        its `slice_id`, whether it errored and the `explore_json` payload."""
+        force = request.args.get("force") == "true"
+        try:
+            queries = json.loads(request.form.get("queries") or "[]")
+        except ValueError:
+            return json_error_response(__("Malformed request"), status=400)
+        if not isinstance(queries, list):
+            return json_error_response(__("Malformed request"), status=400)
+
+        datasources: Dict[Tuple[int, str], Any] = {}
+        groups: Dict[str, List[Tuple[int, Optional[int], viz.BaseViz]]] = {}
+        semaphores: Dict[str, Any] = {}
+        failed: List[str] = []
+        for index, query in enumerate(queries):
+            slice_id = query.get("slice_id") if isinstance(query, dict) else None
+            try:
+                form_data, slc = process_form_data(query)
+                slice_id = slc.id if slc else slice_id
+                datasource_key = get_datasource_info(None, None, form_data)
+                if datasource_key not in datasources:
+                    datasource = ConnectorRegistry.get_datasource(
+                        datasource_key[1], datasource_key[0], db.session
+                    )
+                    if not datasource:
+                        raise SupersetException(__("The datasource no longer exists"))
+                    security_manager.assert_datasource_permission(datasource)
+                    datasources[datasource_key] = datasource
+                datasource = datasources[datasource_key]
+                viz_type = form_data.get("viz_type", "table")
+                viz_obj = viz.viz_types[viz_type](
+                    datasource, form_data=form_data, force=force
+                )
+                cache_key = viz_obj.cache_key(viz_obj.query_obj())
+                if cache_key not in semaphores:
+                    semaphores[cache_key] = get_database_semaphore(datasource)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception(e)
+                failed.append(
+                    self._explore_json_batch_error(
+                        index, slice_id, utils.error_msg_from_exception(e)
+                    )
+                )
+                continue
+            groups.setdefault(cache_key, []).append((index, slice_id, viz_obj))
+
+        for members in groups.values():
+            for _ in members[1:]:
+                stats_logger.incr("explore_json_batch.deduplicated")
+
+        user = g.user
+        executor = ThreadPoolExecutor(
+            max_workers=max(
+                min(config["EXPLORE_JSON_BATCH_MAX_WORKERS"], len(groups)), 1
+            )
+        )
+
+        def submit(cache_key: str, members: List) -> Any:
+            @copy_current_request_context
+            def compute() -> List[str]:
+                # the app context pushed in this thread has its own `g`
+                g.user = user
+                try:
+                    with semaphores[cache_key]:
+                        return self._explore_json_batch_group(members)
+                finally:
+                    db.session.remove()
+
+            return executor.submit(compute)
+
+        futures = [submit(cache_key, members) for cache_key, members in groups.items()]
+
+        def generate() -> Iterator[str]:
+            try:
+                yield from failed
+                for future in as_completed(futures):
+                    yield from future.result()
+            finally:
+                executor.shutdown(wait=False)
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+
+    def _explore_json_batch_group(
+        self, members: List[Tuple[int, Optional[int], viz.BaseViz]]
+    ) -> List[str]:
+        """Computes the charts sharing a cache key, the first one being computed
+        first so that the other ones are served from its result"""
+        lines = []
+        computed: Dict[str, Tuple[str, bool]] = {}
+        for index, slice_id, viz_obj in members:
+            try:
+                form_data_key = json.dumps(viz_obj.form_data, sort_keys=True)
+                if form_data_key not in computed:
+                    viz_obj.datasource = db.session.merge(
+                        viz_obj.datasource, load=False
+                    )
+                    payload = viz_obj.get_payload()
+                    computed[form_data_key] = viz_obj.payload_json_and_has_error(
+                        payload
+                    )
+                payload_json, has_error = computed[form_data_key]
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception(e)
+                lines.append(
+                    self._explore_json_batch_error(
+                        index, slice_id, utils.error_msg_from_exception(e)
+                    )
+                )
+                continue
+            lines.append(
+                self._explore_json_batch_line(index, slice_id, has_error, payload_json)
+            )
+        return lines
+
+    @staticmethod
+    def _explore_json_batch_line(
+        index: int, slice_id: Optional[int], has_error: bool, payload_json: str
+    ) -> str:
+        # the payload is already serialized, splice it in rather than parsing it
+        head = json.dumps({"index": index, "slice_id": slice_id, "error": has_error})
+        return head[:-1] + ', "payload": ' + payload_json + "}\n"
+
+    @staticmethod
+    def _explore_json_batch_error(index: int, slice_id: Optional[int], msg: str) -> str:
+        payload_json = json.dumps({"error": msg, "status": QueryStatus.FAILED})
+        return Superset._explore_json_batch_line(index, slice_id, True, payload_json)
+
     @event_logger.log_this
     @has_access
     @expose("/import_dashboards", methods=["GET", "POST"])
@@ -2295,11 +2583,28 @@ class Superset(BaseSupersetView):
     def results(self, key):
         return self.results_exec(key)
 
+    @staticmethod
+    def _accepts_arrow() -> bool:
+        """Whether the client asked for results as an Arrow IPC stream"""
+        if request.args.get("format") == "arrow":
+            return True
+        best_match = request.accept_mimetypes.best_match(
+            ["application/json", arrow_ipc.ARROW_STREAM_MIMETYPE]
+        )
+        return best_match == arrow_ipc.ARROW_STREAM_MIMETYPE
+
     def results_exec(self, key: str):
         """Serves a key off of the results backend
 
-        It is possible to pass the `rows` query argument to limit the number
-        of rows returned.
+        It is possible to pass the `rows` or `limit` query argument to limit
+        the number of rows returned, and the `offset` query argument to skip
+        the first rows. When the results are stored as chunks, only the chunks
+        holding the requested rows are read from the results backend.
+
+        Results stored with msgpack are returned as an Arrow IPC stream,
+        without being expanded, when the `format=arrow` query argument is
+        passed or the client accepts `application/vnd.apache.arrow.stream`
+        rather than JSON. Other results are always returned as JSON.
         """
         if not results_backend:
             return json_error_response("Results backend isn't configured")
@@ -2316,32 +2621,78 @@ class Superset(BaseSupersetView):
                 status=410,
             )
 
-        query = db.session.query(Query).filter_by(results_key=key).one_or_none()
-        if query is None:
+        # the results of the statements of a query are stored under keys derived
+        # from the results key of the query, which queries served from the results
+        # of an identical query share
+        queries = (
+            db.session.query(Query)
+            .filter_by(results_key=sql_lab.get_query_results_key(key))
+            .all()
+        )
+        if not queries:
             return json_error_response(
                 "Data could not be retrieved. You may want to re-run the query.",
                 status=404,
             )
 
-        rejected_tables = security_manager.rejected_tables(
-            query.sql, query.database, query.schema
-        )
-        if rejected_tables:
-            return json_error_response(
-                security_manager.get_table_access_error_msg(rejected_tables), status=403
+        checked = set()
+        for query in queries:
+            if (query.sql, query.database, query.schema) in checked:
+                continue
+            checked.add((query.sql, query.database, query.schema))
+            rejected_tables = security_manager.rejected_tables(
+                query.sql, query.database, query.schema
             )
+            if rejected_tables:
+                return json_error_response(
+                    security_manager.get_table_access_error_msg(rejected_tables),
+                    status=403,
+                )
+        query = queries[0]
+
+        args: Dict[str, int] = {}
+        for arg in ("offset", "limit", "rows"):
+            if arg in request.args:
+                try:
+                    args[arg] = int(request.args[arg])
+                    if args[arg] < 0:
+                        raise ValueError()
+                except ValueError:
+                    return json_error_response(f"Invalid `{arg}` argument", status=400)
+        offset = args.get("offset", 0)
+        limit = args.get("limit", args.get("rows"))
+        if offset and limit is None:
+            limit = config["DISPLAY_MAX_ROW"]
+
+        payload = compression.decompress(blob, decode=not results_backend_use_msgpack)
+        if results_backend_use_msgpack and self._accepts_arrow():
+            ds_payload = msgpack.loads(payload, raw=False)
+            if ds_payload.get("data_format") == arrow_ipc.ARROW_DATA_FORMAT:
+                data = _read_results_arrow(key, ds_payload, offset, limit)
+                if data is None:
+                    return json_error_response(
+                        "Data could not be retrieved. "
+                        "You may want to re-run the query.",
+                        status=410,
+                    )
+                return Response(data, mimetype=arrow_ipc.ARROW_STREAM_MIMETYPE)
 
-        payload = utils.zlib_decompress(blob, decode=not results_backend_use_msgpack)
         obj: dict = _deserialize_results_payload(
             payload, query, cast(bool, results_backend_use_msgpack)
         )
 
-        if "rows" in request.args:
-            try:
-                rows = int(request.args["rows"])
-            except ValueError:
-                return json_error_response("Invalid `rows` argument", status=400)
-            obj = apply_display_max_row_limit(obj, rows)
+        if results_chunks.is_chunked(obj):
+            chunked_obj = _read_results_chunks(
+                key, obj, query, offset, limit, results_backend_use_msgpack
+            )
+            if chunked_obj is None:
+                return json_error_response(
+                    "Data could not be retrieved. You may want to re-run the query.",
+                    status=410,
+                )
+            obj = chunked_obj
+        elif limit is not None:
+            obj = apply_display_max_row_limit(obj, limit, offset)
 
         return json_success(
             json.dumps(obj, default=utils.json_iso_dttm_ser, ignore_nan=True)
@@ -2373,6 +2724,9 @@ class Superset(BaseSupersetView):
             return self.json_response("OK")
         query.status = QueryStatus.STOPPED
         db.session.commit()
+        query_progress_reporter.request_stop(
+            query.id, timeout=config["SQLLAB_ASYNC_TIME_LIMIT_SEC"]
+        )
 
         return self.json_response("OK")
 
@@ -2462,15 +2816,24 @@ class Superset(BaseSupersetView):
         logging.info(f"Query {query.id}: Running query on a Celery worker")
         # Ignore the celery future object and the request may time out.
         try:
-            sql_lab.get_sql_results.delay(
-                query.id,
-                rendered_query,
-                return_results=False,
-                store_results=not query.select_as_cta,
-                user_name=g.user.username if g.user else None,
-                start_time=now_as_float(),
-                expand_data=expand_data,
-                log_params=log_params,
+            options = {}
+            queue = query_cost_guard.get_queue(
+                query.database, query.schema, rendered_query, g.user, "sql_lab"
+            )
+            if queue:
+                logging.info(f"Query {query.id}: Deprioritized to queue {queue}")
+                options["queue"] = queue
+            sql_lab.get_sql_results.apply_async(
+                (query.id, rendered_query),
+                dict(
+                    return_results=False,
+                    store_results=not query.select_as_cta,
+                    user_name=g.user.username if g.user else None,
+                    start_time=now_as_float(),
+                    expand_data=expand_data,
+                    log_params=log_params,
+                ),
+                **options,
             )
         except Exception as e:
             logging.exception(f"Query {query.id}: {e}")
@@ -2686,32 +3049,43 @@ class Superset(BaseSupersetView):
                 "Fetching CSV from results backend " "[{}]".format(query.results_key)
             )
             blob = results_backend.get(query.results_key)
+        chunk_rows = config["CSV_EXPORT_CHUNK_ROWS"]
         if blob:
             logging.info("Decompressing")
-            payload = utils.zlib_decompress(
+            payload = compression.decompress(
                 blob, decode=not results_backend_use_msgpack
             )
             obj = _deserialize_results_payload(
                 payload, query, results_backend_use_msgpack
             )
-            columns = [c["name"] for c in obj["columns"]]
-            df = pd.DataFrame.from_records(obj["data"], columns=columns)
-            logging.info("Using pandas to convert to CSV")
-            csv = df.to_csv(index=False, **config["CSV_EXPORT"])
+            if results_chunks.is_chunked(obj):
+                logging.info("Streaming CSV from results chunks")
+                frames = _iter_results_chunks(
+                    query.results_key, obj, query, results_backend_use_msgpack
+                )
+                row_count = sum(obj["chunks"])
+            else:
+                columns = [c["name"] for c in obj["columns"]]
+                df = pd.DataFrame.from_records(obj["data"], columns=columns)
+                frames = split_frame(df, chunk_rows)
+                row_count = len(df.index)
         else:
-            logging.info("Running a query to turn into CSV")
+            logging.info("Streaming CSV from the query results")
             sql = query.select_sql or query.executed_sql
-            df = query.database.get_df(sql, query.schema)
-            # TODO(bkyryliuk): add compression=gzip for big files.
-            csv = df.to_csv(index=False, **config["CSV_EXPORT"])
-        response = Response(csv, mimetype="text/csv")
-        response.headers[
-            "Content-Disposition"
-        ] = f"attachment; filename={query.name}.csv"
+            frames = query.database.iter_df(
+                sql, query.schema, query.database.fetch_batch_size or chunk_rows
+            )
+            row_count = query.rows
+        response = csv_stream_response(
+            frames,
+            filename=query.name,
+            mimetype="text/csv",
+            stats_prefix="csv_export.sqllab",
+        )
         event_info = {
             "event_type": "data_export",
             "client_id": client_id,
-            "row_count": len(df.index),
+            "row_count": row_count,
             "database": query.database.name,
             "schema": query.schema,
             "sql": query.sql,
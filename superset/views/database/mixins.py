@@ -163,7 +163,38 @@ class DatabaseMixin:
             "If database flavor does not support schema or any schema is allowed "
             "to be accessed, just leave the list empty"
             "4. the ``version`` field is a string specifying the this db's version. "
-            "This should be used with Presto DBs so that the syntax is correct",
+            "This should be used with Presto DBs so that the syntax is correct<br/>"
+            "5. The ``fetch_batch_size`` is the number of rows fetched at a time "
+            "when loading chart data, overriding ``DB_FETCH_BATCH_SIZE``. "
+            'Specify it as **"fetch_batch_size": 10000**.<br/>'
+            "6. The ``explore_json_batch_concurrency`` is the maximum number of "
+            "chart queries run concurrently against this database when loading "
+            "dashboards, overriding ``EXPLORE_JSON_BATCH_DATABASE_CONCURRENCY``.<br/>"
+            "7. The ``time_series_incremental_cache`` enables or disables the "
+            "incremental caching of time series charts for this database, "
+            "overriding ``TIME_SERIES_INCREMENTAL_CACHE``.<br/>"
+            "8. The ``connection_pool`` object enables a connection pool for this "
+            "database, its ``pool_size``, ``max_overflow``, ``pool_recycle``, "
+            "``pool_timeout`` and ``pool_pre_ping`` keys are passed to "
+            "[sqlalchemy.create_engine]"
+            "(https://docs.sqlalchemy.org/en/latest/core/engines.html#"
+            "sqlalchemy.create_engine). Specify it as "
+            '**"connection_pool": {"pool_size": 5, "pool_recycle": 3600}**.<br/>'
+            "9. The ``sqllab_results_cache`` enables or disables serving SQL Lab "
+            "queries from the results of identical queries, overriding "
+            "``SQLLAB_RESULTS_CACHE``.<br/>"
+            "10. The ``results_backend_compression`` object sets the codec, one "
+            "of ``zlib``, ``lz4``, ``zstd`` or ``none``, and level compressing "
+            "the SQL Lab results of this database in the results backend, "
+            "overriding ``RESULTS_BACKEND_COMPRESSION``. Specify it as "
+            '**"results_backend_compression": {"codec": "zstd", "level": 3}**.<br/>'
+            "11. The ``sqllab_parallel_statements`` sets how many independent "
+            "statements of a SQL Lab query may run concurrently against this "
+            "database, overriding ``SQLLAB_PARALLEL_STATEMENTS``.<br/>"
+            "12. The ``query_cost_budget`` object caps the estimated cost of the "
+            "queries run against this database when ``QUERY_COST_GUARD_ENABLED`` "
+            'is set, e.g. **"query_cost_budget": {"cpuCost": 1e12}** for '
+            "Presto.",
             True,
         ),
         "encrypted_extra": utils.markdown(
@@ -14,6 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import threading
 from collections import defaultdict
 from datetime import date
 from typing import Any, Dict, List, Optional, Tuple
@@ -33,6 +34,10 @@ FORM_DATA_KEY_BLACKLIST: List[str] = []
 if not app.config["ENABLE_JAVASCRIPT_CONTROLS"]:
     FORM_DATA_KEY_BLACKLIST = ["js_tooltip", "js_onclick_href", "js_data_mutator"]
 
+# the cap and the semaphore of each database, by datasource type and database id
+_database_semaphores: Dict[Tuple[str, int], Tuple[int, threading.BoundedSemaphore]] = {}
+_database_semaphores_lock = threading.Lock()
+
 
 def bootstrap_user_data(user, include_perms=False):
     payload = {
@@ -113,6 +118,22 @@ def get_form_data(slice_id=None, use_slice_data=False):
             url_form_data.update(form_data)
             form_data = url_form_data
 
+    return process_form_data(form_data, slice_id, use_slice_data)
+
+
+def process_form_data(
+    form_data: Dict[str, Any],
+    slice_id: Optional[int] = None,
+    use_slice_data: bool = False,
+) -> Tuple[Dict[str, Any], Optional[models.Slice]]:
+    """
+    Sanitizes the form data of a chart and merges it with the saved slice params
+
+    :param form_data: The form data provided by the client
+    :param slice_id: The slice ID, if not part of the form data
+    :param use_slice_data: Whether to always merge the saved slice params
+    :returns: The form data and the slice, if any
+    """
     form_data = {k: v for k, v in form_data.items() if k not in FORM_DATA_KEY_BLACKLIST}
 
     # When a slice_id is present, load from DB and override
@@ -181,7 +202,7 @@ def get_datasource_info(
 
 
 def apply_display_max_row_limit(
-    sql_results: Dict[str, Any], rows: Optional[int] = None
+    sql_results: Dict[str, Any], rows: Optional[int] = None, offset: int = 0
 ) -> Dict[str, Any]:
     """
     Given a `sql_results` nested structure, applies a limit to the number of rows
@@ -192,15 +213,19 @@ def apply_display_max_row_limit(
     metadata.
 
     :param sql_results: The results of a sql query from sql_lab.get_sql_results
+    :param rows: The maximum number of rows, defaults to DISPLAY_MAX_ROW
+    :param offset: The number of rows to skip
     :returns: The mutated sql_results structure
     """
 
     display_limit = rows or app.config["DISPLAY_MAX_ROW"]
 
+    if offset:
+        sql_results["data"] = sql_results["data"][offset:]
     if (
         display_limit
         and sql_results["status"] == QueryStatus.SUCCESS
-        and display_limit < sql_results["query"]["rows"]
+        and offset + display_limit < sql_results["query"]["rows"]
     ):
         sql_results["data"] = sql_results["data"][:display_limit]
         sql_results["displayLimitReached"] = True
@@ -261,3 +286,36 @@ def get_time_range_endpoints(
         return (TimeRangeEndpoint(start), TimeRangeEndpoint(end))
 
     return (TimeRangeEndpoint.INCLUSIVE, TimeRangeEndpoint.EXCLUSIVE)
+
+
+def get_database_semaphore(datasource) -> threading.BoundedSemaphore:
+    """
+    Get the process wide semaphore capping the number of concurrent chart queries
+    run against the database of a datasource by the batch explore endpoint.
+
+    The cap defaults to `EXPLORE_JSON_BATCH_DATABASE_CONCURRENCY` and can be
+    overridden with the `explore_json_batch_concurrency` key of the database extra.
+
+    :param datasource: The datasource
+    :returns: The semaphore of the database
+    """
+
+    database = datasource.database
+    get_extra = getattr(database, "get_extra", None)
+    extra = get_extra() if get_extra else {}
+    limit = int(
+        extra.get(
+            "explore_json_batch_concurrency",
+            app.config["EXPLORE_JSON_BATCH_DATABASE_CONCURRENCY"],
+        )
+    )
+    key = (datasource.type, database.id)
+
+    with _database_semaphores_lock:
+        entry = _database_semaphores.get(key)
+        # the semaphore is replaced when the cap is edited, so that it takes
+        # effect right away
+        if entry is None or entry[0] != limit:
+            entry = (limit, threading.BoundedSemaphore(max(limit, 1)))
+            _database_semaphores[key] = entry
+        return entry[1]
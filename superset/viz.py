@@ -25,14 +25,13 @@ import hashlib
 import inspect
 import logging
 import math
-import pickle as pkl
 import re
 import uuid
 from collections import defaultdict, OrderedDict
 from datetime import datetime, timedelta
 from functools import reduce
 from itertools import product
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import geohash
 import numpy as np
@@ -46,16 +45,18 @@ from geopy.point import Point
 from markdown import markdown
 from pandas.tseries.frequencies import to_offset
 
-from superset import app, cache, get_css_manifest_files
+from superset import app, cache, cache_manager, get_css_manifest_files
 from superset.constants import NULL_STRING
 from superset.exceptions import NullValueException, SpatialException
-from superset.utils import core as utils
+from superset.utils import core as utils, incremental_cache
 from superset.utils.core import (
     DTTM_ALIAS,
     JS_MAX_INTEGER,
     merge_extra_filters,
     to_adhoc,
 )
+from superset.utils.csv_stream import split_frame
+from superset.utils.dates import EPOCH
 
 config = app.config
 stats_logger = config["STATS_LOGGER"]
@@ -84,6 +85,9 @@ class BaseViz(object):
     is_timeseries = False
     cache_type = "df"
     enforce_numerical_metrics = True
+    # whether the rows of the query for parts of its time range can be stitched
+    # together, see `get_df_incremental`
+    supports_incremental_cache = False
 
     def __init__(self, datasource, form_data, force=False):
         if not datasource:
@@ -373,7 +377,7 @@ class BaseViz(object):
     def get_payload(self, query_obj=None):
         """Returns a payload of metadata and data"""
         self.run_extra_queries()
-        payload = self.get_df_payload(query_obj)
+        payload = self.get_df_payload(query_obj, incremental=True)
 
         df = payload.get("df")
         if self.status != utils.QueryStatus.FAILED:
@@ -385,8 +389,34 @@ class BaseViz(object):
             del payload["df"]
         return payload
 
-    def get_df_payload(self, query_obj=None, **kwargs):
-        """Handles caching around the df payload retrieval"""
+    def get_df_from_cache(self, cache_key):
+        """Loads the df payload stored at ``cache_key``, if any"""
+        is_loaded = False
+        df = None
+        try:
+            cache_value = cache_manager.get_chart_data(cache_key, self.cache_timeout)
+            if not cache_value:
+                return False, None
+            stats_logger.incr("loaded_from_cache")
+            df = cache_value["df"]
+            self.query = cache_value["query"]
+            self._any_cached_dttm = cache_value["dttm"]
+            self._any_cache_key = cache_key
+            self.status = utils.QueryStatus.SUCCESS
+            is_loaded = True
+        except Exception as e:
+            logging.exception(e)
+            logging.error("Error reading cache: " + utils.error_msg_from_exception(e))
+        logging.info("Serving from cache")
+        return is_loaded, df
+
+    def get_df_payload(self, query_obj=None, incremental=False, **kwargs):
+        """Handles caching around the df payload retrieval
+
+        :param query_obj: The query object, the one of the viz when None
+        :param incremental: Whether the data may be cached incrementally, see
+            `get_df_incremental`
+        """
         if not query_obj:
             query_obj = self.query_obj()
         cache_key = self.cache_key(query_obj, **kwargs) if query_obj else None
@@ -396,63 +426,18 @@ class BaseViz(object):
         df = None
         cached_dttm = datetime.utcnow().isoformat().split(".")[0]
         if cache_key and cache and not self.force:
-            cache_value = cache.get(cache_key)
-            if cache_value:
-                stats_logger.incr("loaded_from_cache")
-                try:
-                    cache_value = pkl.loads(cache_value)
-                    df = cache_value["df"]
-                    self.query = cache_value["query"]
-                    self._any_cached_dttm = cache_value["dttm"]
-                    self._any_cache_key = cache_key
-                    self.status = utils.QueryStatus.SUCCESS
-                    is_loaded = True
-                except Exception as e:
-                    logging.exception(e)
-                    logging.error(
-                        "Error reading cache: " + utils.error_msg_from_exception(e)
-                    )
-                logging.info("Serving from cache")
+            is_loaded, df = self.get_df_from_cache(cache_key)
 
         if query_obj and not is_loaded:
-            try:
-                df = self.get_df(query_obj)
-                if self.status != utils.QueryStatus.FAILED:
-                    stats_logger.incr("loaded_from_source")
-                    is_loaded = True
-            except Exception as e:
-                logging.exception(e)
-                if not self.error_message:
-                    self.error_message = "{}".format(e)
-                self.status = utils.QueryStatus.FAILED
-                stacktrace = utils.get_stacktrace()
-
-            if (
-                is_loaded
-                and cache_key
-                and cache
-                and self.status != utils.QueryStatus.FAILED
-            ):
-                try:
-                    cache_value = dict(
-                        dttm=cached_dttm,
-                        df=df if df is not None else None,
-                        query=self.query,
+            # concurrent requests for the same key wait for a single query
+            flight_key = cache_key if not self.force else None
+            with cache_manager.single_flight.flight(flight_key) as waited:
+                if waited:
+                    is_loaded, df = self.get_df_from_cache(cache_key)
+                if not is_loaded:
+                    is_loaded, df, stacktrace = self.get_df_from_source(
+                        query_obj, cache_key, cached_dttm, incremental=incremental
                     )
-                    cache_value = pkl.dumps(cache_value, protocol=pkl.HIGHEST_PROTOCOL)
-
-                    logging.info(
-                        "Caching {} chars at key {}".format(len(cache_value), cache_key)
-                    )
-
-                    stats_logger.incr("set_cache_key")
-                    cache.set(cache_key, cache_value, timeout=self.cache_timeout)
-                except Exception as e:
-                    # cache.set call can fail if the backend is down or if
-                    # the key is too large or whatever other reasons
-                    logging.warning("Could not cache key {}".format(cache_key))
-                    logging.exception(e)
-                    cache.delete(cache_key)
         return {
             "cache_key": self._any_cache_key,
             "cached_dttm": self._any_cached_dttm,
@@ -467,6 +452,205 @@ class BaseViz(object):
             "rowcount": len(df.index) if df is not None else 0,
         }
 
+    def get_df_from_source(self, query_obj, cache_key, cached_dttm, incremental=False):
+        """Runs the query and stores its df payload at ``cache_key``"""
+        is_loaded = False
+        stacktrace = None
+        df = None
+        try:
+            chunk_duration = (
+                self.get_incremental_chunk_duration(query_obj) if incremental else None
+            )
+            if chunk_duration:
+                df = self.get_df_incremental(query_obj, chunk_duration, cached_dttm)
+            else:
+                df = self.get_df(query_obj)
+            if self.status != utils.QueryStatus.FAILED:
+                stats_logger.incr("loaded_from_source")
+                is_loaded = True
+        except Exception as e:
+            logging.exception(e)
+            if not self.error_message:
+                self.error_message = "{}".format(e)
+            self.status = utils.QueryStatus.FAILED
+            stacktrace = utils.get_stacktrace()
+
+        if (
+            is_loaded
+            and cache_key
+            and cache
+            and self.status != utils.QueryStatus.FAILED
+        ):
+            try:
+                cache_value = dict(
+                    dttm=cached_dttm,
+                    df=df if df is not None else None,
+                    query=self.query,
+                )
+                stats_logger.incr("set_cache_key")
+                size = cache_manager.set_chart_data(
+                    cache_key, cache_value, timeout=self.cache_timeout
+                )
+                logging.info("Cached {} chars at key {}".format(size, cache_key))
+            except Exception as e:
+                # cache.set call can fail if the backend is down or if
+                # the key is too large or whatever other reasons
+                logging.warning("Could not cache key {}".format(cache_key))
+                logging.exception(e)
+                cache_manager.delete_chart_data(cache_key)
+        return is_loaded, df, stacktrace
+
+    def get_incremental_chunk_duration(
+        self, query_obj: Dict[str, Any]
+    ) -> Optional[timedelta]:
+        """Returns the duration of the chunks the data of ``query_obj`` can be
+        cached in, or ``None`` when it can't be cached incrementally"""
+        if not self.supports_incremental_cache or not cache:
+            return None
+        if self.datasource.type != "table" or self.datasource.offset:
+            return None
+        enabled = self.datasource.database.get_extra().get(
+            "time_series_incremental_cache", config["TIME_SERIES_INCREMENTAL_CACHE"]
+        )
+        extras = query_obj.get("extras") or {}
+        from_dttm = query_obj.get("from_dttm")
+        to_dttm = query_obj.get("to_dttm")
+        if (
+            not enabled
+            or not query_obj.get("is_timeseries")
+            or query_obj.get("timeseries_limit")
+            or not from_dttm
+            or not to_dttm
+            or from_dttm.tzinfo
+            or to_dttm.tzinfo
+            or self.time_shift
+            # the rows of a chunk must not depend on the end of the time range
+            or tuple(extras.get("time_range_endpoints") or ())
+            != (utils.TimeRangeEndpoint.INCLUSIVE, utils.TimeRangeEndpoint.EXCLUSIVE)
+        ):
+            return None
+        return incremental_cache.get_chunk_duration(
+            extras.get("time_grain_sqla"),
+            timedelta(seconds=config["TIME_SERIES_INCREMENTAL_CACHE_CHUNK"]),
+        )
+
+    def incremental_cache_key(
+        self, query_obj: Dict[str, Any], start: datetime, end: datetime
+    ) -> str:
+        """The cache key of the [start, end) chunk of the data of ``query_obj``,
+        which changes along with the definition of the table"""
+        cache_dict = {
+            k: v
+            for k, v in query_obj.items()
+            if k not in ("from_dttm", "to_dttm", "row_limit")
+        }
+        cache_dict["chunk"] = [start.isoformat(), end.isoformat()]
+        cache_dict["datasource"] = self.datasource.uid
+        cache_dict["extra_cache_keys"] = self.datasource.get_extra_cache_keys(query_obj)
+        cache_dict["changes"] = self.datasource.get_change_fingerprint()
+        json_data = self.json_dumps(cache_dict, sort_keys=True)
+        return "incremental/" + hashlib.md5(json_data.encode("utf-8")).hexdigest()
+
+    def get_df_incremental(
+        self, query_obj: Dict[str, Any], chunk_duration: timedelta, cached_dttm: str
+    ) -> Optional[pd.DataFrame]:
+        """Returns the df of ``query_obj``, reading the settled chunks of its time
+        range from the cache and querying the database for the other ones"""
+        # the time range is in local time, see `utils.get_since_until`
+        settled_dttm = datetime.now() - timedelta(
+            seconds=config["TIME_SERIES_INCREMENTAL_CACHE_SETTLE_PERIOD"]
+        )
+        pieces = incremental_cache.split_time_range(
+            query_obj["from_dttm"], query_obj["to_dttm"], chunk_duration
+        )
+        # partial and recent chunks are always queried
+        keys = {
+            (start, end): self.incremental_cache_key(query_obj, start, end)
+            for start, end in pieces
+            if end - start == chunk_duration and end <= settled_dttm
+        }
+
+        cached = {}
+        if keys and not self.force:
+            try:
+                values = cache.get_many(*keys.values())
+                for piece, value in zip(keys, values):
+                    if value is not None:
+                        cached[piece] = cache_manager.data_serializer.loads(value)
+            except Exception as e:
+                logging.exception(e)
+                cached = {}
+        for _ in cached:
+            stats_logger.incr("incremental_cache.hit")
+
+        # contiguous pieces missing from the cache are queried together
+        segments: List[List[Tuple[datetime, datetime]]] = []
+        for piece in pieces:
+            if piece not in cached and segments and segments[-1][-1] not in cached:
+                segments[-1].append(piece)
+            else:
+                segments.append([piece])
+
+        row_limit = query_obj["row_limit"]
+        dfs = []
+        queries = []
+        to_cache = {}
+        for segment in segments:
+            if segment[0] in cached:
+                dfs.append(cached[segment[0]]["df"])
+                queries.append(cached[segment[0]]["query"])
+                continue
+            segment_query_obj = dict(
+                query_obj, from_dttm=segment[0][0], to_dttm=segment[-1][1]
+            )
+            df = self.get_df(segment_query_obj)
+            if self.status == utils.QueryStatus.FAILED:
+                return df
+            if df is not None and len(df.index) >= row_limit:
+                # rows may have been cut off, fall back to the full query
+                return self.get_df(query_obj)
+            dfs.append(df)
+            queries.append(self.query)
+            if df is None or (DTTM_ALIAS not in df and not df.empty):
+                continue
+            if not df.empty and df[DTTM_ALIAS].dt.tz is not None:
+                # timestamps with a time zone can't be split at the chunk bounds
+                continue
+            for start, end in segment:
+                if (start, end) in keys:
+                    chunk_df = df
+                    if not df.empty:
+                        dttm = df[DTTM_ALIAS]
+                        chunk_df = df[(dttm >= start) & (dttm < end)]
+                    to_cache[keys[(start, end)]] = cache_manager.data_serializer.dumps(
+                        dict(
+                            dttm=cached_dttm,
+                            df=chunk_df.reset_index(drop=True),
+                            query=self.query,
+                        )
+                    )
+                    stats_logger.incr("incremental_cache.miss")
+
+        if to_cache:
+            try:
+                cache.set_many(
+                    to_cache,
+                    timeout=config["TIME_SERIES_INCREMENTAL_CACHE_IMMUTABLE_TIMEOUT"],
+                )
+            except Exception as e:
+                logging.warning("Could not cache time series chunks")
+                logging.exception(e)
+
+        self.query = "\n\n".join(query for query in dict.fromkeys(queries) if query)
+        self.status = utils.QueryStatus.SUCCESS
+        dfs = [df for df in dfs if df is not None and not df.empty]
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True, sort=False)
+        if len(df.index) > row_limit:
+            return self.get_df(query_obj)
+        return df
+
     def json_dumps(self, obj, sort_keys=False):
         return json.dumps(
             obj, default=utils.json_int_dttm_ser, ignore_nan=True, sort_keys=sort_keys
@@ -490,10 +674,9 @@ class BaseViz(object):
         }
         return content
 
-    def get_csv(self):
-        df = self.get_df()
-        include_index = not isinstance(df.index, pd.RangeIndex)
-        return df.to_csv(index=include_index, **config["CSV_EXPORT"])
+    def get_csv_frames(self) -> Iterator[pd.DataFrame]:
+        """Yields the data to export as CSV, ``CSV_EXPORT_CHUNK_ROWS`` at a time"""
+        yield from split_frame(self.get_df(), config["CSV_EXPORT_CHUNK_ROWS"])
 
     def get_data(self, df):
         return df.to_dict(orient="records")
@@ -1087,9 +1270,13 @@ class NVD3TimeSeriesViz(NVD3Viz):
     verbose_name = _("Time Series - Line Chart")
     sort_series = False
     is_timeseries = True
+    supports_incremental_cache = True
     pivot_fill_value: Optional[int] = None
 
     def to_series(self, df, classed="", title_suffix=""):
+        """Converts each numeric column of `df` into a series, either as a list
+        of `{"x", "y"}` points or, when the `series_format` form data is set to
+        `columnar`, as an `x` and a `y` list"""
         cols = []
         for col in df.columns:
             if col == "":
@@ -1099,12 +1286,17 @@ class NVD3TimeSeriesViz(NVD3Viz):
             else:
                 cols.append(col)
         df.columns = cols
-        series = df.to_dict("series")
+
+        # the x values are shared by all the series, convert them once
+        xs = self.index_to_x_values(df.index)
+        columnar = self.form_data.get("series_format") == "columnar"
 
         chart_data = []
-        for name in df.T.index.tolist():
-            ys = series[name]
-            if df[name].dtype.kind not in "biufc":
+        for i, name in enumerate(df.columns):
+            ys = df.iloc[:, i].values
+            if ys.dtype.kind not in "biufc":
+                continue
+            if not len(ys) or (ys.dtype.kind in "fc" and np.isnan(ys).all()):
                 continue
             if isinstance(name, list):
                 series_title = [str(title) for title in name]
@@ -1125,26 +1317,29 @@ class NVD3TimeSeriesViz(NVD3Viz):
                 elif isinstance(series_title, (list, tuple)):
                     series_title = series_title + (title_suffix,)
 
-            values = []
-            non_nan_cnt = 0
-            for ds in df.index:
-                if ds in ys:
-                    d = {"x": ds, "y": ys[ds]}
-                    if not np.isnan(ys[ds]):
-                        non_nan_cnt += 1
-                else:
-                    d = {}
-                values.append(d)
-
-            if non_nan_cnt == 0:
-                continue
-
-            d = {"key": series_title, "values": values}
+            if columnar:
+                d = {"key": series_title, "x": xs, "y": ys.tolist()}
+            else:
+                d = {
+                    "key": series_title,
+                    "values": [{"x": x, "y": y} for x, y in zip(xs, ys.tolist())],
+                }
             if classed:
                 d["classed"] = classed
             chart_data.append(d)
         return chart_data
 
+    @staticmethod
+    def index_to_x_values(index: pd.Index) -> List[Any]:
+        """Converts the index of a time series to the list of its x values,
+        datetimes being converted to epoch milliseconds"""
+        if isinstance(index, pd.DatetimeIndex):
+            if index.tz is not None:
+                # same as `utils.datetime_to_epoch`, which ignores the timezone
+                index = index.tz_localize(None)
+            return ((index - EPOCH).total_seconds() * 1000).tolist()
+        return index.tolist()
+
     def process_data(self, df, aggregate=False):
         fd = self.form_data
         if fd.get("granularity") == "all":
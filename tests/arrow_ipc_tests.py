@@ -0,0 +1,66 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the Arrow encoding of SQL Lab results"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from superset.utils import arrow_ipc
+
+from .base_tests import SupersetTestCase
+
+
+class ArrowIpcTests(SupersetTestCase):
+    def test_round_trip(self):
+        df = pd.DataFrame(
+            {
+                "string": ["a", None, "a"],
+                "int": [1, 2, 3],
+                "float": [1.5, np.nan, 2.0],
+                "date": [datetime.date(2019, 1, 1), None, datetime.date(2019, 1, 2)],
+                "array": [[1, 2], None, []],
+                "row": [["x", 1], ["y", 2], None],
+                "mixed": [1, "a", None],
+            }
+        )
+        table = arrow_ipc.deserialize_table(arrow_ipc.serialize_dataframe(df))
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("string").type))
+        self.assertTrue(pa.types.is_int64(table.schema.field("int").type))
+
+        records = arrow_ipc.table_to_dataframe(table).to_dict("records")
+        self.assertEqual(records[0]["string"], "a")
+        self.assertIsNone(records[1]["string"])
+        self.assertEqual(records[0]["date"], datetime.date(2019, 1, 1))
+        self.assertEqual([r["array"] for r in records], [[1, 2], None, []])
+        self.assertEqual([r["row"] for r in records], [["x", 1], ["y", 2], None])
+        self.assertEqual([r["mixed"] for r in records], [1, "a", None])
+
+    def test_concat_tables(self):
+        df = pd.DataFrame(
+            {"a": [1, 2, 3], "b": pd.Series([None, None, "x"], dtype=object)}
+        )
+        tables = [arrow_ipc.dataframe_to_table(df.iloc[:2])]
+        tables.append(arrow_ipc.dataframe_to_table(df.iloc[2:]))
+        # the columns of b are null then strings
+        self.assertFalse(tables[0].schema.equals(tables[1].schema))
+        table = arrow_ipc.concat_tables(tables)
+        self.assertEqual(
+            arrow_ipc.table_to_dataframe(table).to_dict("list"),
+            {"a": [1, 2, 3], "b": [None, None, "x"]},
+        )
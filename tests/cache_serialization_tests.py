@@ -0,0 +1,99 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the chart data cache serializers"""
+import pickle as pkl
+
+import numpy as np
+import pandas as pd
+
+from superset.utils.cache_serialization import (
+    ArrowSerializer,
+    get_serializer,
+    is_arrow_payload,
+    PickleSerializer,
+)
+
+from .base_tests import SupersetTestCase
+
+
+class CacheSerializationTests(SupersetTestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "__timestamp": pd.date_range("2019-01-01", periods=3, freq="D"),
+                "name": ["a", "b", None],
+                "sum__num": [1.0, np.nan, 3.5],
+                "count": [1, 2, 3],
+            }
+        )
+        self.value = {"dttm": "2019-01-01T00:00:00", "df": self.df, "query": "SELECT 1"}
+
+    def assert_round_trip(self, serializer):
+        blob = serializer.dumps(self.value)
+        loaded = serializer.loads(blob)
+        self.assertEqual(loaded["query"], "SELECT 1")
+        self.assertEqual(loaded["dttm"], "2019-01-01T00:00:00")
+        pd.testing.assert_frame_equal(loaded["df"], self.df)
+        return blob
+
+    def test_pickle_round_trip(self):
+        blob = self.assert_round_trip(PickleSerializer())
+        self.assertFalse(is_arrow_payload(blob))
+
+    def test_arrow_round_trip(self):
+        blob = self.assert_round_trip(ArrowSerializer())
+        self.assertTrue(is_arrow_payload(blob))
+
+    def test_arrow_compressed_round_trip(self):
+        for codec in ("lz4", "zstd"):
+            self.assert_round_trip(ArrowSerializer(codec))
+
+    def test_arrow_empty_df(self):
+        serializer = ArrowSerializer()
+        loaded = serializer.loads(serializer.dumps(dict(self.value, df=None)))
+        self.assertIsNone(loaded["df"])
+        self.assertEqual(loaded["query"], "SELECT 1")
+
+    def test_arrow_reads_legacy_pickle(self):
+        blob = pkl.dumps(self.value, protocol=pkl.HIGHEST_PROTOCOL)
+        loaded = ArrowSerializer().loads(blob)
+        pd.testing.assert_frame_equal(loaded["df"], self.df)
+
+    def test_pickle_reads_arrow(self):
+        blob = ArrowSerializer("lz4").dumps(self.value)
+        loaded = PickleSerializer().loads(blob)
+        pd.testing.assert_frame_equal(loaded["df"], self.df)
+
+    def test_arrow_falls_back_to_pickle(self):
+        value = dict(self.value, df=pd.DataFrame({"mixed": [1, "a", [1, 2]]}))
+        blob = ArrowSerializer().dumps(value)
+        self.assertFalse(is_arrow_payload(blob))
+        self.assertEqual(
+            ArrowSerializer().loads(blob)["df"]["mixed"].tolist(), [1, "a", [1, 2]]
+        )
+
+    def test_get_serializer(self):
+        self.assertIsInstance(get_serializer(None), PickleSerializer)
+        self.assertIsInstance(get_serializer("pickle"), PickleSerializer)
+        serializer = get_serializer("arrow", "zstd")
+        self.assertIsInstance(serializer, ArrowSerializer)
+        self.assertEqual(serializer.compression, "zstd")
+        self.assertIs(get_serializer(serializer), serializer)
+        with self.assertRaises(ValueError):
+            get_serializer("yaml")
+        with self.assertRaises(ValueError):
+            get_serializer("arrow", "gzip")
@@ -0,0 +1,53 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the compression of results backend payloads"""
+import json
+import zlib
+
+from superset.utils import compression
+
+from .base_tests import SupersetTestCase
+
+
+class CompressionTests(SupersetTestCase):
+    payload = json.dumps({"data": [{"a": i, "b": "foo"} for i in range(1000)]})
+
+    def test_round_trip(self):
+        for name in compression.CODECS:
+            codec = compression.get_codec(name)
+            blob = compression.compress(self.payload, codec)
+            self.assertTrue(blob.startswith(compression.MAGIC))
+            self.assertEqual(compression.decompress(blob), self.payload)
+            self.assertEqual(
+                compression.decompress(blob, decode=False), self.payload.encode()
+            )
+
+    def test_legacy_zlib_blobs(self):
+        blob = zlib.compress(self.payload.encode("utf-8"))
+        self.assertEqual(compression.decompress(blob), self.payload)
+
+    def test_get_codec(self):
+        codec = compression.get_codec({"codec": "zlib", "level": 1})
+        self.assertIsInstance(codec, compression.ZlibCodec)
+        self.assertEqual(codec.level, 1)
+        self.assertIsInstance(compression.get_codec(), compression.ZlibCodec)
+        self.assertIs(compression.get_codec(codec), codec)
+        with self.assertRaises(ValueError):
+            compression.get_codec("rar")
+        # the level changes the payload, not the way it's decompressed
+        blob = compression.compress(self.payload, compression.get_codec("zlib", 9))
+        self.assertEqual(compression.decompress(blob), self.payload)
@@ -20,6 +20,7 @@ import cgi
 import csv
 import datetime
 import doctest
+import gzip
 import io
 import json
 import logging
@@ -32,6 +33,7 @@ from unittest import mock
 
 import pandas as pd
 import psycopg2
+import pyarrow as pa
 import sqlalchemy as sqla
 
 from tests.test_app import app
@@ -41,12 +43,13 @@ from superset.db_engine_specs.base import BaseEngineSpec
 from superset.db_engine_specs.mssql import MssqlEngineSpec
 from superset.models import core as models
 from superset.models.sql_lab import Query
-from superset.utils import core as utils
+from superset.utils import arrow_ipc, core as utils
 from superset.views import core as views
 from superset.views.database.views import DatabaseView
 
 from .base_tests import SupersetTestCase
 from .fixtures.pyodbcRow import Row
+from .utils import InMemoryCache
 
 
 class CoreTests(SupersetTestCase):
@@ -143,6 +146,28 @@ class CoreTests(SupersetTestCase):
         )
         assert '"Jennifer"' in resp
 
+    def test_explore_json_batch(self):
+        self.login(username="admin")
+        slc = self.get_slice("Girls", db.session)
+        queries = [
+            slc.viz.form_data,
+            {"slice_id": slc.id},
+            {"datasource": "12345__table", "viz_type": "table"},
+        ]
+        resp = self.client.post(
+            "/superset/explore_json_batch/", data={"queries": json.dumps(queries)}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in resp.data.decode("utf-8").splitlines()]
+        results = {line["index"]: line for line in lines}
+        self.assertEqual(set(results), {0, 1, 2})
+        self.assertFalse(results[0]["error"])
+        self.assertIn("Jennifer", json.dumps(results[0]["payload"]["data"]))
+        self.assertEqual(results[1]["slice_id"], slc.id)
+        self.assertEqual(results[0]["payload"]["data"], results[1]["payload"]["data"])
+        self.assertTrue(results[2]["error"])
+
     def test_slice_json_endpoint(self):
         self.login(username="admin")
         slc = self.get_slice("Girls", db.session)
@@ -488,6 +513,22 @@ class CoreTests(SupersetTestCase):
         self.assertEqual(list(expected_data), list(data))
         self.logout()
 
+    @mock.patch.dict(app.config, {"CSV_EXPORT_GZIP": True})
+    def test_csv_endpoint_gzip(self):
+        self.login("admin")
+        sql = "SELECT name FROM birth_names WHERE name = 'James' LIMIT 1"
+        client_id = "{}".format(random.getrandbits(64))[:10]
+        self.run_sql(sql, client_id, raise_on_error=True)
+
+        resp = self.client.get(
+            "/superset/csv/{}".format(client_id), headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        data = csv.reader(io.StringIO(gzip.decompress(resp.data).decode("utf-8")))
+        expected_data = csv.reader(io.StringIO("name\nJames\n"))
+        self.assertEqual(list(expected_data), list(data))
+        self.logout()
+
     def test_extra_table_metadata(self):
         self.login("admin")
         dbid = utils.get_example_database().id
@@ -733,9 +774,7 @@ class CoreTests(SupersetTestCase):
         query_mock.sql = "SELECT *"
         query_mock.database = 1
         query_mock.schema = "superset"
-        mock_superset_db.session.query().filter_by().one_or_none.return_value = (
-            query_mock
-        )
+        mock_superset_db.session.query().filter_by().all.return_value = [query_mock]
 
         data = [{"col_0": i} for i in range(100)]
         payload = {
@@ -768,6 +807,164 @@ class CoreTests(SupersetTestCase):
 
         app.config["RESULTS_BACKEND_USE_MSGPACK"] = use_msgpack
 
+    @mock.patch("superset.views.core.results_backend_use_msgpack", False)
+    @mock.patch("superset.views.core.db")
+    def test_results_chunks(self, mock_superset_db):
+        query_mock = mock.Mock()
+        query_mock.sql = "SELECT *"
+        query_mock.database = 1
+        query_mock.schema = "superset"
+        mock_superset_db.session.query().filter_by().all.return_value = [query_mock]
+
+        data = [{"col_0": i} for i in range(100)]
+        cdf = mock.Mock(data=data)
+        payload = {
+            "status": utils.QueryStatus.SUCCESS,
+            "query": {"rows": 100},
+            "columns": [{"name": "col_0"}],
+            "data": data,
+        }
+        results_backend = InMemoryCache()
+        with mock.patch("superset.sql_lab.results_backend", results_backend):
+            sql_lab._store_results_chunks("key", payload, cdf, 30, 60)
+        self.assertEqual(len(results_backend.keys()), 5)
+
+        with mock.patch("superset.views.core.results_backend", results_backend):
+            with mock.patch.object(
+                results_backend, "get_many", wraps=results_backend.get_many
+            ) as get_many:
+                result = json.loads(
+                    self.get_resp("/superset/results/key/?offset=50&limit=20")
+                )
+                get_many.assert_called_once_with("key/chunk/1", "key/chunk/2")
+            self.assertEqual(result["data"], data[50:70])
+            self.assertTrue(result["displayLimitReached"])
+
+            result = json.loads(self.get_resp("/superset/results/key/?offset=90"))
+            self.assertEqual(result["data"], data[90:])
+            self.assertNotIn("displayLimitReached", result)
+
+            result = json.loads(self.get_resp("/superset/results/key/"))
+            self.assertEqual(result["data"], data)
+
+            results_backend.delete("key/chunk/3")
+            resp = self.client.get("/superset/results/key/?offset=80")
+            self.assertEqual(resp.status_code, 410)
+
+    @mock.patch.dict("superset.sql_lab.config", {"RESULTS_BACKEND_CHUNK_ROWS": 30})
+    @mock.patch("superset.views.core.results_backend_use_msgpack", False)
+    @mock.patch("superset.views.core.db")
+    def test_results_streamed(self, mock_superset_db):
+        query_mock = mock.Mock()
+        query_mock.sql = "SELECT *"
+        query_mock.database = 1
+        query_mock.schema = "superset"
+        mock_superset_db.session.query().filter_by().all.return_value = [query_mock]
+
+        rows = [(i,) for i in range(100)]
+        cursor = mock.Mock(description=[("col_0", "int")])
+        batches = [rows[i : i + 30] for i in range(0, 100, 30)]
+        cursor.fetchmany.side_effect = batches + [[]]
+        results_backend = InMemoryCache()
+        writer = sql_lab.ResultsChunkWriter("key", 60)
+        with mock.patch("superset.sql_lab.results_backend", results_backend):
+            sql_lab._stream_results(
+                cursor, mock.Mock(limit=None), BaseEngineSpec, writer
+            )
+            self.assertEqual(writer.chunk_sizes, [30, 30, 30, 10])
+            self.assertEqual(writer.rows, 100)
+            writer.close(
+                {
+                    "status": utils.QueryStatus.SUCCESS,
+                    "query": {"rows": 100},
+                    "columns": writer.columns,
+                    "data": None,
+                }
+            )
+        self.assertEqual(len(results_backend.keys()), 5)
+
+        with mock.patch("superset.views.core.results_backend", results_backend):
+            result = json.loads(self.get_resp("/superset/results/key/?offset=50"))
+            self.assertEqual(result["data"], [{"col_0": i} for i in range(50, 100)])
+
+    @mock.patch("superset.views.core.results_backend_use_msgpack", True)
+    @mock.patch("superset.views.core.db")
+    def test_results_arrow(self, mock_superset_db):
+        query_mock = mock.Mock()
+        query_mock.sql = "SELECT *"
+        query_mock.database.db_engine_spec = BaseEngineSpec
+        query_mock.schema = "superset"
+        mock_superset_db.session.query().filter_by().all.return_value = [query_mock]
+
+        df = pd.DataFrame({"col_0": range(100), "col_1": ["a", "b"] * 50})
+        cdf = mock.Mock(raw_df=df)
+        payload = {
+            "status": utils.QueryStatus.SUCCESS,
+            "query": {"rows": 100},
+            "columns": [{"name": "col_0"}, {"name": "col_1"}],
+            "selected_columns": [{"name": "col_0"}, {"name": "col_1"}],
+            "data": arrow_ipc.serialize_dataframe(df),
+            "data_format": arrow_ipc.ARROW_DATA_FORMAT,
+        }
+        results_backend = InMemoryCache()
+        with mock.patch("superset.sql_lab.results_backend", results_backend):
+            sql_lab._store_results_chunks("key", payload, cdf, 30, 60, True)
+
+        with mock.patch("superset.views.core.results_backend", results_backend):
+            resp = self.client.get(
+                "/superset/results/key/?format=arrow&offset=50&limit=20"
+            )
+            self.assertEqual(resp.mimetype, arrow_ipc.ARROW_STREAM_MIMETYPE)
+            table = pa.ipc.open_stream(pa.py_buffer(resp.data)).read_all()
+            self.assertEqual(table.column_names, ["col_0", "col_1"])
+            self.assertTrue(pa.types.is_dictionary(table.schema.field("col_1").type))
+            pd.testing.assert_frame_equal(
+                arrow_ipc.table_to_dataframe(table),
+                df.iloc[50:70].reset_index(drop=True),
+            )
+
+            resp = self.client.get(
+                "/superset/results/key/",
+                headers={"Accept": arrow_ipc.ARROW_STREAM_MIMETYPE},
+            )
+            self.assertEqual(resp.mimetype, arrow_ipc.ARROW_STREAM_MIMETYPE)
+            table = pa.ipc.open_stream(pa.py_buffer(resp.data)).read_all()
+            self.assertEqual(table.num_rows, 100)
+
+            # JSON stays the default
+            result = json.loads(self.get_resp("/superset/results/key/?limit=2"))
+            self.assertEqual(
+                result["data"], [{"col_0": 0, "col_1": "a"}, {"col_0": 1, "col_1": "b"}]
+            )
+
+    def test_iter_results_chunks_expands_data(self):
+        df = pd.DataFrame({"col_0": range(50)})
+        selected_columns = [{"name": "col_0"}]
+        manifest = {
+            "columns": selected_columns,
+            "selected_columns": selected_columns,
+            "data_format": arrow_ipc.ARROW_DATA_FORMAT,
+        }
+        results_backend = InMemoryCache()
+        with mock.patch("superset.sql_lab.results_backend", results_backend):
+            sql_lab._store_results_chunks(
+                "key", dict(manifest), mock.Mock(raw_df=df), 30, 60, True
+            )
+        manifest["chunks"] = [30, 20]
+
+        def expand_data(columns, data):
+            all_columns = columns + [{"name": "col_0.double"}]
+            data = [dict(row, **{"col_0.double": row["col_0"] * 2}) for row in data]
+            return all_columns, data, all_columns[1:]
+
+        query = mock.Mock()
+        query.database.db_engine_spec.expand_data.side_effect = expand_data
+        with mock.patch("superset.views.core.results_backend", results_backend):
+            frames = list(views._iter_results_chunks("key", manifest, query, True))
+        self.assertEqual([len(frame.index) for frame in frames], [30, 20])
+        self.assertEqual(list(frames[1].columns), ["col_0", "col_0.double"])
+        self.assertEqual(frames[1]["col_0.double"].tolist(), list(range(60, 100, 2)))
+
     def test_results_default_deserialization(self):
         use_new_deserialization = False
         data = [("a", 4, 4.0, "2019-08-18T16:39:16.660000")]
@@ -835,6 +1032,7 @@ class CoreTests(SupersetTestCase):
             "status": utils.QueryStatus.SUCCESS,
             "state": utils.QueryStatus.SUCCESS,
             "data": serialized_data,
+            "data_format": arrow_ipc.ARROW_DATA_FORMAT,
             "columns": all_columns,
             "selected_columns": selected_columns,
             "expanded_columns": expanded_columns,
@@ -0,0 +1,75 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the streaming of CSV exports"""
+import gzip
+from unittest import mock
+
+import pandas as pd
+
+from superset.utils.csv_stream import split_frame, stream_csv
+
+from .base_tests import SupersetTestCase
+
+
+class CsvStreamTests(SupersetTestCase):
+    def test_split_frame(self):
+        df = pd.DataFrame({"a": range(25)})
+        self.assertEqual([len(f.index) for f in split_frame(df, 10)], [10, 10, 5])
+        self.assertEqual([len(f.index) for f in split_frame(df, 0)], [25])
+        empty = list(split_frame(pd.DataFrame(columns=["a"]), 10))
+        self.assertEqual(len(empty), 1)
+        self.assertEqual(list(empty[0].columns), ["a"])
+
+    def test_stream_csv(self):
+        df = pd.DataFrame({"a": range(25), "b": [f"ü{i}" for i in range(25)]})
+        stats_logger = mock.Mock()
+        chunks = list(
+            stream_csv(split_frame(df, 10), stats_logger=stats_logger, encoding="utf-8")
+        )
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks), df.to_csv(index=False).encode("utf-8"))
+        keys = [call[0][0] for call in stats_logger.timing.call_args_list]
+        self.assertEqual(
+            keys,
+            [
+                "csv_export.time_to_first_byte",
+                "csv_export.duration",
+                "csv_export.peak_memory",
+            ],
+        )
+
+    def test_stream_csv_index(self):
+        df = pd.DataFrame({"a": [1, 2]}, index=pd.Index(["x", "y"], name="key"))
+        csv = b"".join(stream_csv([df], index=None))
+        self.assertEqual(csv, df.to_csv().encode("utf-8"))
+        df = df.reset_index()
+        csv = b"".join(stream_csv([df], index=None))
+        self.assertEqual(csv, df.to_csv(index=False).encode("utf-8"))
+
+    def test_stream_csv_gzip(self):
+        df = pd.DataFrame({"a": range(100)})
+        csv = b"".join(stream_csv(split_frame(df, 30), compress=True))
+        self.assertEqual(gzip.decompress(csv), df.to_csv(index=False).encode("utf-8"))
+
+    def test_stream_csv_errors(self):
+        def frames():
+            raise ValueError("query failed")
+            yield  # pylint: disable=unreachable
+
+        # errors raised when fetching the first frame are raised right away
+        with self.assertRaises(ValueError):
+            stream_csv(frames())
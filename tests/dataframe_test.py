@@ -14,12 +14,19 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
 import numpy as np
 import pandas as pd
+import simplejson as json
+from pandas.core.common import maybe_box_datetimelike
 
-from superset.dataframe import dedup, SupersetDataFrame
+from superset.dataframe import dedup, df_from_cursor, SupersetDataFrame
 from superset.db_engine_specs import BaseEngineSpec
 from superset.db_engine_specs.presto import PrestoEngineSpec
+from superset.utils.core import JS_MAX_INTEGER
 
 from .base_tests import SupersetTestCase
 
@@ -157,3 +164,92 @@ class SupersetDataFrameTestCase(SupersetTestCase):
         cdf = SupersetDataFrame(data, cursor_descr, PrestoEngineSpec)
         self.assertEqual(cdf.raw_df.dtypes[0], np.dtype("O"))
         self.assertEqual(cdf.raw_df.dtypes[1], pd.Int64Dtype())
+
+    def test_df_from_cursor(self):
+        data = [(i, f"name_{i}", None if i < 3 else i * 1.5) for i in range(10)]
+        expected = pd.DataFrame.from_records(
+            data, columns=["id", "name", "value"], coerce_float=True
+        )
+        for batch_size in (1, 3, 100):
+            cursor = mock.Mock()
+            cursor.fetchmany.side_effect = [
+                data[i : i + batch_size] for i in range(0, len(data), batch_size)
+            ] + [[]]
+            df = df_from_cursor(cursor, ["id", "name", "value"], batch_size)
+            pd.testing.assert_frame_equal(df, expected)
+
+    def test_df_from_cursor_row_limit(self):
+        data = [(i,) for i in range(10)]
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = lambda size: [data.pop(0) for _ in range(size)]
+        df = df_from_cursor(cursor, ["id"], 3, row_limit=5)
+        self.assertEqual(df["id"].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(cursor.fetchmany.call_count, 2)
+        self.assertEqual(len(data), 5)
+
+    def test_df_from_cursor_dtype(self):
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = [[(1, "a"), (None, "b")], []]
+        df = df_from_cursor(cursor, ["one", "two"], 2, dtype={"one": "Int64"})
+        self.assertEqual(df.dtypes["one"], pd.Int64Dtype())
+        self.assertEqual(df.dtypes["two"], np.dtype("O"))
+
+    def test_df_from_cursor_dtype_decimal(self):
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = [
+            [(Decimal("1.5"), Decimal("1"), "a"), (None, "b", "b")],
+            [],
+        ]
+        df = df_from_cursor(cursor, ["one", "two", "three"], 2, dtype={"one": "object"})
+        self.assertEqual(df.dtypes["one"], np.dtype("float64"))
+        self.assertEqual(df["one"][0], 1.5)
+        # columns mixing decimals and other values are left untouched
+        self.assertEqual(df["two"].tolist(), [Decimal("1"), "b"])
+
+    def test_df_from_cursor_empty(self):
+        cursor = mock.Mock()
+        cursor.fetchmany.return_value = []
+        df = df_from_cursor(cursor, ["one", "two"], 10)
+        self.assertTrue(df.empty)
+        self.assertListEqual(list(df.columns), ["one", "two"])
+
+    def test_format_data(self):
+        big = JS_MAX_INTEGER + 1
+        df = pd.DataFrame(
+            {
+                "int": [1, big, -big],
+                "float": [1.5, np.nan, 3.0],
+                "bool": [True, False, True],
+                "dttm": pd.to_datetime(["2019-01-01", None, "2019-01-03 04:05:06"]),
+                "str": ["a", None, "c"],
+                "obj": [datetime(2019, 1, 1), big, "c"],
+            }
+        )
+        data = SupersetDataFrame.format_data(df)
+        # same output as the previous row by row implementation
+        expected = [
+            {k: maybe_box_datetimelike(v) for k, v in zip(df.columns, row)}
+            for row in df.values
+        ]
+        for row in expected:
+            for k, v in row.items():
+                if isinstance(v, int) and abs(v) > JS_MAX_INTEGER:
+                    row[k] = str(v)
+        self.assertEqual(
+            json.dumps(data, default=str), json.dumps(expected, default=str)
+        )
+        self.assertEqual([row["int"] for row in data], [1, str(big), str(-big)])
+        self.assertIsInstance(data[0]["int"], int)
+        self.assertIs(data[1]["dttm"], pd.NaT)
+        self.assertEqual(data[2]["dttm"], datetime(2019, 1, 3, 4, 5, 6))
+
+        columns = SupersetDataFrame.format_data(df, columnar=True)
+        self.assertEqual(list(columns), list(df.columns))
+        self.assertEqual(columns["int"], [1, str(big), str(-big)])
+        self.assertEqual(columns["obj"], [pd.Timestamp("2019-01-01"), str(big), "c"])
+
+    def test_format_data_empty(self):
+        self.assertEqual(SupersetDataFrame.format_data(pd.DataFrame()), [])
+        df = pd.DataFrame({"a": []})
+        self.assertEqual(SupersetDataFrame.format_data(df), [])
+        self.assertEqual(SupersetDataFrame.format_data(df, columnar=True), {"a": []})
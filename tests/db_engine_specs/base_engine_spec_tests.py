@@ -206,3 +206,18 @@ class DbEngineSpecsTests(DbEngineSpecTestCase):
     def test_convert_dttm(self):
         dttm = self.get_dttm()
         self.assertIsNone(BaseEngineSpec.convert_dttm("", dttm))
+
+    def test_fetch_data_in_batches(self):
+        rows = [(i,) for i in range(10)]
+
+        def fetchmany(size):
+            batch = rows[: min(size, len(rows))]
+            del rows[: len(batch)]
+            return batch
+
+        cursor = mock.Mock()
+        cursor.fetchmany.side_effect = fetchmany
+        batches = list(BaseEngineSpec.fetch_data_in_batches(cursor, 7, 3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        batches = list(BaseEngineSpec.fetch_data_in_batches(cursor, None, 2))
+        self.assertEqual(batches, [[(7,), (8,)], [(9,)]])
@@ -435,3 +435,29 @@ class PrestoTests(DbEngineSpecTestCase):
             }
         ]
         self.assertEqual(formatted_cost, expected)
+
+    @mock.patch("superset.db_engine_specs.presto.time")
+    @mock.patch("superset.db_engine_specs.presto.query_progress_reporter")
+    def test_handle_cursor(self, reporter, time):
+        reporter.is_stopped.return_value = False
+        running = {
+            "stats": {"state": "RUNNING", "completedSplits": 1, "totalSplits": 4}
+        }
+        cursor = mock.Mock()
+        cursor.poll.side_effect = [running, running, running, None]
+        query = mock.Mock()
+        session = mock.Mock()
+        PrestoEngineSpec.handle_cursor(cursor, query, session)
+
+        # the cursor is polled more and more slowly
+        sleeps = [call[0][0] for call in time.sleep.call_args_list]
+        self.assertEqual(sleeps, [0.05, 0.1, 0.2])
+        reporter.report.assert_called_with(query, progress=25.0)
+        reporter.done.assert_called_once_with(query, session)
+        session.commit.assert_not_called()
+
+        # stop requests cancel the query
+        reporter.is_stopped.return_value = True
+        cursor.poll.side_effect = [running, None]
+        PrestoEngineSpec.handle_cursor(cursor, query, session)
+        cursor.cancel.assert_called_once()
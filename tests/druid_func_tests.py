@@ -16,10 +16,19 @@
 # under the License.
 import json
 import unittest
+from datetime import datetime
 from unittest.mock import Mock
 
+import pandas as pd
+
 import superset.connectors.druid.models as models
-from superset.connectors.druid.models import DruidColumn, DruidDatasource, DruidMetric
+from superset.connectors.druid import sql as druid_sql
+from superset.connectors.druid.models import (
+    DruidCluster,
+    DruidColumn,
+    DruidDatasource,
+    DruidMetric,
+)
 from superset.exceptions import SupersetException
 
 from .base_tests import SupersetTestCase
@@ -31,6 +40,7 @@ try:
         RegisteredLookupExtraction,
         TimeFormatExtraction,
     )
+    from pydruid.utils.filters import Dimension, Filter
     import pydruid.utils.postaggregator as postaggs
 except ImportError:
     pass
@@ -1148,3 +1158,220 @@ class DruidFuncTestCase(SupersetTestCase):
         self.assertRaises(
             SupersetException, ds.get_aggregations, metrics_dict, metric_names
         )
+
+    def test_build_sql_query(self):
+        ds = DruidDatasource(datasource_name="datasource")
+        ds.columns = [
+            DruidColumn(column_name="dim1"),
+            DruidColumn(column_name="dim2"),
+            DruidColumn(column_name="num", type="LONG"),
+        ]
+        ds.metrics = [
+            DruidMetric(
+                metric_name="sum1",
+                metric_type="longSum",
+                json=json.dumps({"type": "longSum", "name": "sum1", "fieldName": "a"}),
+            ),
+            DruidMetric(
+                metric_name="div1",
+                metric_type="postagg",
+                json=json.dumps({"type": "arithmetic", "name": "div1", "fn": "/"}),
+            ),
+        ]
+        query_obj = {
+            "groupby": ["dim1"],
+            "metrics": ["sum1"],
+            "granularity": "one day",
+            "from_dttm": datetime(2020, 1, 1),
+            "to_dttm": datetime(2020, 2, 1),
+            "filter": [
+                {"col": "dim2", "op": "in", "val": ["a", "b'c"]},
+                {"col": "num", "op": ">", "val": "3"},
+            ],
+            "is_timeseries": True,
+            "timeseries_limit": 10,
+            "row_limit": 100,
+            "extras": {"having_druid": [{"col": "sum1", "op": ">", "val": 5}]},
+        }
+        sql = druid_sql.build_query(ds, **query_obj)
+        self.assertIn(
+            "TIME_FLOOR(\"__time\", 'P1D', NULL, 'UTC') AS \"__timestamp\"", sql
+        )
+        self.assertIn("\"dim2\" IN ('a', 'b''c')", sql)
+        self.assertIn('"num" > 3', sql)
+        self.assertIn('HAVING SUM("a") > 5', sql)
+        # the series are limited with a subquery rather than a second query
+        self.assertIn('"dim1" IN (SELECT "dim1"', sql)
+        self.assertIn("LIMIT 10)", sql)
+        self.assertTrue(sql.endswith('ORDER BY SUM("a") DESC\nLIMIT 100'))
+
+        sql = druid_sql.build_query(ds, **dict(query_obj, groupby=["dim1", "dim2"]))
+        self.assertIn('"dim1" = "__series_0" AND "dim2" = "__series_1"', sql)
+
+        # post aggregations are only supported by native queries
+        query_obj["metrics"] = ["div1"]
+        with self.assertRaises(druid_sql.UnsupportedQueryException):
+            druid_sql.build_query(ds, **query_obj)
+        ds.cluster = DruidCluster(cluster_name="cluster", use_sql=True)
+        self.assertIsNone(ds.get_sql_query_str(query_obj))
+        query_obj["metrics"] = ["sum1"]
+        self.assertIsNotNone(ds.get_sql_query_str(query_obj))
+
+    def test_read_array_lines(self):
+        lines = [b'["dim1","sum1"]'] + [
+            json.dumps([f"value_{i}", i]).encode() for i in range(25)
+        ]
+        df = druid_sql.read_array_lines(lines + [b""], batch_rows=10)
+        self.assertEqual(list(df.columns), ["dim1", "sum1"])
+        self.assertEqual(list(df["sum1"]), list(range(25)))
+        self.assertEqual(list(df.index), list(range(25)))
+        self.assertTrue(druid_sql.read_array_lines([b'["dim1"]', b""]).empty)
+
+    @unittest.skipUnless(
+        SupersetTestCase.is_module_installed("pydruid"), "pydruid not installed"
+    )
+    def test_add_filter_from_pre_query_data(self):
+        ds = DruidDatasource(datasource_name="datasource")
+        df = pd.DataFrame(
+            {"dim1": ["a", "a", None, "b"], "dim2": ["x", "y", "x", None]}
+        )
+        dim_filter = Dimension("dim3") == "z"
+        flt = ds._add_filter_from_pre_query_data(df, ["dim1", "dim2"], dim_filter)
+        self.assertEqual(
+            Filter.build_filter(flt),
+            {
+                "type": "and",
+                "fields": [
+                    {
+                        "type": "or",
+                        "fields": [
+                            {
+                                "type": "and",
+                                "fields": [
+                                    {
+                                        "type": "selector",
+                                        "dimension": "dim1",
+                                        "value": "a",
+                                    },
+                                    {
+                                        "type": "in",
+                                        "dimension": "dim2",
+                                        "values": ["x", "y"],
+                                    },
+                                ],
+                            },
+                            {
+                                "type": "and",
+                                "fields": [
+                                    {
+                                        "type": "selector",
+                                        "dimension": "dim1",
+                                        "value": None,
+                                    },
+                                    {
+                                        "type": "selector",
+                                        "dimension": "dim2",
+                                        "value": "x",
+                                    },
+                                ],
+                            },
+                            {
+                                "type": "and",
+                                "fields": [
+                                    {
+                                        "type": "selector",
+                                        "dimension": "dim1",
+                                        "value": "b",
+                                    },
+                                    {
+                                        "type": "selector",
+                                        "dimension": "dim2",
+                                        "value": None,
+                                    },
+                                ],
+                            },
+                        ],
+                    },
+                    {"type": "selector", "dimension": "dim3", "value": "z"},
+                ],
+            },
+        )
+
+        df = pd.DataFrame({"dim1": ["a", None, "b"]})
+        flt = ds._add_filter_from_pre_query_data(df, ["dim1"], None)
+        self.assertEqual(
+            Filter.build_filter(flt),
+            {
+                "type": "or",
+                "fields": [
+                    {"type": "in", "dimension": "dim1", "values": ["a", None, "b"]}
+                ],
+            },
+        )
+        self.assertIsNone(
+            ds._add_filter_from_pre_query_data(df.iloc[:0], ["dim1"], None)
+        )
+
+    @unittest.skipUnless(
+        SupersetTestCase.is_module_installed("pydruid"), "pydruid not installed"
+    )
+    def test_add_filter_from_pre_query_data_extraction_fn(self):
+        ds = DruidDatasource(datasource_name="datasource")
+        dimension_spec = {
+            "type": "extraction",
+            "dimension": "device",
+            "outputName": "deviceName",
+            "outputType": "STRING",
+            "extractionFn": {"type": "regex", "expr": "(\\w+)"},
+        }
+        extraction_fn = {"type": "regex", "expr": "(\\w+)"}
+        df = pd.DataFrame(
+            {"dim1": ["a", "a", "b"], "deviceName": ["iPhone", "Pixel", "iPhone"]}
+        )
+        flt = ds._add_filter_from_pre_query_data(df, ["dim1", dimension_spec], None)
+        self.assertEqual(
+            Filter.build_filter(flt),
+            {
+                "type": "or",
+                "fields": [
+                    {
+                        "type": "and",
+                        "fields": [
+                            {"type": "selector", "dimension": "dim1", "value": "a"},
+                            {
+                                "type": "in",
+                                "dimension": "device",
+                                "values": ["iPhone", "Pixel"],
+                                "extractionFn": extraction_fn,
+                            },
+                        ],
+                    },
+                    {
+                        "type": "and",
+                        "fields": [
+                            {"type": "selector", "dimension": "dim1", "value": "b"},
+                            {
+                                "type": "selector",
+                                "dimension": "device",
+                                "value": "iPhone",
+                                "extractionFn": extraction_fn,
+                            },
+                        ],
+                    },
+                ],
+            },
+        )
+
+        # the output name of dimension specs without extraction function is used
+        dimension_spec = {"dimension": "device", "outputName": "deviceName"}
+        flt = ds._add_filter_from_pre_query_data(df, [dimension_spec], None)
+        self.assertEqual(
+            Filter.build_filter(flt)["fields"],
+            [
+                {
+                    "type": "in",
+                    "dimension": "deviceName",
+                    "values": ["iPhone", "Pixel", "iPhone"],
+                }
+            ],
+        )
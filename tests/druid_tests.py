@@ -141,6 +141,9 @@ class DruidTests(SupersetTestCase):
 
         db.session.add(cluster)
         cluster.get_datasources = PickableMock(return_value=["test_datasource"])
+        cluster.get_datasource_schema = PickableMock(
+            return_value={"dimensions": ["dim1", "dim2"], "metrics": ["metric1"]}
+        )
 
         return cluster
 
@@ -434,6 +437,8 @@ class DruidTests(SupersetTestCase):
         metadata[0]["columns"]["metric1"]["type"] = "LONG"
         instance = PyDruid.return_value
         instance.segment_metadata.return_value = metadata
+        # the datasource is refreshed once its segments changed
+        instance.time_boundary.return_value = [{"result": {"maxTime": "2016-01-02"}}]
         cluster.refresh_datasources()
         datasource = cluster.datasources[0]
 
@@ -478,7 +483,7 @@ class DruidTests(SupersetTestCase):
         db.session.commit()
 
         # The verbose name should not change during a refresh.
-        cluster.refresh_datasources()
+        cluster.refresh_datasources(force=True)
         datasource = cluster.datasources[0]
 
         metrics = (
@@ -490,6 +495,61 @@ class DruidTests(SupersetTestCase):
         for metric in metrics:
             self.assertEqual(metric.verbose_name, metric.metric_name)
 
+    @unittest.skipUnless(
+        SupersetTestCase.is_module_installed("pydruid"), "pydruid not installed"
+    )
+    @patch("superset.connectors.druid.models.flasher")
+    @patch("superset.connectors.druid.models.PyDruid")
+    def test_refresh_metadata_unchanged_segments(self, PyDruid, flasher):
+        self.login(username="admin")
+        cluster = self.get_cluster(PyDruid)
+        cluster.refresh_datasources()
+        datasource = cluster.datasources[0]
+        fingerprint = datasource.segments_fingerprint
+        self.assertIsNotNone(fingerprint)
+
+        instance = PyDruid.return_value
+        instance.segment_metadata.reset_mock()
+        flasher.reset_mock()
+        cluster.refresh_datasources()
+        instance.segment_metadata.assert_not_called()
+        # only the datasources actually refreshed are reported
+        flasher.assert_not_called()
+
+        cluster.refresh_datasources(force=True)
+        instance.segment_metadata.assert_called_once()
+        flasher.assert_called_once()
+
+        instance.segment_metadata.reset_mock()
+        instance.time_boundary.return_value = [
+            {"result": {"minTime": "2015-01-01", "maxTime": "2016-01-02"}}
+        ]
+        cluster.refresh_datasources()
+        instance.segment_metadata.assert_called_once()
+        datasource = cluster.datasources[0]
+        self.assertNotEqual(datasource.segments_fingerprint, fingerprint)
+
+        # segments re-indexed with new dimensions are refreshed
+        instance.segment_metadata.reset_mock()
+        cluster.get_datasource_schema.return_value = {
+            "dimensions": ["dim1", "dim2", "dim3"],
+            "metrics": ["metric1"],
+        }
+        cluster.refresh_datasources()
+        instance.segment_metadata.assert_called_once()
+
+    @unittest.skipUnless(
+        SupersetTestCase.is_module_installed("pydruid"), "pydruid not installed"
+    )
+    @patch("superset.connectors.druid.models.DruidCluster.refresh_datasources")
+    def test_refresh_datasources_view(self, refresh_datasources):
+        self.login(username="admin")
+        self.client.get("/druid/refresh_datasources/")
+        refresh_datasources.assert_called_with(refresh_all=True, force=False)
+
+        self.client.get("/druid/refresh_datasources/?force=true")
+        refresh_datasources.assert_called_with(refresh_all=True, force=True)
+
     @unittest.skipUnless(
         SupersetTestCase.is_module_installed("pydruid"), "pydruid not installed"
     )
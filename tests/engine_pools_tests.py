@@ -0,0 +1,100 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the database connection pools"""
+import os
+import tempfile
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from superset.utils.engine_pools import EnginePoolManager, get_pool_params
+
+from .base_tests import SupersetTestCase
+
+
+class EnginePoolManagerTests(SupersetTestCase):
+    def setUp(self):
+        self.manager = EnginePoolManager()
+        self.manager.max_count = 2
+        self.manager.stats_logger = mock.Mock()
+        self.db_file = tempfile.NamedTemporaryFile(suffix=".db")
+
+    def tearDown(self):
+        self.manager.dispose()
+        self.db_file.close()
+
+    def create_engine(self):
+        return create_engine(
+            f"sqlite:///{self.db_file.name}", poolclass=QueuePool, pool_size=1
+        )
+
+    def test_get_pool_params(self):
+        self.assertEqual(
+            get_pool_params({"pool_size": 5, "pool_recycle": 3600, "foo": "bar"}),
+            {"pool_size": 5, "pool_recycle": 3600, "pool_pre_ping": True},
+        )
+        self.assertEqual(
+            get_pool_params({"pool_pre_ping": False}), {"pool_pre_ping": False}
+        )
+
+    def test_get_engine(self):
+        engine = self.manager.get_engine("a", self.create_engine, "db_pool.1")
+        self.assertIs(
+            self.manager.get_engine("a", self.create_engine, "db_pool.1"), engine
+        )
+        self.assertIsNot(
+            self.manager.get_engine("b", self.create_engine, "db_pool.1"), engine
+        )
+        self.manager.stats_logger.gauge.assert_called_with("db_pool.count", 2)
+
+        with engine.connect() as conn:
+            conn.execute("SELECT 1")
+            self.manager.stats_logger.gauge.assert_called_with("db_pool.1.overflow", 0)
+            self.manager.stats_logger.gauge.assert_any_call("db_pool.1.checked_out", 1)
+        self.manager.stats_logger.gauge.assert_any_call("db_pool.1.checked_out", 0)
+
+    def test_get_engine_without_queue_pool(self):
+        engine = self.manager.get_engine(
+            "a", lambda: create_engine("sqlite://", poolclass=StaticPool), "db_pool.1"
+        )
+        with engine.connect() as conn:
+            conn.execute("SELECT 1")
+        self.manager.stats_logger.gauge.assert_called_once_with("db_pool.count", 1)
+
+    def test_eviction(self):
+        engine = self.manager.get_engine("a", self.create_engine, "db_pool.1")
+        self.manager.get_engine("b", self.create_engine, "db_pool.1")
+        # a is now the most recently used engine
+        self.manager.get_engine("a", self.create_engine, "db_pool.1")
+        with mock.patch.object(engine, "dispose") as dispose:
+            self.manager.get_engine("c", self.create_engine, "db_pool.1")
+            dispose.assert_not_called()
+        self.assertEqual(len(self.manager), 2)
+        self.manager.stats_logger.incr.assert_called_once_with("db_pool.eviction")
+
+    def test_fork_safety(self):
+        engine = self.manager.get_engine("a", self.create_engine, "db_pool.1")
+        with engine.connect() as conn:
+            conn.execute("SELECT 1")
+            parent_connection = conn.connection.connection
+
+        # connections opened by the parent process are not used by its forks
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            with engine.connect() as conn:
+                conn.execute("SELECT 1")
+                self.assertIsNot(conn.connection.connection, parent_connection)
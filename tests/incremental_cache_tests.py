@@ -0,0 +1,180 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the incremental caching of time series charts"""
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+
+import superset.viz as viz
+from superset import app
+from superset.utils.core import DTTM_ALIAS
+from superset.utils.incremental_cache import get_chunk_duration, split_time_range
+
+from .base_tests import SupersetTestCase
+from .utils import InMemoryCache
+
+
+def hourly_df(query_obj):
+    index = pd.date_range(
+        query_obj["from_dttm"], query_obj["to_dttm"], freq="H", closed="left"
+    )
+    return pd.DataFrame({DTTM_ALIAS: index, "sum__num": index.day * 100 + index.hour})
+
+
+def chunk_keys(cache):
+    return [key for key in cache.keys() if key.startswith("incremental/")]
+
+
+class IncrementalCacheTests(SupersetTestCase):
+    def test_get_chunk_duration(self):
+        day = timedelta(days=1)
+        self.assertEqual(get_chunk_duration("PT1H", day), day)
+        self.assertEqual(get_chunk_duration("P1D", timedelta(hours=1)), day)
+        self.assertEqual(
+            get_chunk_duration("PT15M", timedelta(minutes=20)), timedelta(minutes=15)
+        )
+        self.assertIsNone(get_chunk_duration("P1M", day))
+        self.assertIsNone(get_chunk_duration(None, day))
+
+    def test_split_time_range(self):
+        day = timedelta(days=1)
+        self.assertEqual(
+            split_time_range(datetime(2019, 1, 1), datetime(2019, 1, 3), day),
+            [
+                (datetime(2019, 1, 1), datetime(2019, 1, 2)),
+                (datetime(2019, 1, 2), datetime(2019, 1, 3)),
+            ],
+        )
+        self.assertEqual(
+            split_time_range(datetime(2019, 1, 1, 12), datetime(2019, 1, 2, 6), day),
+            [
+                (datetime(2019, 1, 1, 12), datetime(2019, 1, 2)),
+                (datetime(2019, 1, 2), datetime(2019, 1, 2, 6)),
+            ],
+        )
+        self.assertEqual(
+            split_time_range(datetime(2019, 1, 1), datetime(2019, 1, 1), day), []
+        )
+
+    def get_viz(self, time_range, **form_data):
+        datasource = self.get_datasource_mock()
+        datasource.offset = 0
+        datasource.uid = "1__table"
+        datasource.cache_timeout = None
+        datasource.get_extra_cache_keys = mock.Mock(return_value=[])
+        datasource.get_change_fingerprint = mock.Mock(
+            return_value={"changed_on": "2019-01-01T00:00:00", "columns": 2}
+        )
+        datasource.database.get_extra = mock.Mock(
+            return_value={"time_series_incremental_cache": True}
+        )
+        params = {
+            "metrics": ["sum__num"],
+            "granularity_sqla": "ds",
+            "time_grain_sqla": "PT1H",
+            "time_range": time_range,
+            "time_range_endpoints": ["inclusive", "exclusive"],
+        }
+        params.update(form_data)
+        return viz.NVD3TimeSeriesViz(datasource, params)
+
+    @mock.patch("superset.viz.cache", new_callable=InMemoryCache)
+    def test_get_df_incremental(self, cache):
+        with mock.patch.object(
+            viz.NVD3TimeSeriesViz, "get_df", side_effect=hourly_df
+        ) as get_df:
+            test_viz = self.get_viz("2019-01-01 : 2019-01-04")
+            df = test_viz.get_df_payload(incremental=True)["df"]
+            get_df.assert_called_once()
+            self.assertEqual(len(chunk_keys(cache)), 3)
+            self.assertEqual(len(df.index), 72)
+
+            get_df.reset_mock()
+            test_viz = self.get_viz("2019-01-02 : 2019-01-05T12:00:00")
+            df = test_viz.get_df_payload(incremental=True)["df"]
+            # Jan 2 and 3 are read from the cache
+            get_df.assert_called_once()
+            query_obj = get_df.call_args[0][0]
+            self.assertEqual(query_obj["from_dttm"], datetime(2019, 1, 4))
+            self.assertEqual(query_obj["to_dttm"], datetime(2019, 1, 5, 12))
+            self.assertEqual(len(chunk_keys(cache)), 4)
+
+            expected = hourly_df(test_viz.query_obj())
+            pd.testing.assert_frame_equal(
+                df.sort_values(DTTM_ALIAS).reset_index(drop=True), expected
+            )
+
+    def test_incremental_cache_key(self):
+        test_viz = self.get_viz("2019-01-01 : 2019-01-04")
+        query_obj = test_viz.query_obj()
+        start, end = datetime(2019, 1, 1), datetime(2019, 1, 2)
+        key = test_viz.incremental_cache_key(query_obj, start, end)
+        self.assertEqual(test_viz.incremental_cache_key(query_obj, start, end), key)
+
+        # editing the table, its columns or metrics invalidates the chunks
+        test_viz.datasource.get_change_fingerprint.return_value = {
+            "changed_on": "2019-01-01T00:00:00",
+            "columns": 3,
+        }
+        self.assertNotEqual(test_viz.incremental_cache_key(query_obj, start, end), key)
+
+    @mock.patch("superset.viz.cache", new_callable=InMemoryCache)
+    def test_get_df_incremental_with_time_zone(self, cache):
+        def df_with_time_zone(query_obj):
+            df = hourly_df(query_obj)
+            df[DTTM_ALIAS] = df[DTTM_ALIAS].dt.tz_localize("UTC")
+            return df
+
+        with mock.patch.object(
+            viz.NVD3TimeSeriesViz, "get_df", side_effect=df_with_time_zone
+        ):
+            df = self.get_viz("2019-01-01 : 2019-01-04").get_df_payload(
+                incremental=True
+            )["df"]
+        self.assertEqual(len(df.index), 72)
+        self.assertEqual(chunk_keys(cache), [])
+
+    @mock.patch("superset.viz.cache", new_callable=InMemoryCache)
+    def test_get_df_incremental_not_eligible(self, cache):
+        with mock.patch.object(
+            viz.NVD3TimeSeriesViz, "get_df", side_effect=hourly_df
+        ) as get_df:
+            for test_viz in [
+                self.get_viz("2019-01-01 : 2019-01-04", limit=10),
+                self.get_viz("2019-01-01 : 2019-01-04", time_grain_sqla="P1M"),
+                self.get_viz("2019-01-01 : 2019-01-04", time_range_endpoints=None),
+            ]:
+                test_viz.get_df_payload(incremental=True)
+            # callers opt in to the incremental caching
+            self.get_viz("2019-01-01 : 2019-01-04").get_df_payload()
+            self.assertEqual(get_df.call_count, 4)
+            self.assertEqual(chunk_keys(cache), [])
+
+    @mock.patch("superset.viz.cache", new_callable=InMemoryCache)
+    def test_get_df_incremental_recent_chunks(self, cache):
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        time_range = "{} : {}".format(
+            (now - timedelta(days=3)).isoformat(), now.isoformat()
+        )
+        with mock.patch.object(viz.NVD3TimeSeriesViz, "get_df", side_effect=hourly_df):
+            with mock.patch.dict(
+                app.config, {"TIME_SERIES_INCREMENTAL_CACHE_SETTLE_PERIOD": 60 * 60}
+            ):
+                self.get_viz(time_range).get_df_payload(incremental=True)
+        # the partial chunks and the chunk ending less than an hour ago aren't cached
+        self.assertEqual(len(chunk_keys(cache)), 2)
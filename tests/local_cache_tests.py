@@ -0,0 +1,117 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the in-process chart data cache"""
+import time
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+
+from superset.utils.cache_manager import CacheManager
+from superset.utils.local_cache import estimate_size, LocalCache
+
+from .base_tests import SupersetTestCase
+from .utils import InMemoryCache
+
+
+class LocalCacheTests(SupersetTestCase):
+    def test_disabled(self):
+        local_cache = LocalCache(0)
+        local_cache.set("key", "value")
+        self.assertIsNone(local_cache.get("key"))
+        self.assertEqual(len(local_cache), 0)
+
+    def test_lru_eviction_by_size(self):
+        stats_logger = mock.Mock()
+        local_cache = LocalCache(100, stats_logger=stats_logger)
+        local_cache.set("a", "a", size=40)
+        local_cache.set("b", "b", size=40)
+        self.assertEqual(local_cache.get("a"), "a")
+        local_cache.set("c", "c", size=40)
+        # b is the least recently used entry
+        self.assertIsNone(local_cache.get("b"))
+        self.assertEqual(local_cache.get("a"), "a")
+        self.assertEqual(local_cache.get("c"), "c")
+        self.assertEqual(local_cache.size, 80)
+        # values larger than the cache are not kept
+        local_cache.set("d", "d", size=101)
+        self.assertIsNone(local_cache.get("d"))
+        self.assertEqual(len(local_cache), 2)
+        stats_logger.incr.assert_any_call("local_cache.eviction")
+        stats_logger.incr.assert_any_call("local_cache.hit")
+        stats_logger.incr.assert_any_call("local_cache.miss")
+
+    def test_expiration(self):
+        local_cache = LocalCache(100)
+        local_cache.set("expired", 1, expires_at=time.time() - 1)
+        local_cache.set("valid", 2, expires_at=time.time() + 60)
+        self.assertIsNone(local_cache.get("expired"))
+        self.assertEqual(local_cache.get("valid"), 2)
+        local_cache.delete("valid")
+        self.assertIsNone(local_cache.get("valid"))
+        self.assertEqual(local_cache.size, 0)
+
+    def test_estimate_size(self):
+        df = pd.DataFrame({"a": range(1000)})
+        self.assertGreater(estimate_size({"df": df, "query": "SELECT"}), 8000)
+
+
+class ChartDataCacheTests(SupersetTestCase):
+    def get_cache_manager(self):
+        cache_manager = CacheManager()
+        cache_manager._cache = InMemoryCache()
+        cache_manager._stats_logger = mock.Mock()
+        cache_manager._local_cache = LocalCache(10 ** 6)
+        return cache_manager
+
+    def test_set_and_get(self):
+        cache_manager = self.get_cache_manager()
+        value = {"dttm": "2019-01-01T00:00:00", "df": pd.DataFrame({"a": [1, 2]})}
+        cache_manager.set_chart_data("key", value, timeout=60)
+        self.assertTrue(cache_manager.cache.has("key"))
+
+        cached = cache_manager.get_chart_data("key", 60)
+        pd.testing.assert_frame_equal(cached["df"], value["df"])
+        # callers get their own copy of the dataframe
+        cached["df"]["a"] = 0
+        self.assertEqual(cache_manager.get_chart_data("key", 60)["df"]["a"][0], 1)
+        cache_manager._stats_logger.incr.assert_not_called()
+
+        cache_manager.delete_chart_data("key")
+        self.assertIsNone(cache_manager.get_chart_data("key", 60))
+        self.assertEqual(cache_manager.cache.keys(), [])
+
+    def test_get_from_backend(self):
+        cache_manager = self.get_cache_manager()
+        dttm = datetime.utcnow().isoformat().split(".")[0]
+        value = {"dttm": dttm, "df": pd.DataFrame({"a": [1, 2]}), "query": ""}
+        cache_manager.cache.set("key", cache_manager.data_serializer.dumps(value))
+
+        cache_manager.get_chart_data("key", 60)
+        cache_manager._stats_logger.incr.assert_called_once_with(
+            "chart_data_cache.remote.hit"
+        )
+        self.assertEqual(len(cache_manager.local_cache), 1)
+        cache_manager.get_chart_data("key", 60)
+        cache_manager._stats_logger.incr.assert_called_once()
+
+        # payloads computed more than timeout seconds ago are not kept locally
+        cache_manager.local_cache.clear()
+        value["dttm"] = "2019-01-01T00:00:00"
+        cache_manager.cache.set("old", cache_manager.data_serializer.dumps(value))
+        self.assertIsNotNone(cache_manager.get_chart_data("old", 60))
+        self.assertEqual(len(cache_manager.local_cache), 0)
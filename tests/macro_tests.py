@@ -75,3 +75,22 @@ class MacroTestCase(SupersetTestCase):
         with app.test_request_context(data=data4):
             filter_values = jinja_context.filter_values("my_special_filter")
             self.assertEqual(filter_values, ["savage", "foo"])
+
+    def test_get_cache_key_dependencies(self):
+        dependencies = jinja_context.get_cache_key_dependencies(
+            "SELECT '{{ cache_key_wrapper(url_param('foo', 'bar')) }}', "
+            "'{{ cache_key_wrapper(current_username()) }}'"
+        )
+        self.assertEqual(len(dependencies), 2)
+        # the analysis is memoized per template
+        self.assertIs(
+            jinja_context.get_cache_key_dependencies("{{ cache_key_wrapper(1) }}"),
+            jinja_context.get_cache_key_dependencies("{{ cache_key_wrapper(1) }}"),
+        )
+        for sql in [
+            "{% if foo %}{{ cache_key_wrapper(1) }}{% endif %}",
+            "{% for i in range(2) %}{{ cache_key_wrapper(i) }}{% endfor %}",
+            "{{ cache_key_wrapper(foo) }}",
+            "{% set w = cache_key_wrapper %}{{ w(1) }}",
+        ]:
+            self.assertIsNone(jinja_context.get_cache_key_dependencies(sql))
@@ -0,0 +1,158 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the admission control of queries based on their cost"""
+from unittest import mock
+
+from superset.db_engine_specs.presto import PrestoEngineSpec
+from superset.utils import query_cost
+
+from .base_tests import SupersetTestCase
+from .utils import InMemoryCache
+
+
+def make_user(*role_names):
+    roles = []
+    for name in role_names:
+        role = mock.Mock()
+        role.name = name
+        roles.append(role)
+    return mock.Mock(username="alpha", roles=roles)
+
+
+def make_database(extra=None):
+    database = mock.Mock(id=1, db_engine_spec=PrestoEngineSpec)
+    database.get_extra.return_value = dict(extra or {}, version="0.319")
+    return database
+
+
+class QueryCostTests(SupersetTestCase):
+    def make_guard(self, action=query_cost.REJECT):
+        guard = query_cost.QueryCostGuard()
+        guard.enabled = True
+        guard.action = action
+        guard.role_budgets = {
+            "Gamma": {"cpuCost": 100, "networkCost": 100},
+            "Alpha": {"cpuCost": 1000},
+        }
+        guard._cache = InMemoryCache()
+        return guard
+
+    def test_get_budget(self):
+        guard = self.make_guard()
+        database = make_database()
+        self.assertEqual(
+            guard.get_budget(database, make_user("Gamma")),
+            {"cpuCost": 100, "networkCost": 100},
+        )
+        # the network cost isn't limited for Alpha
+        self.assertEqual(
+            guard.get_budget(database, make_user("Gamma", "Alpha")), {"cpuCost": 1000}
+        )
+        self.assertEqual(guard.get_budget(database, make_user("Admin")), {})
+        # roles without a budget are unlimited
+        self.assertEqual(guard.get_budget(database, make_user("Gamma", "Admin")), {})
+        self.assertEqual(guard.get_budget(database), {})
+
+        database = make_database({"query_cost_budget": {"cpuCost": 500}})
+        self.assertEqual(
+            guard.get_budget(database, make_user("Gamma", "Alpha")), {"cpuCost": 500}
+        )
+        self.assertEqual(
+            guard.get_budget(database, make_user("Admin")), {"cpuCost": 500}
+        )
+
+    def test_check(self):
+        guard = self.make_guard()
+        database = make_database()
+        raw_cost = [{"estimate": {"cpuCost": 60.0, "maxMemory": 10.0}}]
+        with mock.patch.object(
+            PrestoEngineSpec, "estimate_query_cost", return_value=raw_cost
+        ) as estimate_query_cost:
+            self.assertEqual(
+                guard.check(database, None, "SELECT 1", make_user("Gamma")),
+                query_cost.ALLOW,
+            )
+            # the estimate of the normalized SQL is cached
+            guard.check(database, None, "select  1;", make_user("Gamma"))
+            estimate_query_cost.assert_called_once()
+
+            raw_cost.append({"estimate": {"cpuCost": 60.0, "maxMemory": 20.0}})
+            with self.assertRaises(query_cost.QueryCostExceededException):
+                guard.check(database, None, "SELECT 1; SELECT 2", make_user("Gamma"))
+            self.assertEqual(
+                guard.check(database, None, "SELECT 1; SELECT 2", make_user("Alpha")),
+                query_cost.ALLOW,
+            )
+
+            guard.action = query_cost.DEPRIORITIZE
+            self.assertEqual(
+                guard.check(database, None, "SELECT 1; SELECT 2", make_user("Gamma")),
+                query_cost.DEPRIORITIZE,
+            )
+
+            guard.enabled = False
+            self.assertEqual(
+                guard.check(database, None, "SELECT 1; SELECT 2", make_user("Gamma")),
+                query_cost.ALLOW,
+            )
+
+    def test_check_without_estimate(self):
+        guard = self.make_guard()
+        database = make_database()
+        with mock.patch.object(
+            PrestoEngineSpec, "estimate_query_cost", side_effect=Exception("error")
+        ):
+            self.assertEqual(
+                guard.check(database, None, "SELECT 1", make_user("Gamma")),
+                query_cost.ALLOW,
+            )
+
+    def test_get_queue(self):
+        guard = self.make_guard(query_cost.DEPRIORITIZE)
+        database = make_database()
+        raw_cost = [{"estimate": {"cpuCost": 500.0}}]
+        with mock.patch.object(
+            PrestoEngineSpec, "estimate_query_cost", return_value=raw_cost
+        ):
+            # no queue is configured
+            self.assertIsNone(
+                guard.get_queue(database, None, "SELECT 1", make_user("Gamma"))
+            )
+
+            guard.deprioritized_queue = "sql_lab_expensive"
+            self.assertEqual(
+                guard.get_queue(database, None, "SELECT 1", make_user("Gamma")),
+                "sql_lab_expensive",
+            )
+            self.assertIsNone(
+                guard.get_queue(database, None, "SELECT 1", make_user("Alpha"))
+            )
+
+            # rejected queries are rejected by the worker
+            guard.action = query_cost.REJECT
+            self.assertIsNone(
+                guard.get_queue(database, None, "SELECT 1", make_user("Gamma"))
+            )
+
+    def test_get_cost_metrics(self):
+        raw_cost = [
+            {"estimate": {"cpuCost": 10.0, "maxMemory": 30.0, "networkCost": "NaN"}},
+            {"estimate": {"cpuCost": 5.0, "maxMemory": 20.0}},
+        ]
+        cost = PrestoEngineSpec.get_cost_metrics(raw_cost)
+        self.assertEqual(cost["cpuCost"], 15.0)
+        self.assertEqual(cost["maxMemory"], 30.0)
@@ -0,0 +1,101 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the polling of running queries"""
+import itertools
+from unittest import mock
+
+from superset.utils.query_progress import poll_intervals, QueryProgressReporter
+
+from .base_tests import SupersetTestCase
+from .utils import InMemoryCache
+
+
+class FakeQuery:
+    id = status = None
+
+    def __init__(self, query_id, progress=0):
+        self.id = query_id
+        self.progress = progress
+
+
+class QueryProgressTests(SupersetTestCase):
+    def test_poll_intervals(self):
+        intervals = list(itertools.islice(poll_intervals(0.05, 1), 7))
+        self.assertEqual(intervals, [0.05, 0.1, 0.2, 0.4, 0.8, 1, 1])
+
+    def test_report_and_flush(self):
+        reporter = QueryProgressReporter()
+        reporter.flush_interval = 60
+        session = mock.Mock()
+        query = FakeQuery(1, progress=10)
+        reporter.report(query, progress=5)
+        reporter.report(query, progress=30)
+        reporter.report(query, progress=20)
+        reporter.report(FakeQuery(2), progress=50, tracking_url="http://job")
+        self.assertEqual(len(reporter), 2)
+
+        # updates are coalesced until the flush interval has elapsed
+        reporter.flush(session)
+        session.commit.assert_not_called()
+        reporter.flush(session, force=True)
+        self.assertEqual(len(reporter), 0)
+        session.commit.assert_called_once()
+        updates = [
+            call[0][0] for call in session.query().filter().update.call_args_list
+        ]
+        self.assertEqual(
+            updates, [{"progress": 30}, {"progress": 50, "tracking_url": "http://job"}]
+        )
+
+    def test_is_stopped(self):
+        reporter = QueryProgressReporter()
+        reporter._cache = InMemoryCache()
+        session = mock.Mock()
+        session.query().filter().one.return_value = ("running",)
+        query = FakeQuery(1)
+        # the metadata database is checked on the first poll
+        self.assertFalse(reporter.is_stopped(query, session))
+        session.query().filter().one.assert_called_once()
+
+        # then every stop_check_interval seconds
+        session.query().filter().one.return_value = ("stopped",)
+        self.assertFalse(reporter.is_stopped(query, session))
+        reporter.request_stop(1)
+        self.assertTrue(reporter.is_stopped(query, session))
+
+        reporter.stop_check_interval = 0
+        self.assertTrue(reporter.is_stopped(FakeQuery(2), session))
+
+    def test_init_app(self):
+        app = mock.Mock(
+            config={
+                "CACHE_CONFIG": {"CACHE_TYPE": "redis"},
+                "SQLLAB_PROGRESS_FLUSH_INTERVAL": 1,
+                "SQLLAB_STOP_CHECK_INTERVAL": 10,
+                "STATS_LOGGER": mock.Mock(),
+            }
+        )
+        reporter = QueryProgressReporter()
+        reporter.init_app(app, InMemoryCache())
+        self.assertEqual(reporter.stop_check_interval, 10)
+        # without a cache, the metadata database is checked on every poll
+        reporter.init_app(app)
+        self.assertEqual(reporter.stop_check_interval, 0)
+        # as with a cache of each process, which the workers don't share
+        app.config["CACHE_CONFIG"] = {"CACHE_TYPE": "simple"}
+        reporter.init_app(app, InMemoryCache())
+        self.assertEqual(reporter.stop_check_interval, 0)
@@ -0,0 +1,36 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the chunked storage of SQL Lab results"""
+from superset.utils.results_chunks import locate_rows, split_rows
+
+from .base_tests import SupersetTestCase
+
+
+class ResultsChunksTests(SupersetTestCase):
+    def test_split_rows(self):
+        self.assertEqual(split_rows(25, 10), [(0, 10), (10, 20), (20, 25)])
+        self.assertEqual(split_rows(20, 10), [(0, 10), (10, 20)])
+        self.assertEqual(split_rows(0, 10), [])
+
+    def test_locate_rows(self):
+        chunk_sizes = [10, 10, 5]
+        self.assertEqual(locate_rows(chunk_sizes), [(0, 0, 10), (1, 0, 10), (2, 0, 5)])
+        self.assertEqual(locate_rows(chunk_sizes, 0, 10), [(0, 0, 10)])
+        self.assertEqual(locate_rows(chunk_sizes, 5, 10), [(0, 5, 10), (1, 0, 5)])
+        self.assertEqual(locate_rows(chunk_sizes, 12, 100), [(1, 2, 10), (2, 0, 5)])
+        self.assertEqual(locate_rows(chunk_sizes, 10, 0), [])
+        self.assertEqual(locate_rows(chunk_sizes, 30, 10), [])
@@ -0,0 +1,98 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""Unit tests for the chart query coalescing"""
+import threading
+import time
+from unittest import mock
+
+from superset.utils.single_flight import SingleFlight
+
+from .base_tests import SupersetTestCase
+from .utils import InMemoryCache
+
+
+class SingleFlightTests(SupersetTestCase):
+    def test_disabled(self):
+        single_flight = SingleFlight(InMemoryCache(), enabled=False)
+        with single_flight.flight("key") as waited:
+            self.assertFalse(waited)
+        self.assertEqual(single_flight.cache.keys(), [])
+
+    def test_leader_releases_lock(self):
+        stats_logger = mock.Mock()
+        cache = InMemoryCache()
+        single_flight = SingleFlight(cache, enabled=True, stats_logger=stats_logger)
+        with single_flight.flight("key") as waited:
+            self.assertFalse(waited)
+            self.assertTrue(cache.has(SingleFlight.lock_key("key")))
+        self.assertFalse(cache.has(SingleFlight.lock_key("key")))
+        stats_logger.incr.assert_called_once_with("single_flight.leader")
+
+    def test_coalesces_local_waiters(self):
+        cache = InMemoryCache()
+        single_flight = SingleFlight(cache, enabled=True, wait_timeout=5)
+        computed = []
+        results = []
+
+        def compute():
+            with single_flight.flight("key") as waited:
+                if waited:
+                    results.append(cache.get("key"))
+                else:
+                    time.sleep(0.2)
+                    computed.append(1)
+                    cache.set("key", "value")
+
+        threads = [threading.Thread(target=compute) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(results, ["value"] * 4)
+
+    def test_waits_on_remote_lock(self):
+        stats_logger = mock.Mock()
+        cache = InMemoryCache()
+        cache.add(SingleFlight.lock_key("key"), 1)
+        single_flight = SingleFlight(
+            cache,
+            enabled=True,
+            wait_timeout=5,
+            poll_interval=0.01,
+            stats_logger=stats_logger,
+        )
+        timer = threading.Timer(0.1, cache.delete, [SingleFlight.lock_key("key")])
+        timer.start()
+        with single_flight.flight("key") as waited:
+            self.assertTrue(waited)
+        stats_logger.incr.assert_called_once_with("single_flight.coalesced_wait")
+
+    def test_wait_timeout(self):
+        stats_logger = mock.Mock()
+        cache = InMemoryCache()
+        cache.add(SingleFlight.lock_key("key"), 1)
+        single_flight = SingleFlight(
+            cache,
+            enabled=True,
+            wait_timeout=0.05,
+            poll_interval=0.01,
+            stats_logger=stats_logger,
+        )
+        with single_flight.flight("key") as waited:
+            self.assertFalse(waited)
+        stats_logger.incr.assert_called_once_with("single_flight.wait_timeout")
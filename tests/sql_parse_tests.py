@@ -504,3 +504,39 @@ class SupersetTestCase(unittest.TestCase):
         SELECT * FROM match
         """
         self.assertEqual({"foo"}, self.extract_tables(query))
+
+    def test_normalized(self):
+        query = sql_parse.ParsedQuery("SELECT *\n  FROM tbname -- comment\nLIMIT 10;")
+        self.assertEqual(
+            query.normalized(),
+            sql_parse.ParsedQuery("select * from tbname limit 10").normalized(),
+        )
+        self.assertNotEqual(
+            query.normalized(),
+            sql_parse.ParsedQuery("SELECT * FROM tbname LIMIT 100").normalized(),
+        )
+        # keywords that may be identifiers keep their case
+        self.assertEqual(
+            sql_parse.ParsedQuery("select * from Events group by Year").normalized(),
+            "SELECT * FROM Events GROUP BY Year",
+        )
+        self.assertNotEqual(
+            sql_parse.ParsedQuery("SELECT * FROM Events").normalized(),
+            sql_parse.ParsedQuery("select * from events").normalized(),
+        )
+
+    def test_is_stateless_select(self):
+        def is_stateless_select(sql):
+            return sql_parse.ParsedQuery(sql).is_stateless_select()
+
+        self.assertTrue(is_stateless_select("SELECT * FROM tbname"))
+        self.assertTrue(
+            is_stateless_select("WITH t AS (SELECT 1 AS a) SELECT a FROM t")
+        )
+        self.assertTrue(is_stateless_select("SELECT 'SELECT @a' AS a FROM tbname"))
+        self.assertFalse(is_stateless_select("SELECT * INTO tmp FROM tbname"))
+        self.assertFalse(is_stateless_select("SELECT * FROM #tmp"))
+        self.assertFalse(is_stateless_select("SELECT @a := 1"))
+        self.assertFalse(is_stateless_select("SELECT * FROM tbname WHERE a = @a"))
+        self.assertFalse(is_stateless_select("SET @a = 1"))
+        self.assertFalse(is_stateless_select("INSERT INTO t SELECT * FROM tbname"))
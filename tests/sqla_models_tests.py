@@ -14,8 +14,17 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from collections import OrderedDict
+from unittest import mock
+
+import numpy
+import pandas as pd
+from sqlalchemy.sql import column
+
+from superset import app
 from superset.connectors.sqla.models import SqlaTable, TableColumn
 from superset.db_engine_specs.druid import DruidEngineSpec
+from superset.extensions import cache_manager
 from superset.utils.core import get_example_database
 
 from .base_tests import SupersetTestCase
@@ -83,3 +92,100 @@ class DatabaseModelTestCase(SupersetTestCase):
         extra_cache_keys = table.get_extra_cache_keys(query_obj)
         self.assertFalse(table.has_extra_cache_keys(query_obj))
         self.assertListEqual(extra_cache_keys, [])
+
+    def test_extra_cache_keys_without_rendering(self):
+        query = "SELECT '{{ cache_key_wrapper(url_param('user', 'user_1')) }}' as user"
+        table = SqlaTable(
+            table_name="test_extra_cache_keys_without_rendering_table",
+            sql=query,
+            database=get_example_database(),
+        )
+        query_obj = {
+            "granularity": None,
+            "from_dttm": None,
+            "to_dttm": None,
+            "groupby": ["user"],
+            "metrics": [],
+            "is_timeseries": False,
+            "filter": [],
+            "extras": {"where": "(user != '{{ cache_key_wrapper('user_2') }}')"},
+        }
+        with app.test_request_context("/?user=user_3"), mock.patch.object(
+            SqlaTable, "get_sqla_query", wraps=table.get_sqla_query
+        ) as get_sqla_query:
+            self.assertListEqual(
+                table.get_extra_cache_keys(query_obj), ["user_3", "user_2"]
+            )
+            get_sqla_query.assert_not_called()
+
+            # the keys of a conditional call depend on the rendering
+            query_obj["extras"] = {
+                "where": "{% if 1 %}user != '{{ cache_key_wrapper('user_2') }}'"
+                "{% endif %}"
+            }
+            self.assertListEqual(
+                table.get_extra_cache_keys(query_obj), ["user_3", "user_2"]
+            )
+            get_sqla_query.assert_called_once()
+
+    def test_get_top_groups(self):
+        table = SqlaTable(
+            table_name="test_get_top_groups", database=get_example_database()
+        )
+        df = pd.DataFrame({"a": ["x", "x", None, "y"], "b": [1.0, 2.0, 3.0, numpy.nan]})
+        groupby_exprs = OrderedDict([("a", column("a")), ("b", column("b"))])
+
+        def get_top_groups(dimensions):
+            top_groups = table._get_top_groups(df, dimensions, groupby_exprs)
+            return str(top_groups.compile(compile_kwargs={"literal_binds": True}))
+
+        spec = table.database.db_engine_spec
+        with mock.patch.object(spec, "allows_tuple_in", False):
+            self.assertEqual(
+                get_top_groups(["a", "b"]),
+                "a = 'x' AND b IN (1.0, 2.0) OR a IS NULL AND b = 3.0 "
+                "OR a = 'y' AND b IS NULL",
+            )
+        with mock.patch.object(spec, "allows_tuple_in", True):
+            # NULLs can't be part of the tuples
+            self.assertEqual(
+                get_top_groups(["a", "b"]),
+                "(a, b) IN (('x', 1.0), ('x', 2.0)) OR a IS NULL AND b = 3.0 "
+                "OR a = 'y' AND b IS NULL",
+            )
+            self.assertEqual(get_top_groups(["a"]), "a IN ('x', 'x', 'y') OR a IS NULL")
+        df = df.dropna()
+        self.assertEqual(get_top_groups(["b"]), "b IN (1.0, 2.0)")
+
+    def test_compiled_query_cache(self):
+        table = self.get_table_by_name("birth_names")
+        query_obj = {
+            "granularity": None,
+            "from_dttm": None,
+            "to_dttm": None,
+            "groupby": ["gender"],
+            "metrics": ["count"],
+            "is_timeseries": False,
+            "filter": [{"col": "name", "op": "in", "val": ["Joe", "Anna"]}],
+            "extras": {"where": "num > 0"},
+        }
+        cache_manager.compiled_query_cache.clear()
+        with mock.patch.object(
+            table, "get_sqla_query", wraps=table.get_sqla_query
+        ) as get_sqla_query:
+            sql = table.get_query_str(query_obj)
+            self.assertEqual(table.get_query_str(dict(query_obj)), sql)
+            self.assertEqual(get_sqla_query.call_count, 1)
+
+            labels_expected = table.get_query_str_extended(query_obj).labels_expected
+            self.assertEqual(labels_expected, ["gender", "count"])
+
+            query_obj["groupby"] = ["name"]
+            self.assertNotEqual(table.get_query_str(query_obj), sql)
+            self.assertEqual(get_sqla_query.call_count, 2)
+
+            # queries processed by Jinja aren't cached
+            query_obj["extras"] = {"where": "num > {{ 0 }}"}
+            table.get_query_str(query_obj)
+            table.get_query_str(query_obj)
+            self.assertEqual(get_sqla_query.call_count, 4)
@@ -18,13 +18,16 @@
 import json
 from datetime import datetime, timedelta
 from random import random
+from unittest import mock
 
 import prison
+from werkzeug.contrib.cache import SimpleCache
 
-from superset import db, security_manager
+from superset import db, security_manager, sql_lab
 from superset.connectors.sqla.models import SqlaTable
 from superset.dataframe import SupersetDataFrame
 from superset.db_engine_specs import BaseEngineSpec
+from superset.models.core import Database
 from superset.models.sql_lab import Query
 from superset.utils.core import datetime_to_epoch, get_example_database
 
@@ -424,3 +427,124 @@ class SqlLabTests(SupersetTestCase):
             assert set(mylist).issubset(dblist)
         finally:
             self.delete_fake_db()
+
+    @mock.patch.object(
+        Database, "get_extra", return_value={"sqllab_results_cache": True}
+    )
+    def test_results_cache_key(self, get_extra):
+        database = get_example_database()
+        query = Query(database=database, schema="main", limit=100)
+
+        def get_key(sql, user_name="admin"):
+            return sql_lab.get_results_cache_key(query, [sql], user_name, False)
+
+        key = get_key("SELECT * FROM birth_names")
+        self.assertTrue(key.startswith("sqllab_results/"))
+        self.assertEqual(key, get_key("select *\n  from birth_names -- comment"))
+        self.assertNotEqual(key, get_key("SELECT name FROM birth_names"))
+        self.assertIsNone(get_key("DELETE FROM birth_names"))
+
+        query.limit = 10
+        self.assertNotEqual(key, get_key("SELECT * FROM birth_names"))
+        query.select_as_cta = True
+        self.assertIsNone(get_key("SELECT * FROM birth_names"))
+
+        get_extra.return_value = {}
+        query.select_as_cta = False
+        self.assertIsNone(get_key("SELECT * FROM birth_names"))
+
+    def test_get_cached_results(self):
+        results_backend = mock.Mock()
+        results_backend.get.return_value = {"results_key": "abc", "rows": 10}
+        results_backend.has.return_value = True
+        query = Query(id=1, database=get_example_database(), sql="SELECT 1")
+        session = mock.Mock()
+        with mock.patch.object(sql_lab, "results_backend", results_backend):
+            payload = sql_lab._get_cached_results(query, "key", False, session)
+            self.assertEqual(payload["query"]["state"], "success")
+            self.assertEqual(query.results_key, "abc")
+            self.assertEqual(query.rows, 10)
+            self.assertTrue(query.extra["served_from_cache"])
+            session.commit.assert_called_once()
+
+            # the results of the identical query have expired
+            results_backend.has.return_value = False
+            self.assertIsNone(sql_lab._get_cached_results(query, "key", False, session))
+
+    @mock.patch.object(
+        Database, "get_extra", return_value={"sqllab_results_cache": True}
+    )
+    @mock.patch(
+        "superset.views.core.is_feature_enabled",
+        side_effect=lambda feature: feature == "SQLLAB_BACKEND_PERSISTENCE",
+    )
+    def test_results_of_query_served_from_cache(self, is_feature_enabled, get_extra):
+        results_backend = SimpleCache()
+        with mock.patch.object(sql_lab, "results_backend", results_backend):
+            with mock.patch("superset.views.core.results_backend", results_backend):
+                self.login("admin")
+                self.run_sql(QUERY_1, "client_id_1")
+                self.run_sql(QUERY_1.lower(), "client_id_2")
+                query = db.session.query(Query).filter_by(client_id="client_id_1")
+                served = db.session.query(Query).filter_by(client_id="client_id_2")
+                query, served = query.one(), served.one()
+                self.assertTrue(served.extra.get("served_from_cache"))
+                self.assertEqual(served.results_key, query.results_key)
+
+                # the queries share the results of the first one
+                url = f"/superset/results/{served.results_key}/"
+                result = self.get_json_resp(url)
+                self.assertEqual(result["status"], "success")
+                self.assertEqual(len(result["data"]), 1)
+
+    def test_can_run_statements_in_parallel(self):
+        query = Query(database=get_example_database(), select_as_cta=False)
+        statements = ["SELECT * FROM birth_names", "SELECT COUNT(*) FROM birth_names"]
+        self.assertTrue(sql_lab.can_run_statements_in_parallel(query, statements, 2))
+        self.assertFalse(sql_lab.can_run_statements_in_parallel(query, statements, 1))
+        self.assertFalse(
+            sql_lab.can_run_statements_in_parallel(query, statements[:1], 2)
+        )
+        self.assertFalse(
+            sql_lab.can_run_statements_in_parallel(
+                query, statements + ["SELECT * INTO tmp FROM birth_names"], 2
+            )
+        )
+        self.assertFalse(
+            sql_lab.can_run_statements_in_parallel(
+                query, statements + ["DELETE FROM birth_names"], 2
+            )
+        )
+        query.select_as_cta = True
+        self.assertFalse(sql_lab.can_run_statements_in_parallel(query, statements, 2))
+
+    def test_cancel_cursor(self):
+        cursor = mock.Mock()
+        sql_lab._cancel_cursor(cursor)
+        cursor.cancel.assert_called_once()
+
+        # the statements of cursors without cancel run to completion
+        sql_lab._cancel_cursor(mock.Mock(spec=["execute"]))
+        cursor.cancel.side_effect = Exception("already done")
+        sql_lab._cancel_cursor(cursor)
+
+    @mock.patch.object(
+        Database, "get_extra", return_value={"sqllab_parallel_statements": 2}
+    )
+    def test_multi_sql_parallel(self, get_extra):
+        self.login("admin")
+
+        multi_sql = """
+        SELECT * FROM birth_names LIMIT 1;
+        SELECT * FROM birth_names LIMIT 3;
+        SELECT * FROM birth_names LIMIT 2;
+        """
+        data = self.run_sql(multi_sql, "2235")
+        self.assertEqual(len(data["data"]), 2)
+        self.assertEqual(
+            [statement["rows"] for statement in data["statements"]], [1, 3, 2]
+        )
+        self.assertEqual(len(data["statements"][1]["data"]), 3)
+        query = db.session.query(Query).filter_by(client_id="2235").one()
+        self.assertEqual(query.rows, 2)
+        self.assertIsNone(query.extra.get("statements_progress"))
@@ -18,7 +18,7 @@
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
-from superset.stats_logger import StatsdStatsLogger
+from superset.stats_logger import BaseStatsLogger, set_gauge, StatsdStatsLogger
 
 
 class StatsdStatsLoggerTest(TestCase):
@@ -32,6 +32,8 @@ class StatsdStatsLoggerTest(TestCase):
         logger.gauge("foo3")
         client.gauge.assert_called_once()
         client.gauge.assert_called_with("foo3")
+        logger.gauge("foo3", 5)
+        client.gauge.assert_called_with("foo3", 5)
         logger.timing("foo4", 1.234)
         client.timing.assert_called_once()
         client.timing.assert_called_with("foo4", 1.234)
@@ -47,3 +49,20 @@ class StatsdStatsLoggerTest(TestCase):
 
             stats_logger = StatsdStatsLogger()
             self.verify_client_calls(stats_logger, mock_client)
+
+
+class SetGaugeTest(TestCase):
+    def test_set_gauge(self):
+        stats_logger = Mock()
+        set_gauge(stats_logger, "foo", 5)
+        stats_logger.gauge.assert_called_once_with("foo", 5)
+
+    def test_set_gauge_unsupported(self):
+        class LegacyStatsLogger(BaseStatsLogger):
+            def gauge(self, key):
+                raise AssertionError("gauges without value aren't set")
+
+        # stats loggers whose gauges take no value, or that don't implement
+        # them, are ignored
+        set_gauge(LegacyStatsLogger(), "foo", 5)
+        set_gauge(BaseStatsLogger(), "foo", 5)
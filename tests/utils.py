@@ -15,7 +15,11 @@
 # specific language governing permissions and limitations
 # under the License.
 import json
+import threading
 from os import path
+from typing import List
+
+from werkzeug.contrib.cache import SimpleCache
 
 FIXTURES_DIR = "tests/fixtures"
 
@@ -27,3 +31,19 @@ def read_fixture(fixture_file_name):
 
 def load_fixture(fixture_file_name):
     return json.loads(read_fixture(fixture_file_name))
+
+
+class InMemoryCache(SimpleCache):
+    """An in-memory cache listing its keys, whose ``add`` is atomic so that
+    concurrent callers can race for a key"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            return super().add(key, value, timeout)
+
+    def keys(self) -> List[str]:
+        return list(self._cache)
@@ -21,6 +21,7 @@ from decimal import Decimal
 from unittest.mock import Mock, patch
 
 import numpy
+import pandas as pd
 from flask import Flask
 from flask_caching import Cache
 from sqlalchemy.exc import ArgumentError
@@ -34,9 +35,11 @@ from superset.utils.core import (
     convert_legacy_filters_into_adhoc,
     datetime_f,
     format_timedelta,
+    get_column_values,
     get_or_create_db,
     get_since_until,
     get_stacktrace,
+    group_by_prefix,
     json_int_dttm_ser,
     json_iso_dttm_ser,
     JSONEncodedDict,
@@ -52,7 +55,11 @@ from superset.utils.core import (
     zlib_compress,
     zlib_decompress,
 )
-from superset.views.utils import get_time_range_endpoints
+from superset.views.utils import (
+    _database_semaphores,
+    get_database_semaphore,
+    get_time_range_endpoints,
+)
 from tests.base_tests import SupersetTestCase
 
 
@@ -655,6 +662,59 @@ class UtilsTestCase(SupersetTestCase):
         self.assertEqual(instance.watcher, 4)
         self.assertEqual(result1, result8)
 
+    def test_memoized_bounded(self):
+        evicted = []
+
+        @memoized(maxsize=2, on_evict=evicted.append)
+        def test_function(a):
+            return a * 2
+
+        test_function(1)
+        test_function(2)
+        test_function(1)
+        test_function(3)
+        # 2 is the least recently used value
+        self.assertEqual(evicted, [4])
+        self.assertEqual(len(test_function), 2)
+        self.assertEqual(test_function.evictions, 1)
+
+    def test_memoized_concurrent_calls(self):
+        released = []
+        values = []
+
+        @memoized(on_evict=released.append)
+        def test_function(a):
+            value = object()
+            values.append(value)
+            if len(values) == 1:
+                # another caller computes and caches the value meanwhile
+                test_function(a)
+            return value
+
+        # the value cached first is kept, the other one is released
+        self.assertIs(test_function(1), values[1])
+        self.assertEqual(released, [values[0]])
+        self.assertIs(test_function(1), values[1])
+        self.assertEqual(len(values), 2)
+        self.assertEqual(test_function.evictions, 0)
+
+    def test_memoized_ttl(self):
+        watcher = {"val": 0}
+
+        @memoized(ttl=60)
+        def test_function(a):
+            watcher["val"] += 1
+            return a
+
+        with patch("superset.utils.core.monotonic", return_value=1000):
+            test_function(1)
+            test_function(1)
+        self.assertEqual(watcher["val"], 1)
+        with patch("superset.utils.core.monotonic", return_value=1061):
+            test_function(1)
+        self.assertEqual(watcher["val"], 2)
+        self.assertEqual(test_function.evictions, 1)
+
     @patch("superset.utils.core.parse_human_datetime", mock_parse_human_datetime)
     def test_get_since_until(self):
         result = get_since_until()
@@ -882,6 +942,24 @@ class UtilsTestCase(SupersetTestCase):
         self.assertEqual(list(split('a "b c"')), ["a", '"b c"'])
         self.assertEqual(list(split(r'a "b \" c"')), ["a", r'"b \" c"'])
 
+    def test_get_column_values(self):
+        df = pd.DataFrame(
+            {"a": ["x", None, "y"], "b": [1.0, numpy.nan, 3.0], "c": [1, 2, 3]}
+        )
+        values = get_column_values(df, ["a", "b", "c"])
+        self.assertEqual(values, [["x", None, "y"], [1.0, None, 3.0], [1, 2, 3]])
+        self.assertIsInstance(values[2][0], int)
+
+    def test_group_by_prefix(self):
+        groups = group_by_prefix(
+            [("a", 1, 1), ("a", 1, 2), ("b", None, 1), ("a", 2, 1)]
+        )
+        self.assertEqual(
+            list(groups.items()),
+            [(("a", 1), [1, 2]), (("b", None), [1]), (("a", 2), [1])],
+        )
+        self.assertEqual(group_by_prefix([(1,), (2,)]), {(): [1, 2]})
+
     def test_get_or_create_db(self):
         get_or_create_db("test_db", "sqlite:///superset.db")
         database = db.session.query(Database).filter_by(database_name="test_db").one()
@@ -952,3 +1030,23 @@ class UtilsTestCase(SupersetTestCase):
                 get_time_range_endpoints(form_data={"datasource": "1__table"}, slc=slc),
                 (TimeRangeEndpoint.INCLUSIVE, TimeRangeEndpoint.EXCLUSIVE),
             )
+
+    def test_get_database_semaphore(self):
+        datasource = Mock(type="table")
+        datasource.database.id = 1000
+        datasource.database.get_extra.return_value = {
+            "explore_json_batch_concurrency": 2
+        }
+        semaphore = get_database_semaphore(datasource)
+        self.assertIs(get_database_semaphore(datasource), semaphore)
+
+        # editing the cap replaces the semaphore of the database
+        datasource.database.get_extra.return_value = {
+            "explore_json_batch_concurrency": 3
+        }
+        new_semaphore = get_database_semaphore(datasource)
+        self.assertIsNot(new_semaphore, semaphore)
+        self.assertIs(get_database_semaphore(datasource), new_semaphore)
+        self.assertEqual(
+            len([key for key in _database_semaphores if key[1] == 1000]), 1
+        )
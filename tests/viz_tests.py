@@ -1158,3 +1158,47 @@ class TimeSeriesVizTestCase(SupersetTestCase):
             .tolist(),
             [1.0, 2.0, np.nan, np.nan, 5.0, np.nan, 7.0],
         )
+
+    def test_to_series(self):
+        datasource = self.get_datasource_mock()
+        df = pd.DataFrame(
+            {
+                ("sum__num", "boy"): [1.0, np.nan, 3.0],
+                ("sum__num", "girl"): [np.nan, np.nan, np.nan],
+                ("sum__num", "other"): [4, 5, 6],
+            },
+            index=pd.to_datetime(["2019-01-01", "2019-01-02", "2019-01-03"]),
+        )
+        x = [1546300800000.0, 1546387200000.0, 1546473600000.0]
+
+        test_viz = viz.NVD3TimeSeriesViz(datasource, {"metrics": ["sum__num"]})
+        chart_data = test_viz.to_series(df.copy(), classed="time-shift-0")
+        self.assertEqual([serie["key"] for serie in chart_data], [("boy",), ("other",)])
+        self.assertEqual(
+            chart_data[1],
+            {
+                "key": ("other",),
+                "values": [
+                    {"x": x[0], "y": 4},
+                    {"x": x[1], "y": 5},
+                    {"x": x[2], "y": 6},
+                ],
+                "classed": "time-shift-0",
+            },
+        )
+        self.assertEqual([value["x"] for value in chart_data[0]["values"]], x)
+        np.testing.assert_equal(
+            [value["y"] for value in chart_data[0]["values"]], [1.0, np.nan, 3.0]
+        )
+
+        test_viz = viz.NVD3TimeSeriesViz(
+            datasource, {"metrics": ["sum__num"], "series_format": "columnar"}
+        )
+        chart_data = test_viz.to_series(df.copy(), title_suffix="1 week ago")
+        self.assertEqual(
+            [serie["key"] for serie in chart_data],
+            [("boy", "1 week ago"), ("other", "1 week ago")],
+        )
+        self.assertEqual(chart_data[1]["x"], x)
+        self.assertEqual(chart_data[1]["y"], [4, 5, 6])
+        np.testing.assert_equal(chart_data[0]["y"], [1.0, np.nan, 3.0])